@@ -0,0 +1,136 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from config import settings
+from app.bot.core.bot_instance import defer_coroutines
+from app.bot.dispatcher import update_chat_key
+from app.utils.logger import logger
+from app.utils.metrics import get_metrics
+
+# 需要安装的模块：aiohttp (AsyncTeleBot 依赖，仅 BOT_RUNTIME=asyncio 时需要)
+
+
+class AsyncBotRuntime:
+    """
+    asyncio 运行时 (BOT_RUNTIME=asyncio)
+    AsyncTeleBot 在事件循环中长轮询拉取更新，同一聊天的更新按顺序处理，不同聊天并发处理。
+    处理函数与普通模式共用同一套注册：过滤条件、下一步处理函数和同步处理函数在线程池中执行，
+    协程处理函数 (async def) 在事件循环中执行，等待数据库、后端服务和发送队列时不占用线程。
+    排队和处理中的更新数量达到 BOT_MAX_INFLIGHT_UPDATES 时暂停拉取
+    """
+
+    def __init__(self, bot, workers=settings.BOT_WORKERS, max_inflight=settings.BOT_MAX_INFLIGHT_UPDATES,
+                 poll_timeout=settings.BOT_POLL_TIMEOUT):
+        self.bot = bot
+        self.async_bot = AsyncTeleBot(bot.token)
+        self.workers = max(1, workers)
+        self.max_inflight = max(1, max_inflight)
+        self.poll_timeout = poll_timeout
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bot-handler")
+        self.chats = {}  # {聊天: deque[更新]}，队首是正在处理的更新
+        self.pending = 0
+        self._slots = None
+        self._tasks = set()
+
+    def _process_sync(self, update):
+        """在线程池中执行 TeleBot 的处理流程，返回协程处理函数留给事件循环执行的协程"""
+        with defer_coroutines() as coroutines:
+            self.bot.process_new_updates([update])
+        return coroutines
+
+    async def _process(self, update):
+        """处理一条更新：先执行同步部分，再依次等待协程处理函数"""
+        metrics = get_metrics()
+        loop = asyncio.get_running_loop()
+        with metrics.timer("bot.update"):
+            try:
+                coroutines = await loop.run_in_executor(self.executor, self._process_sync, update)
+            except Exception as e:
+                metrics.incr("bot.update_error")
+                logger.exception("处理更新失败: update_id={}, error={}", update.update_id, e)
+                return
+            for coro in coroutines:
+                try:
+                    await coro
+                except Exception as e:
+                    metrics.incr("bot.update_error")
+                    logger.exception("处理更新失败: update_id={}, error={}", update.update_id, e)
+
+    async def submit(self, update):
+        """提交一条更新，达到上限时等待"""
+        try:
+            key = update_chat_key(update)
+        except Exception as e:
+            logger.warning("无法确定更新所属的聊天，单独处理: update_id={}, error={}", update.update_id, e)
+            key = ("update", update.update_id)
+        await self._slots.acquire()
+        backlog = self.chats.get(key)
+        if backlog is None:
+            self.chats[key] = deque([update])
+            task = asyncio.create_task(self._drain(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            backlog.append(update)
+        self.pending += 1
+        self._report()
+
+    async def _drain(self, key):
+        """依次处理一个聊天积压的更新"""
+        backlog = self.chats[key]
+        while backlog:
+            try:
+                await self._process(backlog[0])
+            finally:
+                backlog.popleft()
+                self.pending -= 1
+                self._slots.release()
+        del self.chats[key]
+        self._report()
+
+    def _report(self):
+        metrics = get_metrics()
+        metrics.set_gauge("dispatcher.queue_depth", self.pending)
+        metrics.set_gauge("dispatcher.active_chats", len(self.chats))
+
+    async def _poll(self):
+        """长轮询拉取更新并提交"""
+        offset = None
+        while True:
+            try:
+                updates = await self.async_bot.get_updates(offset=offset, timeout=self.poll_timeout,
+                                                           request_timeout=self.poll_timeout + 5)
+            except Exception as e:
+                logger.error("拉取更新失败: {}", e)
+                await asyncio.sleep(3)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                await self.submit(update)
+
+    async def _main(self):
+        self._slots = asyncio.Semaphore(self.max_inflight)
+        try:
+            await self.async_bot.remove_webhook()
+            await self._poll()
+        finally:
+            # 还没有发出过请求时不存在会话
+            if asyncio_helper.session_manager.session is not None:
+                await self.async_bot.close_session()
+
+    def run(self):
+        """启动事件循环，阻塞直到被中断"""
+        logger.info("Bot 以 asyncio 模式启动: workers={}", self.workers)
+        try:
+            asyncio.run(self._main())
+        except KeyboardInterrupt:
+            logger.info("Bot 已停止")
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+def run_async_bot(bot):
+    """以 asyncio 模式运行 Bot"""
+    AsyncBotRuntime(bot).run()
@@ -2,6 +2,7 @@ import telebot
 from app.utils.logger import logger
 from app.bot.handlers import admin_panel, user_handlers, user_panel
 from app.bot.core.bot_instance import bot
+from app.bot.dispatcher import create_dispatcher
 from config import settings
 
 
@@ -115,13 +116,20 @@ def run_bot():
     """运行 Bot"""
     bot_manager = BotManager()
     bot = bot_manager.get_bot()
+    if settings.BOT_RUNTIME == "asyncio" and not settings.WEBHOOK_URL:
+        # asyncio 运行时自己按聊天保序调度更新，不使用分发器
+        from app.bot.async_runtime import run_async_bot
+        run_async_bot(bot)
+        return
+    # Webhook 和 Polling 模式都通过分发器处理更新：同一聊天按顺序，不同聊天并行
+    create_dispatcher(bot)
     if settings.WEBHOOK_URL:
-        logger.info(f"Bot 以 Webhook 模式启动")
-        bot.remove_webhook()
-        bot.set_webhook(settings.WEBHOOK_URL)
+        logger.info("Bot 以 Webhook 模式启动")
+        from app.bot.webhook_server import run_webhook_bot
+        run_webhook_bot(bot)
     else:
-        logger.info(f"Bot 以 Polling 模式启动")
-        bot.infinity_polling()
+        logger.info("Bot 以 Polling 模式启动")
+        bot.infinity_polling(timeout=settings.BOT_POLL_TIMEOUT + 5, long_polling_timeout=settings.BOT_POLL_TIMEOUT)
 
 
 if __name__ == "__main__":
@@ -1,14 +1,24 @@
+import asyncio
+import functools
+import inspect
+import threading
+import uuid
+from contextlib import contextmanager
 import telebot
 from app.utils import logger
+from app.utils.logger import log_context
 from config.settings import TELEGRAM_BOT_TOKEN
 from config.settings import DELAY_INTERVAL, ENABLE_MESSAGE_CLEANER
 from app.utils.message_queue import get_message_queue, Message
 from app.utils.scheduler import get_scheduler
+from app.utils.send_queue import get_send_queue, PRIORITY_INTERACTIVE, KIND_EDIT, KIND_ANSWER
 
 
 scheduler = get_scheduler()
 message_queue = get_message_queue()
-bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN)
+send_queue = get_send_queue()
+# 处理函数由 app.bot.dispatcher 在线程池中按聊天保序执行，不使用 TeleBot 自带的线程池
+bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN, threaded=False)
 
 # 保存原始的 send_message 和 reply_to 方法
 original_send_message = bot.send_message
@@ -16,48 +26,138 @@ original_reply_to = bot.reply_to
 original_delete_message = bot.delete_message
 original_register_next_step_handler = bot.register_next_step_handler
 original_edit_message_text = bot.edit_message_text
+original_answer_callback_query = bot.answer_callback_query
+original_build_handler_dict = bot._build_handler_dict
 
-def send_message_with_delete(chat_id, text, delay=DELAY_INTERVAL, **kwargs):
-    # 调用原始的 send_message 方法
-    message = original_send_message(chat_id, text, **kwargs)
-    if ENABLE_MESSAGE_CLEANER and delay is not None:
-        message_queue.add_message(message, delay)
-    return message
+# 每个聊天待执行的下一步处理函数清理任务 {chat_id: Job}
+step_handler_timers = {}
 
-def reply_to_with_delete(message, text, delay=DELAY_INTERVAL, **kwargs):
-    # 调用原始的 reply_to 方法
-    reply_message = original_reply_to(message, text, **kwargs)
-    if ENABLE_MESSAGE_CLEANER and delay is not None:
-        message_queue.add_message(reply_message, delay)
-        message_queue.add_message(message, delay)
-    return reply_message
+# 协程处理函数 (async def) 的执行方式：asyncio 运行时在处理更新期间收集协程，交给事件循环执行；
+# 其他运行模式在后台事件循环中执行，处理更新的线程等待其完成
+_deferred = threading.local()
+_background_loop = None
+_background_loop_lock = threading.Lock()
 
-def edit_message_text_with_delete(text, chat_id, message_id, delay=DELAY_INTERVAL, **kwargs):
-    # 调用原始的 edit_message_text 方法
-    edited_message = original_edit_message_text(text, chat_id, message_id, **kwargs)
+def _delete_later(future, delay, *messages):
+    """发送成功后把消息加入待删除队列"""
     if ENABLE_MESSAGE_CLEANER and delay is not None:
-        message_queue.add_message(edited_message, delay)
-    return edited_message
+        def add_messages(done):
+            if done.exception() is None:
+                for message in (done.result(),) + messages:
+                    message_queue.add_message(message, delay)
+        future.add_done_callback(add_messages)
+
+def send_message_with_delete(chat_id, text, delay=DELAY_INTERVAL, priority=PRIORITY_INTERACTIVE, wait=True, **kwargs):
+    # 通过发送队列调用原始的 send_message 方法，wait=False 时不等待发送结果，返回 Future
+    future = send_queue.submit(chat_id, original_send_message, (chat_id, text), kwargs, priority)
+    _delete_later(future, delay)
+    return future.result() if wait else future
+
+def reply_to_with_delete(message, text, delay=DELAY_INTERVAL, priority=PRIORITY_INTERACTIVE, wait=True, **kwargs):
+    # 通过发送队列调用原始的 reply_to 方法
+    future = send_queue.submit(message.chat.id, original_reply_to, (message, text), kwargs, priority)
+    _delete_later(future, delay, message)
+    return future.result() if wait else future
+
+def edit_message_text_with_delete(text, chat_id, message_id, delay=DELAY_INTERVAL, priority=PRIORITY_INTERACTIVE,
+                                  wait=True, **kwargs):
+    # 通过发送队列调用原始的 edit_message_text 方法，编辑按单独的令牌桶限速，不占用发送消息的额度
+    future = send_queue.submit(chat_id, original_edit_message_text, (text, chat_id, message_id), kwargs, priority,
+                               KIND_EDIT)
+    _delete_later(future, delay)
+    return future.result() if wait else future
+
+def answer_callback_query_with_queue(callback_query_id, text=None, wait=True, **kwargs):
+    # 通过发送队列调用原始的 answer_callback_query 方法，应答回调查询只受全局限速
+    future = send_queue.submit(("callback", callback_query_id), original_answer_callback_query,
+                               (callback_query_id, text), kwargs, PRIORITY_INTERACTIVE, KIND_ANSWER)
+    return future.result() if wait else future
+
+async def send_message_async(chat_id, text, **kwargs):
+    # 协程处理函数中发送消息，等待发送队列时不阻塞事件循环
+    return await asyncio.wrap_future(send_message_with_delete(chat_id, text, wait=False, **kwargs))
+
+async def reply_to_async(message, text, **kwargs):
+    # 协程处理函数中回复消息，等待发送队列时不阻塞事件循环
+    return await asyncio.wrap_future(reply_to_with_delete(message, text, wait=False, **kwargs))
 
 def delete_message_with_delete(chat_id, message_id, **kwargs):
     # 调用原始的 delete_message 方法
     try:
         original_delete_message(chat_id, message_id, **kwargs)
     except Exception as e:
-        logger.error(f"Delete message error: {e}")
+        logger.error("Delete message error: {}", e)
+
+def _get_background_loop():
+    """获取后台事件循环，非 asyncio 运行模式下执行协程处理函数"""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="bot-async", daemon=True).start()
+    return _background_loop
+
+@contextmanager
+def defer_coroutines():
+    """收集当前线程中处理函数返回的协程，由调用方 (asyncio 运行时) 在事件循环中执行"""
+    _deferred.coroutines = coroutines = []
+    try:
+        yield coroutines
+    finally:
+        _deferred.coroutines = None
+
+def run_handler_coroutine(coro):
+    """执行协程处理函数：正在收集时交给 asyncio 运行时，否则在后台事件循环中执行并等待结果"""
+    coroutines = getattr(_deferred, "coroutines", None)
+    if coroutines is not None:
+        coroutines.append(coro)
+        return None
+    return asyncio.run_coroutine_threadsafe(coro, _get_background_loop()).result()
+
+def with_log_context(handler):
+    """
+    包装消息处理函数，使处理过程中的日志都带上 request_id 和 handler 字段
+    处理函数 (或经过校验装饰器后) 返回协程时，协程同样带上日志上下文执行
+    """
+    @functools.wraps(handler)
+    def wrapper(update, *args, **kwargs):
+        user = getattr(update, "from_user", None)
+        telegram_id = user.id if user else None
+        request_id = uuid.uuid4().hex[:12]
+        with log_context(handler.__name__, request_id=request_id, telegram_id=telegram_id):
+            result = handler(update, *args, **kwargs)
+        if not inspect.iscoroutine(result):
+            return result
+
+        async def run_with_context():
+            with log_context(handler.__name__, request_id=request_id, telegram_id=telegram_id):
+                return await result
+        return run_handler_coroutine(run_with_context())
+    return wrapper
+
+def build_handler_dict_with_context(handler, pass_bot=False, **filters):
+    # 所有 register_*_handler 和装饰器注册的处理函数都经过这里
+    return original_build_handler_dict(with_log_context(handler), pass_bot=pass_bot, **filters)
 
 def register_next_step_handler_with_delete(message, callback, delay=30, **kwargs):
     # 调用原始的 register_next_step_handler 方法
-    original_register_next_step_handler(message, callback, **kwargs)
+    original_register_next_step_handler(message, with_log_context(callback), **kwargs)
+    # 同一聊天注册新的下一步处理函数时，取消上一次的清理任务，避免它清掉新注册的处理函数
+    previous = step_handler_timers.pop(message.chat.id, None)
+    if previous is not None:
+        previous.cancel()
     if ENABLE_MESSAGE_CLEANER and delay is not None:
-        scheduler.add_delayed_job(delay, clear_step_handler, [message])
+        step_handler_timers[message.chat.id] = scheduler.add_delayed_job(delay, clear_step_handler, [message])
 
 def clear_step_handler(message):
-    logger.debug(f"Clear step handler for message {message.message_id}")
+    logger.debug("Clear step handler for message {}", message.message_id)
+    step_handler_timers.pop(message.chat.id, None)
     bot.clear_step_handler(message)
         
 bot.send_message = send_message_with_delete
 bot.reply_to = reply_to_with_delete
 bot.delete_message = delete_message_with_delete
 bot.edit_message_text = edit_message_text_with_delete
-bot.register_next_step_handler = register_next_step_handler_with_delete
\ No newline at end of file
+bot.answer_callback_query = answer_callback_query_with_queue
+bot.register_next_step_handler = register_next_step_handler_with_delete
+bot._build_handler_dict = build_handler_dict_with_context
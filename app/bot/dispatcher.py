@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+from app.utils.logger import logger
+from app.utils.metrics import get_metrics
+
+# 需要安装的模块：无
+
+_dispatcher = None
+
+
+def update_chat_key(update):
+    """
+    获取更新所属的聊天，同一聊天的更新按顺序处理
+    没有聊天信息的更新 (例如内联查询) 按发送者区分，都没有时按 update_id 单独处理
+    """
+    message = (update.message or update.edited_message or update.channel_post or update.edited_channel_post)
+    if message is not None:
+        return message.chat.id
+    if update.callback_query is not None:
+        if update.callback_query.message is not None:
+            return update.callback_query.message.chat.id
+        return update.callback_query.from_user.id
+    for event in (update.inline_query, update.chosen_inline_result, update.shipping_query,
+                  update.pre_checkout_query, update.my_chat_member, update.chat_member, update.chat_join_request):
+        if event is not None:
+            chat = getattr(event, "chat", None)
+            return chat.id if chat is not None else event.from_user.id
+    return ("update", update.update_id)
+
+
+class UpdateDispatcher:
+    """
+    按聊天保序的更新分发器
+    同一聊天的更新排成一队依次处理 (下一步处理函数、确认会话都以聊天为单位，并发处理会互相覆盖)，
+    不同聊天在线程池中并行处理；每处理完一条更新就把该聊天重新排到线程池末尾，单个聊天刷屏不会占满线程。
+    排队和处理中的更新总数受 max_pending 限制
+    """
+
+    def __init__(self, process, workers=settings.BOT_WORKERS, max_pending=settings.BOT_MAX_INFLIGHT_UPDATES):
+        """
+        Args:
+            process: 处理单条更新的函数
+            workers: 线程数量
+            max_pending: 排队和处理中的最大更新数量
+        """
+        self.process = process
+        self.workers = max(1, workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bot-handler")
+        self.chats = {}  # {聊天: deque[(更新, 入队时间)]}，队首是正在处理的更新
+        self.pending = 0
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, update, block=True):
+        """
+        提交一条更新
+
+        Args:
+            update: telebot.types.Update
+            block: 达到上限时是否等待，为 False 时直接返回 False
+
+        Returns:
+            是否已接收
+        """
+        metrics = get_metrics()
+        # 先确定聊天再占用名额，取聊天出错时不会漏还名额
+        try:
+            key = update_chat_key(update)
+        except Exception as e:
+            logger.warning("无法确定更新所属的聊天，单独处理: update_id={}, error={}", update.update_id, e)
+            key = ("update", update.update_id)
+        if not self._slots.acquire(blocking=block):
+            metrics.incr("dispatcher.rejected")
+            return False
+        with self._lock:
+            backlog = self.chats.get(key)
+            start = backlog is None
+            if start:
+                backlog = self.chats[key] = deque()
+            backlog.append((update, time.perf_counter()))
+            self.pending += 1
+            self._report(metrics)
+        if start:
+            self.executor.submit(self._run, key)
+        return True
+
+    def submit_all(self, updates):
+        """依次提交一批更新 (达到上限时等待)"""
+        for update in updates:
+            self.submit(update)
+
+    def _run(self, key):
+        """处理聊天队首的一条更新，处理完后如果还有积压则重新排队"""
+        metrics = get_metrics()
+        with self._lock:
+            update, enqueued_at = self.chats[key][0]
+        metrics.observe("dispatcher.wait", time.perf_counter() - enqueued_at)
+        try:
+            with metrics.timer("bot.update"):
+                self.process(update)
+        except Exception as e:
+            metrics.incr("bot.update_error")
+            logger.exception("处理更新失败: update_id={}, error={}", update.update_id, e)
+        finally:
+            with self._lock:
+                backlog = self.chats[key]
+                backlog.popleft()
+                more = bool(backlog)
+                if not more:
+                    del self.chats[key]
+                self.pending -= 1
+                self._report(metrics)
+                if not self.pending:
+                    self._idle.notify_all()
+            self._slots.release()
+            if more:
+                self.executor.submit(self._run, key)
+
+    def _report(self, metrics):
+        """更新队列指标 (调用方需持有 _lock)，聊天数量受 max_pending 限制，每次遍历求最大积压"""
+        metrics.set_gauge("dispatcher.queue_depth", self.pending)
+        metrics.set_gauge("dispatcher.active_chats", len(self.chats))
+        metrics.set_gauge("dispatcher.max_chat_backlog", max(map(len, self.chats.values()), default=0))
+
+    def chat_backlogs(self, limit=10):
+        """积压最多的聊天: [(聊天, 积压数量), ...]"""
+        with self._lock:
+            backlogs = [(key, len(backlog)) for key, backlog in self.chats.items()]
+        return sorted(backlogs, key=lambda item: item[1], reverse=True)[:limit]
+
+    def wait_idle(self, timeout=None):
+        """等待所有已提交的更新处理完成"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self.pending, timeout)
+
+    def shutdown(self, timeout=None):
+        """处理完已提交的更新后关闭线程池"""
+        self.wait_idle(timeout)
+        self.executor.shutdown(wait=False)
+
+
+def create_dispatcher(bot=None):
+    """
+    创建分发器实例，并赋值给全局变量_dispatcher
+    接管 bot.process_new_updates：轮询和 Webhook 两种模式拉到的更新都交给分发器，
+    TeleBot 自身改为在分发器线程中同步执行处理函数
+    """
+    global _dispatcher
+    if not _dispatcher:
+        if bot is None:
+            from app.bot.core.bot_instance import bot
+        process_new_updates = bot.process_new_updates
+        dispatcher = UpdateDispatcher(lambda update: process_new_updates([update]))
+
+        def dispatch_new_updates(updates):
+            # 轮询依赖 last_update_id 计算下一次拉取的 offset，必须在入队时就更新
+            for update in updates:
+                if update.update_id > bot.last_update_id:
+                    bot.last_update_id = update.update_id
+            dispatcher.submit_all(updates)
+
+        bot.threaded = False
+        bot.process_new_updates = dispatch_new_updates
+        _dispatcher = dispatcher
+    return _dispatcher
+
+
+def get_dispatcher():
+    """获取分发器实例"""
+    global _dispatcher
+    if not _dispatcher:
+        _dispatcher = create_dispatcher()
+    return _dispatcher
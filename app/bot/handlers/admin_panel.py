@@ -28,7 +28,10 @@ from app.bot.handlers.admin_handlers import (
     get_block_users,
     block_user_command,
     unblock_user_command,
-    set_whitelist_user
+    set_whitelist_user,
+    get_metrics_command,
+    get_scheduler_stats_command,
+    get_top_earners_command
 )
 
 
@@ -88,6 +91,7 @@ def create_score_management_panel():
         InlineKeyboardButton("减少用户积分", callback_data="admin_reduce_score"),
         InlineKeyboardButton("查看用户积分", callback_data="admin_get_score"),
         InlineKeyboardButton("积分排行榜", callback_data="admin_get_score_chart"),
+        InlineKeyboardButton("本周积分收入榜", callback_data="admin_get_top_earners"),
         InlineKeyboardButton("随机增加积分 (签到时间)", callback_data="admin_random_give_score_by_checkin_time"),
         InlineKeyboardButton("随机增加积分 (注册时间)", callback_data="admin_add_random_score"),
         InlineKeyboardButton("返回主菜单", callback_data="admin_main_menu")
@@ -107,6 +111,8 @@ def create_status_management_panel():
         InlineKeyboardButton("获取即将过期用户", callback_data="admin_get_expiring_users"),
         InlineKeyboardButton("清理过期用户", callback_data="admin_clean_expired_users"),
         InlineKeyboardButton("开启/关闭消息清理", callback_data="admin_toggle_clean_msg_system"),
+        InlineKeyboardButton("运行指标", callback_data="admin_get_metrics"),
+        InlineKeyboardButton("定时任务", callback_data="admin_get_scheduler_stats"),
         InlineKeyboardButton("返回主菜单", callback_data="admin_main_menu")
     )
     return markup
@@ -244,6 +250,11 @@ def admin_panel_callback(call):
             bot.send_message(chat_id, "请输入要显示的排行榜用户数量（默认10）：<30S未输入自动退出>", reply_markup=markup,
                              delay=30)
             bot.register_next_step_handler(call.message, get_score_chart_command)
+        case "admin_get_top_earners":
+            bot.delete_message(chat_id, call.message.message_id)
+            bot.send_message(chat_id, "请输入要显示的排行榜用户数量（默认10）：<30S未输入自动退出>", reply_markup=markup,
+                             delay=30)
+            bot.register_next_step_handler(call.message, get_top_earners_command)
         case "admin_random_give_score_by_checkin_time":
             bot.delete_message(chat_id, call.message.message_id)
             bot.send_message(chat_id, "请输入签到时间范围和最大积分数（格式：范围 最大积分）：<30S未输入自动退出>",
@@ -269,5 +280,9 @@ def admin_panel_callback(call):
             clean_expired_users_command(call.message)
         case "admin_toggle_clean_msg_system":
             toggle_clean_msg_system_command(call.message)
+        case "admin_get_metrics":
+            get_metrics_command(call.message)
+        case "admin_get_scheduler_stats":
+            get_scheduler_stats_command(call.message)
         case _:
             bot.send_message(chat_id, "未知操作，请重试！")
@@ -3,12 +3,15 @@ import json
 from app.services.user_service import UserService
 from app.services.score_service import ScoreService
 from app.services.invite_code_service import InviteCodeService
+from app.utils.invite_code_index import get_invite_code_index
+from app.models import ScoreLedger
 from app.utils.message_queue import get_message_queue
 from app.utils.mailu import get_mailu
 from app.utils.logger import logger
 from config import settings
 from datetime import datetime, timedelta
-from app.bot.core.bot_instance import bot
+from app.bot.core.bot_instance import bot, reply_to_async
+from app.utils.db_utils import run_db
 from app.bot.validators import user_exists, confirmation_required, score_enough, chat_type_required, service_id_exists
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 
@@ -16,6 +19,17 @@ from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 mailu = get_mailu()
 message_queue = get_message_queue()
 
+# 积分流水原因的显示名称
+SCORE_REASON_NAMES = {
+    ScoreLedger.REASON_OPENING: "期初余额",
+    ScoreLedger.REASON_CHECKIN: "签到",
+    ScoreLedger.REASON_GIVE: "赠送",
+    ScoreLedger.REASON_RED_PACKET: "积分红包",
+    ScoreLedger.REASON_INVITE_PURCHASE: "购买邀请码",
+    ScoreLedger.REASON_MAIL_PURCHASE: "注册邮箱",
+    ScoreLedger.REASON_ADMIN: "管理员调整",
+}
+
 @bot.message_handler(commands=['line'])
 @user_exists()
 def get_line_command(message):
@@ -23,7 +37,7 @@ def get_line_command(message):
   处理 /help 命令，输出详细的命令使用说明
   """
     telegram_id = message.from_user.id
-    logger.info(f"用户 {telegram_id} 执行了 /line 命令")
+    logger.info("用户 {} 执行了 /line 命令", telegram_id)
     response = '''
         *音海拾贝 Navidrome 服务信息！*
         ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -47,7 +61,7 @@ def help_command(message):
   处理 /help 命令，输出详细的命令使用说明
   """
     telegram_id = message.from_user.id
-    logger.info(f"用户 {telegram_id} 执行了 /help 命令")
+    logger.info("用户 {} 执行了 /help 命令", telegram_id)
     # response = '''
     #     *音海拾贝 Navidrome 服务信息！*
     #     ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -138,20 +152,20 @@ def register_user_command(message):
     else:
         args = message.text.split()
     if len(args) != 2:
-        logger.info(f"参数错误: args={args}")
+        logger.info("参数错误: args={}", args)
         bot.reply_to(message, "参数错误，请提供用户名和密码，格式为：用户名 密码")
         return
 
     username, password = args
     telegram_id = message.from_user.id
-    logger.info(f"开始注册用户: telegram_id={telegram_id}, service_type={settings.SERVICE_TYPE}")
+    logger.info("开始注册用户: telegram_id={}, service_type={}", telegram_id, settings.SERVICE_TYPE)
 
     user = UserService.register_user(telegram_id, settings.SERVICE_TYPE, username, password)
     if user:
-        logger.info(f"用户注册成功: telegram_id={telegram_id}, user_id={user.id}")
+        logger.info("用户注册成功: telegram_id={}, user_id={}", telegram_id, user.id)
         bot.send_message(message.chat.id, f"注册成功！欢迎 {message.from_user.username} ")
     else:
-        logger.error(f"用户注册失败: telegram_id={telegram_id}")
+        logger.error("用户注册失败: telegram_id={}", telegram_id)
         bot.send_message(message.chat.id, "服务器用户重名了，请重试!")
 
 
@@ -163,17 +177,17 @@ def reg_score_user_command(message):
     """
     telegram_id = message.from_user.id
     username = message.from_user.username
-    logger.info(f"开始注册用户积分账号: telegram_id={telegram_id}, service_type={settings.SERVICE_TYPE}")
+    logger.info("开始注册用户积分账号: telegram_id={}, service_type={}", telegram_id, settings.SERVICE_TYPE)
 
     user = UserService.get_user_by_telegram_id(telegram_id=telegram_id)
     if user:
-        logger.info(f"本地用户已存在: user_id={user.id}")
+        logger.info("本地用户已存在: user_id={}", user.id)
         bot.reply_to(message, f"积分账号已存在，请勿重复注册")
     else:
         # 在本地数据库中创建用户
         user = UserService.register_local_user(telegram_id=telegram_id, username=username)
         user.save()
-        logger.info(f"本地用户创建成功: user_id={user.id}")
+        logger.info("本地用户创建成功: user_id={}", user.id)
         bot.reply_to(message, f"本地积分账号注册成功，欢迎您: {username}！")
 
 
@@ -187,7 +201,7 @@ def delete_user_command(message):
     telegram_id = message.from_user.id
     service_type = settings.SERVICE_TYPE  # 假设要删除的是 Navidrome 账号
 
-    logger.info(f"用户请求删除账户: telegram_id={telegram_id}, service_type={service_type}")
+    logger.info("用户请求删除账户: telegram_id={}, service_type={}", telegram_id, service_type)
 
     # 查找本地数据库中的用户
     user = UserService.get_user_by_telegram_id(telegram_id)
@@ -196,14 +210,14 @@ def delete_user_command(message):
         success = UserService.delete_user(user)
         if success:
             logger.info(
-                f"用户删除成功: telegram_id={telegram_id}, service_type={service_type}, username={user.username}")
+                "用户删除成功: telegram_id={}, service_type={}, username={}", telegram_id, service_type, user.username)
             bot.reply_to(message, "您的账户已成功删除!")
         else:
             logger.error(
-                f"用户删除失败: telegram_id={telegram_id}, service_type={service_type}, username={user.username}")
+                "用户删除失败: telegram_id={}, service_type={}, username={}", telegram_id, service_type, user.username)
             bot.reply_to(message, "删除服务器账户失败，本地账户已删除!")
     else:
-        logger.warning(f"用户不存在: telegram_id={telegram_id}, service_type={service_type}")
+        logger.warning("用户不存在: telegram_id={}, service_type={}", telegram_id, service_type)
         bot.reply_to(message, "未找到您的账户信息，如已在服务器注册，请使用/bind命令绑定!")
 
 
@@ -228,14 +242,14 @@ def use_invite_code_command(message):
 
     user = UserService.get_user_by_telegram_id(telegram_id)
     if user and user.invite_code:
-        logger.info(f"已使用过邀请码用户注册！")
+        logger.info("已使用过邀请码用户注册！")
         bot.send_message(message.chat.id, f"邀请码验证通过，请输入用户名和密码(格式：用户名 密码)：<30s后自动退出>",
                          delay=30)
         bot.register_next_step_handler(message, register_user_command)
         return
 
-        # 验证邀请码的有效性
-    invite_code = InviteCodeService.get_invite_code(code)
+    # 验证邀请码的有效性，内存索引判定无效的邀请码不再查询数据库
+    invite_code = InviteCodeService.get_invite_code(code) if get_invite_code_index().might_be_valid(code) else None
     if not invite_code:
         bot.reply_to(message, "邀请码无效或已过期！")
         return
@@ -244,23 +258,22 @@ def use_invite_code_command(message):
         bot.reply_to(message, "邀请码已被使用")
         return
 
-    expire_time = invite_code.create_time + timedelta(days=invite_code.expire_days)
-    if expire_time < datetime.now():
+    if invite_code.is_expired():
         bot.reply_to(message, "邀请码已过期")
         return
 
-    logger.info(f"注册本地用户")
+    logger.info("注册本地用户")
     user = UserService.register_local_user(telegram_id=telegram_id, invite_code=code)
     if user:
         success = InviteCodeService.use_invite_code(code, telegram_id)
         if not success:
-            logger.warning(f"邀请码使用失败：{code}")
+            logger.warning("邀请码使用失败：{}", code)
         else:
-            logger.info(f"邀请码成功使用！")
+            logger.info("邀请码成功使用！")
             bot.reply_to(message, f"邀请码验证通过，请输入用户名和密码(格式：用户名 密码)：<30s后自动退出>", delay=30)
             bot.register_next_step_handler(message, register_user_command)
     else:
-        logger.warning(f"本地用户注册失败！")
+        logger.warning("本地用户注册失败！")
         bot.reply_to(message, "本地用户注册失败！")
 
 
@@ -293,7 +306,7 @@ def use_renew_code_command(message):
             bot.reply_to(message, "续期码使用失败，请检查续期码是否正确或是否已过期。")
 
     except Exception as e:
-        logger.error(f"使用续期码失败: {e}")
+        logger.error("使用续期码失败: {}", e)
         bot.reply_to(message, "使用续期码失败，请稍后重试！")
 
 
@@ -305,7 +318,7 @@ def score_command(message):
     telegram_id = message.from_user.id
     service_type = settings.SERVICE_TYPE  # 假设查询的是 Navidrome 账号的积分
 
-    logger.info(f"用户查询积分: telegram_id={telegram_id}, service_type={service_type}")
+    logger.info("用户查询积分: telegram_id={}, service_type={}", telegram_id, service_type)
 
     # 查找本地数据库中的用户
     user = UserService.get_user_by_telegram_id(telegram_id)
@@ -313,14 +326,20 @@ def score_command(message):
         # 调用服务层的获取用户积分方法
         score = ScoreService.get_user_score(user.id)
         if score is not None:
-            logger.info(f"用户积分查询成功: telegram_id={telegram_id}, username={user.username}, score={score}")
-            bot.reply_to(message, f"您的积分: {score}")
+            logger.info("用户积分查询成功: telegram_id={}, username={}, score={}", telegram_id, user.username, score)
+            response = f"您的积分: {score}"
+            history = ScoreService.get_score_history(user.id, limit=5)
+            if history:
+                response += "\n-------\n最近的积分变动:\n"
+                for entry in history:
+                    response += f"{entry.ts}  {entry.delta:+d}  {SCORE_REASON_NAMES.get(entry.reason, entry.reason)}\n"
+            bot.reply_to(message, response)
         else:
-            logger.error(f"用户积分查询失败: telegram_id={telegram_id}, username={user.username}")
+            logger.error("用户积分查询失败: telegram_id={}, username={}", telegram_id, user.username)
             bot.reply_to(message, "查询积分失败，请重试!")
 
     else:
-        logger.warning(f"用户不存在: telegram_id={telegram_id}, service_type={service_type}")
+        logger.warning("用户不存在: telegram_id={}, service_type={}", telegram_id, service_type)
         bot.reply_to(message, "未找到您的账户信息!")
 
 
@@ -332,7 +351,7 @@ def checkin_command(message):
     telegram_id = message.from_user.id
     service_type = settings.SERVICE_TYPE  # 假设是 Navidrome 账号签到
 
-    logger.info(f"用户请求签到: telegram_id={telegram_id}, service_type={service_type}")
+    logger.info("用户请求签到: telegram_id={}, service_type={}", telegram_id, service_type)
 
     # 查找本地数据库中的用户
     user = UserService.get_user_by_telegram_id(telegram_id)
@@ -341,13 +360,13 @@ def checkin_command(message):
         score = ScoreService.sign_in(user.id)
         if score:
             logger.info(
-                f"用户签到成功: telegram_id={telegram_id}, service_type={service_type}, username={user.username}")
+                "用户签到成功: telegram_id={}, service_type={}, username={}", telegram_id, service_type, user.username)
             bot.reply_to(message, f"签到成功! 获得了{score}积分!")
         else:
-            logger.warning(f"用户签到失败: telegram_id={telegram_id}, service_type={service_type}")
+            logger.warning("用户签到失败: telegram_id={}, service_type={}", telegram_id, service_type)
             bot.reply_to(message, "签到失败，您今天已签到!")
     else:
-        logger.warning(f"用户不存在: telegram_id={telegram_id}, service_type={service_type}")
+        logger.warning("用户不存在: telegram_id={}, service_type={}", telegram_id, service_type)
         bot.reply_to(message, "未找到您的账户信息!")
 
 
@@ -361,7 +380,7 @@ def buy_invite_code_command(message):
     telegram_id = message.from_user.id
     service_type = settings.SERVICE_TYPE
 
-    logger.info(f"用户请求购买邀请码: telegram_id={telegram_id}, service_type={service_type}")
+    logger.info("用户请求购买邀请码: telegram_id={}, service_type={}", telegram_id, service_type)
 
     # 查找本地数据库中的用户
     user = UserService.get_user_by_telegram_id(telegram_id)
@@ -370,43 +389,43 @@ def buy_invite_code_command(message):
         required_score = settings.INVITE_CODE_PRICE
         if user.score >= required_score:
             # 扣除积分
-            success = ScoreService.reduce_score(user.id, required_score)
+            success = ScoreService.reduce_score(user.id, required_score, reason=ScoreLedger.REASON_INVITE_PURCHASE)
             if success:
                 # 生成邀请码
                 invite_code = InviteCodeService.generate_invite_code(telegram_id)
                 if invite_code:
                     logger.info(
-                        f"用户购买邀请码成功: telegram_id={telegram_id}, service_type={service_type}, code={invite_code.code}, username={user.username}")
+                        "用户购买邀请码成功: telegram_id={}, service_type={}, code={}, username={}", telegram_id, service_type, invite_code.code, user.username)
                     bot.reply_to(message, f"购买邀请码成功，您的邀请码是：<code>{invite_code.code}</code>，请妥善保管！",
                                  parse_mode='HTML', delay=None)
                 else:
                     logger.error(
-                        f"用户购买邀请码失败，生成邀请码失败: telegram_id={telegram_id}, service_type={service_type}, username={user.username}")
+                        "用户购买邀请码失败，生成邀请码失败: telegram_id={}, service_type={}, username={}", telegram_id, service_type, user.username)
                     bot.reply_to(message, "购买邀请码失败，生成邀请码失败，请重试！")
             else:
                 logger.error(
-                    f"用户购买邀请码失败，扣除积分失败: telegram_id={telegram_id}, service_type={service_type}, username={user.username}")
+                    "用户购买邀请码失败，扣除积分失败: telegram_id={}, service_type={}, username={}", telegram_id, service_type, user.username)
                 bot.reply_to(message, "购买邀请码失败，扣除积分失败，请重试！")
         else:
             logger.warning(
-                f"用户购买邀请码失败，积分不足: telegram_id={telegram_id}, service_type={service_type}, username={user.username}")
+                "用户购买邀请码失败，积分不足: telegram_id={}, service_type={}, username={}", telegram_id, service_type, user.username)
             bot.reply_to(message, f"购买邀请码失败，您的积分不足，邀请码需要 {required_score} 积分！")
     else:
-        logger.warning(f"用户不存在: telegram_id={telegram_id}, service_type={service_type}")
+        logger.warning("用户不存在: telegram_id={}, service_type={}", telegram_id, service_type)
         bot.reply_to(message, "未找到您的账户信息!")
 
 
 @chat_type_required(["group", "supergroup"])
 @user_exists(negate=True)
-def info_command(message):
+async def info_command(message):
     """
     处理 /info 命令，用户信息查询
     """
     telegram_id = message.from_user.id
-    user = UserService.get_user_by_telegram_id(telegram_id)
+    user = await run_db(UserService.get_user_by_telegram_id, telegram_id)
     if user:
-        logger.info(f"user: {user}")
-        logger.info(f"用户信息查询成功: telegram_id={telegram_id}, user_id={user.id}")
+        logger.info("user: {}", user)
+        logger.info("用户信息查询成功: telegram_id={}, user_id={}", telegram_id, user.id)
         response = f"您的信息如下：\n" \
                    f"Telegram ID: {user.telegram_id}\n" \
                    f"用户名: {user.username}\n" \
@@ -414,10 +433,10 @@ def info_command(message):
                    f"状态: {user.status}\n" \
                    f"本地数据库ID: {user.id}\n" \
                    f"服务器用户ID: {user.service_user_id}"
-        bot.reply_to(message, response)
+        await reply_to_async(message, response)
     else:
-        logger.error(f"用户信息查询失败: telegram_id={telegram_id}")
-        bot.reply_to(message, "未注册用户，请先注册！")
+        logger.error("用户信息查询失败: telegram_id={}", telegram_id)
+        await reply_to_async(message, "未注册用户，请先注册！")
 
 
 @chat_type_required(["group", "supergroup"])
@@ -431,7 +450,7 @@ def give_score_command(message):
     telegram_id = message.from_user.id
     service_type = settings.SERVICE_TYPE
 
-    logger.info(f"用户请求赠送积分: telegram_id={telegram_id}, service_type={service_type}")
+    logger.info("用户请求赠送积分: telegram_id={}, service_type={}", telegram_id, service_type)
 
     if message.text.startswith('/'):
         args = message.text.split()[1:]
@@ -465,21 +484,24 @@ def give_score_command(message):
         bot.reply_to(message, f"未找到接收者 {receiver_telegram_id} 的账户信息！")
         return
 
+    if score <= 0:
+        bot.reply_to(message, "赠送的积分必须大于 0！")
+        return
+
     # 检查赠送者积分是否足够
     if sender.score < score:
         bot.reply_to(message, f"您的积分不足，无法赠送 {score} 积分！")
         return
 
-    # 扣除赠送者积分，增加接收者积分
-    sender = ScoreService.reduce_score(sender.id, score)
-    receiver = ScoreService.add_score(receiver.id, score)
+    # 扣除赠送者积分，增加接收者积分，在同一个事务中完成
+    result = ScoreService.transfer_score(sender.id, receiver.id, score)
 
-    if sender and receiver:
-        logger.info(f"用户赠送积分成功: sender_id={sender.id}, receiver_id={receiver.id}, score={score}")
+    if result:
+        logger.info("用户赠送积分成功: sender_id={}, receiver_id={}, score={}", sender.id, receiver.id, score)
         bot.reply_to(message, f"您已成功向用户 {receiver_telegram_id} 赠送 {score} 积分!")
     else:
-        logger.error(f"用户赠送积分失败: sender_id={sender.id}, receiver_id={receiver.id}, score={score}")
-        bot.reply_to(message, f"积分赠送失败，请重试!")
+        logger.error("用户赠送积分失败: sender_id={}, receiver_id={}, score={}", sender.id, receiver.id, score)
+        bot.reply_to(message, f"积分赠送失败，请确认积分是否足够后重试!")
 
 
 @chat_type_required(["group", "supergroup"])
@@ -491,7 +513,7 @@ def bind_command(message):
     telegram_id = message.from_user.id
     service_type = settings.SERVICE_TYPE
 
-    logger.info(f"用户请求绑定账户: telegram_id={telegram_id}, service_type={service_type}")
+    logger.info("用户请求绑定账户: telegram_id={}, service_type={}", telegram_id, service_type)
 
     if message.text.startswith('/'):
         args = message.text.split()[1:]
@@ -508,23 +530,23 @@ def bind_command(message):
     if user_id:
         user = UserService.get_user_by_service_user_id(user_id)
         if user:
-            logger.info(f"{telegram_id}请求换绑TG！")
+            logger.info("{}请求换绑TG！", telegram_id)
             u = UserService.update_user_telegram_id(user, telegram_id)
             if u:
                 bot.reply_to(message, "Telegram 换绑成功")
-                logger.info(f"用户换绑成功：telegram_id={telegram_id}")
+                logger.info("用户换绑成功：telegram_id={}", telegram_id)
             else:
                 bot.reply_to(message, "Telegram 换绑失败！")
-                logger.error(f"用户换绑失败：telegram_id={telegram_id}")
+                logger.error("用户换绑失败：telegram_id={}", telegram_id)
         else:    
             logger.info(
-                f"用户绑定账户成功: telegram_id={telegram_id}, service_type={service_type}, username={username}, user_id={user_id}")
+                "用户绑定账户成功: telegram_id={}, service_type={}, username={}, user_id={}", telegram_id, service_type, username, user_id)
             user = UserService.register_local_user(telegram_id=telegram_id, service_type=service_type,
                                                 service_user_id=user_id, username=username)
             bot.reply_to(message, "账户绑定成功!")
     else:
         logger.error(
-            f"用户绑定账户失败: telegram_id={telegram_id}, service_type={service_type}, username={username}, user_id={user_id}")
+            "用户绑定账户失败: telegram_id={}, service_type={}, username={}, user_id={}", telegram_id, service_type, username, user_id)
         bot.reply_to(message, "账户绑定失败，请重试!")
 
 
@@ -539,17 +561,17 @@ def unbind_command(message):
     telegram_id = message.from_user.id
     service_type = settings.SERVICE_TYPE
 
-    logger.info(f"用户请求解绑账户: telegram_id={telegram_id}, service_type={service_type}")
+    logger.info("用户请求解绑账户: telegram_id={}, service_type={}", telegram_id, service_type)
 
     # 查找本地数据库中的用户
     user = UserService.get_user_by_telegram_id(telegram_id)
     if user:
         # 删除本地用户
         UserService.delete_local_user(user)
-        logger.info(f"用户解绑成功: telegram_id={telegram_id}, service_type={service_type}")
+        logger.info("用户解绑成功: telegram_id={}, service_type={}", telegram_id, service_type)
         bot.reply_to(message, "解绑成功！已删除您的本地账户信息。")
     else:
-        logger.warning(f"用户不存在: telegram_id={telegram_id}, service_type={service_type}")
+        logger.warning("用户不存在: telegram_id={}, service_type={}", telegram_id, service_type)
         bot.reply_to(message, "未找到您的账户信息！")
 
 
@@ -557,79 +579,79 @@ def unbind_command(message):
 # @user_exists(negate=True)
 @service_id_exists
 @confirmation_required(f"你确定要重置密码嘛？")
-def reset_password_command(message):
+async def reset_password_command(message):
     """
     处理 /reset_password 命令，重置密码
     """
     telegram_id = message.from_user.id
     service_type = settings.SERVICE_TYPE
 
-    logger.info(f"用户请求重置密码: telegram_id={telegram_id}, service_type={service_type}")
+    logger.info("用户请求重置密码: telegram_id={}, service_type={}", telegram_id, service_type)
 
     if message.text.startswith('/'):
         args = message.text.split()[1:]
     else:
         args = message.text.split()
     if len(args) != 1:
-        bot.reply_to(message, "参数错误，请提供新密码，格式为：/reset_password <new_password>")
+        await reply_to_async(message, "参数错误，请提供新密码，格式为：/reset_password <new_password>")
         return
 
     new_password = args[0]
-    user = UserService.get_user_by_telegram_id(telegram_id)
-    if user and UserService.get_info_in_service_by_user_id(user.service_user_id):
+    user = await run_db(UserService.get_user_by_telegram_id, telegram_id)
+    if user and await UserService.get_info_in_service_by_user_id_async(user.service_user_id):
         # 重置密码
-        result = UserService.reset_password(user, new_password=new_password)
+        result = await UserService.reset_password_async(user, new_password=new_password)
         if result:
-            logger.info(f"用户重置密码成功: telegram_id={telegram_id}, service_type={service_type}")
-            bot.reply_to(message, "密码重置成功！")
+            logger.info("用户重置密码成功: telegram_id={}, service_type={}", telegram_id, service_type)
+            await reply_to_async(message, "密码重置成功！")
         else:
-            logger.warning(f"服务请求失败了: telegram_id={telegram_id}, service_type={service_type}")
-            bot.reply_to(message, "密码重置失败，请联系管理员！")
+            logger.warning("服务请求失败了: telegram_id={}, service_type={}", telegram_id, service_type)
+            await reply_to_async(message, "密码重置失败，请联系管理员！")
 
     else:
-        logger.warning(f"用户不存在: telegram_id={telegram_id}, service_type={service_type}")
-        bot.reply_to(message, "该用户未注册！")
+        logger.warning("用户不存在: telegram_id={}, service_type={}", telegram_id, service_type)
+        await reply_to_async(message, "该用户未注册！")
 
 
 @chat_type_required(["group", "supergroup"])
 # @user_exists(negate=True)
 @service_id_exists
-def reset_username_command(message):
+async def reset_username_command(message):
     """
     处理 /reset_username 命令，重置用户名
     """
     telegram_id = message.from_user.id
     service_type = settings.SERVICE_TYPE
 
-    logger.info(f"用户请求重置用户名: telegram_id={telegram_id}, service_type={service_type}")
+    logger.info("用户请求重置用户名: telegram_id={}, service_type={}", telegram_id, service_type)
 
     if message.text.startswith('/'):
         args = message.text.split()[1:]
     else:
         args = message.text.split()
     if len(args) != 1:
-        bot.reply_to(message, "参数错误，请提供新用户名，格式为：/reset_username <new_username>")
+        await reply_to_async(message, "参数错误，请提供新用户名，格式为：/reset_username <new_username>")
         return
 
     new_username = args[0]
-    user = UserService.get_user_by_telegram_id(telegram_id)
+    user = await run_db(UserService.get_user_by_telegram_id, telegram_id)
     if user and user.username != new_username:
-        if UserService.get_info_in_service_by_user_id(user.service_user_id):
+        if await UserService.get_info_in_service_by_user_id_async(user.service_user_id):
             # 重置用户名
-            result = UserService.reset_username(user, new_username=new_username)
+            result = await UserService.reset_username_async(user, new_username=new_username)
             if result:
-                UserService.update_user_name(user, new_username)
-                logger.info(f"用户重置用户名成功: telegram_id={telegram_id}, service_type={service_type}")
-                bot.reply_to(message, f"用户名重置成功，请使用{new_username}登录！")
+                await run_db(UserService.update_user_name, user, new_username)
+                logger.info("用户重置用户名成功: telegram_id={}, service_type={}", telegram_id, service_type)
+                await reply_to_async(message, f"用户名重置成功，请使用{new_username}登录！")
             else:
-                logger.warning(f"服务器出错: telegram_id={telegram_id}, service_type={service_type}")
-                bot.reply_to(message, "服务器出错，请联系管理员！")
+                logger.warning("服务器出错: telegram_id={}, service_type={}", telegram_id, service_type)
+                await reply_to_async(message, "服务器出错，请联系管理员！")
         else:
-            logger.warning(f"服务器无该用户: telegram_id={telegram_id}, service_type={service_type}")
-            bot.reply_to(message, "服务器找不到该用户！")
+            logger.warning("服务器无该用户: telegram_id={}, service_type={}", telegram_id, service_type)
+            await reply_to_async(message, "服务器找不到该用户！")
     else:
-        logger.warning(f"用户重名: telegram_id={telegram_id}, service_type={service_type}")
-        bot.reply_to(message, "用户重名，请重新选择用户名！")
+        logger.warning("用户重名: telegram_id={}, service_type={}", telegram_id, service_type)
+        await reply_to_async(message, "用户重名，请重新选择用户名！")
 
 
 @chat_type_required(["private"])
@@ -654,19 +676,21 @@ def random_score_command(message):
         bot.reply_to(message, "参数错误，参与人数和总积分数必须是整数！")
 
         return
-    event_id = ScoreService.create_random_score_event(create_user_id=message.from_user.id,
-                                                      telegram_chat_id=message.chat.id, total_score=total_score,
-                                                      participants_count=participants_count)
+    if participants_count <= 0 or total_score < participants_count:
+        bot.reply_to(message, "参数错误，参与人数必须大于0且不能超过总积分数！")
+        return
+
+    # 先扣除积分再创建活动，两步在同一个事务中完成，积分不足时不会创建活动
+    user = UserService.get_user_by_telegram_id(message.from_user.id)
+    event_id = ScoreService.send_random_score_event(user_id=user.id, create_user_id=message.from_user.id,
+                                                    telegram_chat_id=message.chat.id, total_score=total_score,
+                                                    participants_count=participants_count)
     if not event_id:
-        bot.reply_to(message, "创建积分活动失败")
+        bot.reply_to(message, "创建积分活动失败，请检查积分是否足够！")
 
         return
 
-    user = UserService.get_user_by_telegram_id(message.from_user.id)
-    logger.info(
-        f"用户 {user.username} 发送了总分为{total_score}分随机积分红包，原有积分为{user.score}分, 剩余积分为{user.score - total_score}分")
-    if ScoreService.reduce_score(user.id, total_score):
-        logger.info(f"积分成功扣除{total_score}分")
+    logger.info("用户 {} 发送了总分为{}分随机积分红包，积分成功扣除{}分", user.username, total_score, total_score)
 
     keyboard = InlineKeyboardMarkup(
         [
@@ -693,7 +717,7 @@ def handle_random_score_callback(call):
         bot.send_message(call.message.chat.id,
                          f"未注册用户[{user_name}](https://t.me/{user_name})，请使用`/reg_score_user`注册积分账号。",
                          parse_mode="Markdown", disable_web_page_preview=True)
-        logger.info(f"未注册用户{user_name}")
+        logger.info("未注册用户{}", user_name)
 
         return
 
@@ -708,7 +732,7 @@ def handle_random_score_callback(call):
             response += f"-----------------------\n"
             for item in score_result:
                 response += f"用户: [{item['user_name']}](https://t.me/{item['user_name']})，获取积分： {item['score']}分\n"
-            logger.info(f"chat: {call.message.chat.id}, message_id: {call.message.message_id}")
+            logger.info("chat: {}, message_id: {}", call.message.chat.id, call.message.message_id)
             bot.edit_message_text(chat_id=call.message.chat.id, message_id=call.message.message_id, text=f"{response}",
                                   parse_mode="Markdown", disable_web_page_preview=True, delay=30)
 
@@ -731,7 +755,7 @@ def register_mail_command(message):
     else:
         args = message.text.split()
     if len(args) != 2:
-        logger.info(f"参数错误: args={args}")
+        logger.info("参数错误: args={}", args)
         bot.reply_to(message, "参数错误，请提供用户名和密码，格式为：用户名 密码")
         return
 
@@ -739,7 +763,7 @@ def register_mail_command(message):
     telegram_id = message.from_user.id
     service_type = settings.SERVICE_TYPE
 
-    logger.info(f"用户请求注册邮件: telegram_id={telegram_id}, service_type={service_type}")
+    logger.info("用户请求注册邮件: telegram_id={}, service_type={}", telegram_id, service_type)
 
     # 查找本地数据库中的用户
     user = UserService.get_user_by_telegram_id(telegram_id)
@@ -750,19 +774,20 @@ def register_mail_command(message):
             domain_prefix = "@makifx.com"
             result = mailu.create_user(f"{username}{domain_prefix}", password)
             if result and result['status'] == 'success':
-                logger.info(f"用户注册邮件成功：telegram_id = {telegram_id}, user = {user.username}")
-                success = ScoreService.reduce_score(user.id, required_score)
+                logger.info("用户注册邮件成功：telegram_id = {}, user = {}", telegram_id, user.username)
+                success = ScoreService.reduce_score(user.id, required_score,
+                                                    reason=ScoreLedger.REASON_MAIL_PURCHASE)
                 bot.reply_to(message, f"注册音海拾贝专属邮件成功，您的邮箱：<code>{username}{domain_prefix}</code>", parse_mode="HTML")    
             elif result and result['status'] == "duplicate":
-                logger.warning(f"用户名重复，要求用户重新输入！当前用户：{username}")
+                logger.warning("用户名重复，要求用户重新输入！当前用户：{}", username)
                 bot.reply_to(message, f"用户名重复了，请重新选择用户名继续注册！")
             else:
-                logger.error(f"用户注册邮件失败！telegram_id = {telegram_id}, user = {user.username}")
+                logger.error("用户注册邮件失败！telegram_id = {}, user = {}", telegram_id, user.username)
                 bot.reply_to(message, "注册失败，请联系管理员！")
         else:
             logger.warning(
-                f"用户注册邮件失败，积分不足: telegram_id={telegram_id}, , username={user.username}")
+                "用户注册邮件失败，积分不足: telegram_id={}, , username={}", telegram_id, user.username)
             bot.reply_to(message, f"注册邮件失败，您的积分不足，邀请码需要 {required_score} 积分！")
     else:
-        logger.warning(f"用户不存在: telegram_id={telegram_id}, service_type={service_type}")
+        logger.warning("用户不存在: telegram_id={}, service_type={}", telegram_id, service_type)
         bot.reply_to(message, "未找到您的账户信息!")
\ No newline at end of file
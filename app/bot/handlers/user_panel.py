@@ -133,7 +133,7 @@ def user_panel_callback(call):
             bot.register_next_step_handler(call.message, use_invite_code_command)
         case "user_reg_score":
             bot.answer_callback_query(call.id)
-            logger.info(f"用户积分注册：{call.message.chat.id}")
+            logger.info("用户积分注册：{}", call.message.chat.id)
             reg_score_user_command(mock_message)
         case "user_use_renew_code":
             bot.answer_callback_query(call.id)
@@ -148,7 +148,7 @@ def user_panel_callback(call):
             buy_invite_code_command(mock_message)
         case "user_info":
             bot.answer_callback_query(call.id)
-            info_command(mock_message)
+            return info_command(mock_message)
         case "user_score":
             bot.answer_callback_query(call.id)
             score_command(mock_message)
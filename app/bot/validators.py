@@ -2,7 +2,7 @@
 from functools import wraps
 from app.services.user_service import UserService
 from app.services.invite_code_service import InviteCodeService
-from app.utils.logger import logger
+from app.utils.logger import logger, sampled, throttled
 from datetime import datetime, timedelta
 from app.bot.core.bot_instance import bot
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
@@ -23,37 +23,37 @@ def user_exists(negate=True):
         @wraps(func)
         def wrapper(message, *args, **kwargs):
             telegram_id = message.from_user.id
-            logger.debug(f"校验用户是否存在: telegram_id={telegram_id}")
+            logger.debug("校验用户是否存在: telegram_id={}", telegram_id)
 
             user = UserService.get_user_by_telegram_id(telegram_id=telegram_id)
 
             if user:
                 if negate:
                     # 用户存在且 check_exist=True，允许执行
-                    logger.warning(f"用户存在且允许执行: telegram_id={telegram_id}")
+                    sampled().info("用户存在且允许执行: telegram_id={}", telegram_id)
                     return func(message, *args, **kwargs)
                 else:
                     # 已经注册过本地用户
                     if user.invite_code:
-                        logger.info(f"用户使用过邀请码: telegram_id={telegram_id}")
+                        sampled().info("用户使用过邀请码: telegram_id={}", telegram_id)
                         return func(message, *args, **kwargs)
 
                     if user.username and not user.service_user_id:
-                        logger.info(f"积分用户: telegram_id={telegram_id}")
+                        sampled().info("积分用户: telegram_id={}", telegram_id)
                         return func(message, *args, **kwargs)
                     # 用户存在但 check_exist=False，拒绝执行
-                    logger.info(f"用户存在但不允许执行: telegram_id={telegram_id}")
+                    throttled(("user_exists", telegram_id)).info("用户存在但不允许执行: telegram_id={}", telegram_id)
                     bot.reply_to(message, "用户已存在，操作不允许！")
                     return
             else:
                 if negate:
                     # 用户不存在但 check_exist=True，拒绝执行
-                    logger.info(f"用户不存在且不允许执行: telegram_id={telegram_id}")
+                    throttled(("user_exists", telegram_id)).info("用户不存在且不允许执行: telegram_id={}", telegram_id)
                     bot.reply_to(message, "用户不存在，操作不允许！")
                     return
                 else:
                     # 用户不存在且 check_exist=False，允许执行
-                    logger.info(f"用户不存在且允许执行: telegram_id={telegram_id}")
+                    sampled().info("用户不存在且允许执行: telegram_id={}", telegram_id)
                     return func(message, *args, **kwargs)
 
         return wrapper
@@ -67,15 +67,15 @@ def service_id_exists(func):
     @wraps(func)
     def wrapper(message, *args, **kwargs):
         telegram_id = message.from_user.id
-        logger.debug(f"校验用户是否存在service_user_id: telegram_id={telegram_id}")
+        logger.debug("校验用户是否存在service_user_id: telegram_id={}", telegram_id)
 
         user = UserService.get_user_by_telegram_id(telegram_id=telegram_id)
 
         if user and user.service_user_id:
-            logger.info(f"用户存在service_user_id: telegram_id={telegram_id}")
+            sampled().info("用户存在service_user_id: telegram_id={}", telegram_id)
             return func(message, *args, **kwargs)
         else:
-            logger.info(f"用户不存在service_user_id: telegram_id={telegram_id}")
+            throttled(("service_id_exists", telegram_id)).info("用户不存在service_user_id: telegram_id={}", telegram_id)
             bot.reply_to(message, "用户未注册服务器用户，请注册！")
             return
     
@@ -90,12 +90,12 @@ def admin_required(func):
     @wraps(func)
     def wrapper(message, *args, **kwargs):
         telegram_id = message.from_user.id  # 修改获取 telegram_id 的方式
-        logger.debug(f"校验用户是否是管理员: telegram_id={telegram_id}")
+        logger.debug("校验用户是否是管理员: telegram_id={}", telegram_id)
         if UserService.is_admin(telegram_id):
-            logger.debug(f"用户是管理员: telegram_id={telegram_id}")
+            logger.debug("用户是管理员: telegram_id={}", telegram_id)
             return func(message, *args, **kwargs)
         else:
-            logger.warning(f"用户不是管理员: telegram_id={telegram_id}")
+            logger.warning("用户不是管理员: telegram_id={}", telegram_id)
             bot.reply_to(message, "你没有权限执行此操作!")
             return
 
@@ -131,22 +131,19 @@ def invite_code_valid(func):
     def wrapper(message, *args, **kwargs):
 
         code = message.text.strip()
-        logger.debug(f"校验邀请码是否有效: code={code}")
+        logger.debug("校验邀请码是否有效: code={}", code)
         if not code:
             logger.warning("未提供邀请码")
             bot.reply_to(message, "请提供邀请码!")
             return
 
         # 验证邀请码
-        invite_code = InviteCodeService.get_invite_code(code)
-        expire_time = invite_code.create_time + timedelta(days=invite_code.expire_days)
-
-        if invite_code and not invite_code.is_used and expire_time > datetime.now():
-            logger.debug(f"邀请码有效: code={code}")
+        if InviteCodeService.is_code_available(code):
+            logger.debug("邀请码有效: code={}", code)
             # 邀请码有效，继续执行原函数
             return func(message, *args, **kwargs)
         else:
-            logger.warning(f"邀请码无效: code={code}")
+            logger.warning("邀请码无效: code={}", code)
             bot.reply_to(message, "邀请码无效!")
             return
 
@@ -168,16 +165,16 @@ def score_enough():
             # 通过消息的文本内容获取需要的积分数量
             required_score = int(message.text.split(" ")[-1]) if len(message.text.split(" ")) > 1 else 0
 
-            logger.debug(f"校验用户积分是否足够: telegram_id={telegram_id}, required_score={required_score}")
+            logger.debug("校验用户积分是否足够: telegram_id={}, required_score={}", telegram_id, required_score)
             user = UserService.get_user_by_telegram_id(telegram_id=telegram_id)
 
             if user and user.score >= required_score:
                 logger.debug(
-                    f"用户积分足够: telegram_id={telegram_id}, score={user.score}, required_score={required_score}")
+                    "用户积分足够: telegram_id={}, score={}, required_score={}", telegram_id, user.score, required_score)
                 return func(message, *args, **kwargs)
             else:
                 logger.warning(
-                    f"用户积分不足: telegram_id={telegram_id}, score={user.score if user else 0}, required_score={required_score}")
+                    "用户积分不足: telegram_id={}, score={}, required_score={}", telegram_id, user.score if user else 0, required_score)
                 bot.reply_to(message, "积分不足!")
                 return
 
@@ -204,8 +201,8 @@ def confirmation_required(message_text):
 
             # 发送自定义的确认消息和键盘
             bot.send_message(chat_id, message_text, reply_markup=markup)
-            # logger.info(f"msg: {msg.message_id}")
-            # logger.info(f"yes: {message.message_id}")
+            # logger.info("msg: {}", msg.message_id)
+            # logger.info("yes: {}", message.message_id)
             # 保存当前的命令函数和参数到会话
             user_sessions[chat_id] = {'message': message, 'func': func, 'args': args, 'kwargs': kwargs}
 
@@ -218,6 +215,7 @@ def confirmation_required(message_text):
 def callback_query(call):
     chat_id = call.message.chat.id
     data = call.data
+    result = None
     if chat_id in user_sessions:
         # 获取存储的函数信息
         command_info = user_sessions[chat_id]
@@ -227,8 +225,8 @@ def callback_query(call):
         kwargs = command_info['kwargs']
 
         if data == f"confirm_yes_{chat_id}":
-            # 用户选择“是”，执行原始命令
-            func(message, *args, **kwargs)
+            # 用户选择“是”，执行原始命令 (协程处理函数返回的协程交给调用方执行)
+            result = func(message, *args, **kwargs)
             logger.debug("已确认，命令已执行")
             bot.answer_callback_query(call.id, "继续执行")
         elif data == f"confirm_no_{chat_id}":
@@ -244,6 +242,7 @@ def callback_query(call):
     # bot.answer_callback_query(call.id)
     if settings.ENABLE_MESSAGE_CLEANER:
         message_queue.add_message(call.message)
+    return result
 
 
 def private_chat_only(func):
@@ -255,10 +254,10 @@ def private_chat_only(func):
     def wrapper(message, *args, **kwargs):
         telegram_id = message.from_user.id  # 获取 telegram_id
         if message.chat.type in ["group", "supergroup"]:  # 群组或超级群组
-            logger.debug(f"在群组中收到命令，不响应: chat_id={message.chat.id}, telegram_id={telegram_id}")
+            logger.debug("在群组中收到命令，不响应: chat_id={}, telegram_id={}", message.chat.id, telegram_id)
             return  # 在群组中不执行任何操作
         else:
-            logger.debug(f"在私聊中收到命令，正常响应: chat_id={message.chat.id}, telegram_id={telegram_id}")
+            logger.debug("在私聊中收到命令，正常响应: chat_id={}, telegram_id={}", message.chat.id, telegram_id)
             return func(message, *args, **kwargs)
 
     return wrapper
@@ -283,11 +282,11 @@ def chat_type_required(not_chat_type=None):
                     not_chat_type_list = not_chat_type
                 if message.chat.type in not_chat_type_list:  # 群组或超级群组
                     logger.debug(
-                        f"在{not_chat_type}中收到命令，不响应: chat_id={message.chat.id}, telegram_id={telegram_id}")
+                        "在{}中收到命令，不响应: chat_id={}, telegram_id={}", not_chat_type, message.chat.id, telegram_id)
                     bot.reply_to(message, f"群组中不响应命令，请私聊Bot！")
                     return
             logger.debug(
-                f"在{message.chat.type}中收到命令，正常响应: chat_id={message.chat.id}, telegram_id={telegram_id}")
+                "在{}中收到命令，正常响应: chat_id={}, telegram_id={}", message.chat.type, message.chat.id, telegram_id)
             return func(message, *args, **kwargs)
         return wrapper
     return decorator
@@ -307,14 +306,14 @@ def user_status_required(status=None):
             telegram_id = message.from_user.id
             user = UserService.get_user_by_telegram_id(telegram_id=telegram_id)
             if user and user.status in status:
-                logger.debug(f"用户状态为{status}，允许执行: telegram_id={telegram_id}")
+                logger.debug("用户状态为{}，允许执行: telegram_id={}", status, telegram_id)
                 return func(message, *args, **kwargs)
             elif user and user.status == "blocked":
-                logger.warning(f"用户状态为blocked，不允许执行: telegram_id={telegram_id}")
+                throttled(("user_blocked", telegram_id)).warning("用户状态为blocked，不允许执行: telegram_id={}", telegram_id)
                 bot.send_message(message.chat.id, "你已被封禁，请联系管理员!")
                 return
             else:
-                logger.info(f"用户不在黑名单，正常响应: telegram_id={telegram_id}")
+                sampled().info("用户不在黑名单，正常响应: telegram_id={}", telegram_id)
                 # bot.answer_callback_query(message.id, "你没有权限执行此操作!")
                 # bot.reply_to(message, "你没有权限执行此操作!")
                 return func(message, *args, **kwargs)
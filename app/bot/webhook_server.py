@@ -0,0 +1,153 @@
+import hmac
+import json
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from telebot import types
+from config import settings
+from app.bot.dispatcher import get_dispatcher
+from app.utils.logger import logger
+from app.utils.metrics import get_metrics
+from app.utils.scheduler import get_scheduler
+
+# 需要安装的模块：无 (http.server 是 Python 内置模块)
+
+class WebhookServer:
+    """
+    内置 Webhook 服务器 (设置 WEBHOOK_URL 时启用)
+    HTTP 线程只负责校验和提交，收到更新后立即回复 200，由分发器在线程池中按聊天保序处理。
+    排队的更新达到上限时回复 503，Telegram 会稍后重试同一条更新
+    """
+
+    def __init__(self, bot, listen=settings.WEBHOOK_LISTEN, port=settings.WEBHOOK_PORT,
+                 path=None, secret_token=settings.WEBHOOK_SECRET_TOKEN,
+                 metrics_token=settings.METRICS_TOKEN or settings.WEBHOOK_SECRET_TOKEN):
+        self.bot = bot
+        self.listen = listen
+        self.port = port
+        self.path = path if path is not None else (urlparse(settings.WEBHOOK_URL or "").path or "/")
+        self.secret_token = secret_token
+        self.metrics_token = metrics_token
+        self.dispatcher = get_dispatcher()
+        self.httpd = None
+
+    def enqueue(self, body):
+        """
+        解析并提交一条更新
+
+        Returns:
+            HTTP 状态码：200 已接收，400 格式错误，503 排队的更新已达上限
+        """
+        metrics = get_metrics()
+        try:
+            update = types.Update.de_json(json.loads(body))
+        except (ValueError, TypeError, KeyError) as e:
+            metrics.incr("webhook.bad_request")
+            logger.warning("Webhook 请求格式错误: {}", e)
+            return 400
+        if not self.dispatcher.submit(update, block=False):
+            metrics.incr("webhook.rejected")
+            return 503
+        metrics.incr("webhook.accepted")
+        return 200
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != server.path:
+                    self._reply(404)
+                    return
+                if not self._authorized():
+                    get_metrics().incr("webhook.unauthorized")
+                    self._reply(403)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    self._reply(400)
+                    return
+                if length <= 0 or length > settings.WEBHOOK_MAX_BODY_SIZE:
+                    self._reply(413 if length > 0 else 400)
+                    return
+                self._reply(server.enqueue(self.rfile.read(length)))
+
+            def do_GET(self):
+                # 健康检查
+                if self.path == "/healthz":
+                    self._reply(200, json.dumps({"queue_depth": server.dispatcher.pending}).encode("utf-8"))
+                # 运行指标和定时任务执行情况，必须配置密钥，未配置时拒绝访问
+                elif self.path == "/metrics":
+                    if not self._metrics_authorized():
+                        get_metrics().incr("webhook.unauthorized")
+                        self._reply(403)
+                        return
+                    scheduler = get_scheduler()
+                    body = dict(get_metrics().snapshot(), jobs=scheduler.job_stats(),
+                                recent_runs=scheduler.recent_runs())
+                    self._reply(200, json.dumps(body, ensure_ascii=False, default=str).encode("utf-8"))
+                else:
+                    self._reply(404)
+
+            def _authorized(self):
+                """校验 X-Telegram-Bot-Api-Secret-Token 请求头，未设置密钥时一律拒绝"""
+                return bool(server.secret_token) and hmac.compare_digest(
+                    self.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), server.secret_token)
+
+            def _metrics_authorized(self):
+                """校验 Authorization: Bearer 请求头，未配置 METRICS_TOKEN 和 WEBHOOK_SECRET_TOKEN 时一律拒绝"""
+                if not server.metrics_token:
+                    return False
+                return hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {server.metrics_token}")
+
+            def _reply(self, status, body=b""):
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 访问日志太多，不写入日志文件
+                pass
+
+        return Handler
+
+    def start(self):
+        """启动 HTTP 服务 (不阻塞)"""
+        self.httpd = ThreadingHTTPServer((self.listen, self.port), self._make_handler())
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, name="webhook-http", daemon=True).start()
+        logger.info("Webhook 服务已启动: listen={}:{}, path={}, workers={}", self.listen, self.port, self.path,
+                    self.dispatcher.workers)
+
+    def stop(self):
+        """停止 HTTP 服务，处理完已接收的更新后退出"""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+        self.dispatcher.shutdown()
+
+
+def run_webhook_bot(bot):
+    """
+    以 Webhook 模式运行 Bot：先启动本地服务，再向 Telegram 注册 Webhook
+    未配置 WEBHOOK_SECRET_TOKEN 时每次启动随机生成密钥，否则任何人都能伪造更新
+    """
+    secret_token = settings.WEBHOOK_SECRET_TOKEN
+    if not secret_token:
+        secret_token = secrets.token_urlsafe(32)
+        logger.info("未配置 WEBHOOK_SECRET_TOKEN，已随机生成 Webhook 密钥")
+    server = WebhookServer(bot, secret_token=secret_token)
+    server.start()
+    bot.remove_webhook()
+    bot.set_webhook(settings.WEBHOOK_URL, secret_token=secret_token,
+                    max_connections=settings.WEBHOOK_MAX_CONNECTIONS)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        logger.info("Bot 已停止")
+    finally:
+        server.stop()
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+# 需要安装的模块：无
+
+
+class LazyDatetime:
+    """
+    延迟解析的时间字段描述符
+    从数据库读出的时间字符串原样保存在 _<字段名> 槽位中，第一次访问时才解析为 datetime 并写回；
+    赋值 datetime 或 None 时直接保存
+    """
+
+    def __set_name__(self, owner, name):
+        self.slot = "_" + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
@@ -1,76 +1,103 @@
-import random
+import secrets
 import string
 from datetime import datetime, timedelta
-from app.utils.db_utils import get_db_connection, close_db_connection
+from app.models.fields import LazyDatetime
+from app.utils.db_utils import db_session, db_transaction
 from config import settings
 from app.utils.logger import logger
+from app.utils.invite_code_index import get_invite_code_index
 
 # 需要安装的模块：无
 
 class InviteCode:
     """
     邀请码模型
+    使用 __slots__ 减少内存占用，时间字段在第一次访问时才解析
     """
 
-    def __init__(self, code, is_used=False, user_id=None, create_time=None, expire_days=None, create_user_id=None, type='invite', id=None):
+    __slots__ = ('id', 'code', 'is_used', 'user_id', 'expire_days', 'create_user_id', 'type',
+                 '_create_time', '_expire_time')
+
+    create_time = LazyDatetime()
+    expire_time = LazyDatetime()  # 过期时间，续期码不过期为 None
+
+    def __init__(self, code, is_used=False, user_id=None, create_time=None, expire_days=None, create_user_id=None, type='invite', id=None, expire_time=None):
         self.id = id
         self.code = code
         self.is_used = is_used
         self.user_id = user_id
-        
-        if isinstance(create_time, str):
-            self.create_time = datetime.fromisoformat(create_time)
-        else:
-            self.create_time = create_time
-        
+        self._create_time = create_time
         self.expire_days = expire_days  # 过期天数或续期天数
         self.create_user_id = create_user_id
         self.type = type  # 邀请码类型：invite（邀请码）或 renew（续期码）
-        logger.debug(f"创建邀请码模型: id={self.id}, code={self.code}, type={self.type}, create_user_id={self.create_user_id}")
+        self._expire_time = expire_time
+        if expire_time is None and self.type == 'invite' and create_time is not None and self.expire_days is not None:
+            self._expire_time = self.create_time + timedelta(days=self.expire_days)
+
+    @classmethod
+    def from_row(cls, row):
+        """由查询结果行 (sqlite3.Row 或字典) 直接构造模型对象，跳过 __init__ 的参数处理"""
+        invite_code = cls.__new__(cls)
+        invite_code.id = row['id']
+        invite_code.code = row['code']
+        invite_code.is_used = row['is_used']
+        invite_code.user_id = row['user_id']
+        invite_code._create_time = row['create_time']
+        invite_code.expire_days = row['expire_days']
+        invite_code.create_user_id = row['create_user_id']
+        invite_code.type = row['type']
+        invite_code._expire_time = row['expire_time']
+        return invite_code
 
     def save(self):
         """保存邀请码到数据库"""
-        logger.info(f"保存邀请码到数据库: id={self.id}, code={self.code}, type={self.type}, create_user_id={self.create_user_id}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        if self.id:
-            # 更新
-            cursor.execute(
-                "UPDATE InviteCodes SET code=?, is_used=?, user_id=?, create_time=?, expire_days=?, create_user_id=?, type=? WHERE id=?",
-                (self.code, self.is_used, self.user_id, self.create_time, self.expire_days, self.create_user_id, self.type, self.id)
-            )
-            logger.debug(f"更新邀请码数据: id={self.id}, code={self.code}, create_user_id={self.create_user_id}")
-        else:
-            # 插入
-            cursor.execute(
-                "INSERT INTO InviteCodes (code, is_used, user_id, create_time, expire_days, create_user_id, type) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (self.code, self.is_used, self.user_id, self.create_time, self.expire_days, self.create_user_id, self.type)
-            )
-            self.id = cursor.lastrowid
-            logger.debug(f"插入邀请码数据: id={self.id}, code={self.code}, create_user_id={self.create_user_id}")
+        logger.info("保存邀请码到数据库: id={}, code={}, type={}, create_user_id={}", self.id, self.code, self.type, self.create_user_id)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            if self.id:
+                # 更新
+                cursor.execute(
+                    "UPDATE InviteCodes SET code=?, is_used=?, user_id=?, create_time=?, expire_days=?, expire_time=?, create_user_id=?, type=? WHERE id=?",
+                    (self.code, self.is_used, self.user_id, self.create_time, self.expire_days, self.expire_time, self.create_user_id, self.type, self.id)
+                )
+                logger.debug("更新邀请码数据: id={}, code={}, create_user_id={}", self.id, self.code, self.create_user_id)
+            else:
+                # 插入
+                cursor.execute(
+                    "INSERT INTO InviteCodes (code, is_used, user_id, create_time, expire_days, expire_time, create_user_id, type) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.code, self.is_used, self.user_id, self.create_time, self.expire_days, self.expire_time, self.create_user_id, self.type)
+                )
+                self.id = cursor.lastrowid
+                logger.debug("插入邀请码数据: id={}, code={}, create_user_id={}", self.id, self.code, self.create_user_id)
 
-        conn.commit()
-        close_db_connection(conn)
-        logger.info(f"邀请码保存成功: id={self.id}, code={self.code}, create_user_id={self.create_user_id}")
+        # 同步内存索引：已使用的邀请码移出索引
+        if self.is_used:
+            get_invite_code_index().discard(self.code)
+        else:
+            get_invite_code_index().add(self.code, self.type, self.expire_time)
+        logger.info("邀请码保存成功: id={}, code={}, create_user_id={}", self.id, self.code, self.create_user_id)
         return self
 
+    def is_expired(self, now=None):
+        """邀请码是否已过期，续期码不过期"""
+        return self.expire_time is not None and self.expire_time < (now or datetime.now())
+
     @staticmethod
     def get_by_code(code):
         """根据邀请码查询"""
-        logger.info(f"查询邀请码: code={code}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        logger.info("查询邀请码: code={}", code)
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM InviteCodes WHERE code = ?", (code,))
-        row = cursor.fetchone()
-        close_db_connection(conn)
+            cursor.execute("SELECT * FROM InviteCodes WHERE code = ?", (code,))
+            row = cursor.fetchone()
 
         if row:
-            logger.info(f"查询邀请码成功: code={code}, id={row['id']}")
-            return InviteCode(row['code'], row['is_used'], row['user_id'], row['create_time'], row['expire_days'], row['create_user_id'], row['type'], row['id'])
+            logger.info("查询邀请码成功: code={}, id={}", code, row['id'])
+            return InviteCode.from_row(row)
         else:
-            logger.warning(f"邀请码不存在: code={code}")
+            logger.warning("邀请码不存在: code={}", code)
             return None
 
     @staticmethod
@@ -82,75 +109,174 @@ class InviteCode:
             length: 邀请码长度，默认为配置中的长度
             user_id: 创建用户的 ID，默认为 1
             expire_days: 过期天数或续期天数，默认为配置中的天数
-            type: 邀请码类型，'invite' 表示邀请码，'renew' 表示续期码，默认为 'invite'
+            code_type: 邀请码类型，'invite' 表示邀请码，'renew' 表示续期码，默认为 'invite'
 
         Returns:
             生成的邀请码对象
         """
-        logger.info(f"开始生成邀请码: 长度={length}, 用户ID={user_id}, 过期天数={expire_days}, 类型={type}")
-        
-        # 生成随机邀请码
+        codes = InviteCode.generate_batch(1, code_type=code_type, expire_days=expire_days, create_user_id=user_id, length=length)
+        return InviteCode.get_by_code(codes[0]) if codes else None
+
+    @staticmethod
+    def generate_batch(count: int, code_type: str = 'invite', expire_days: int = settings.INVITE_CODE_EXPIRATION_DAYS,
+                       create_user_id: int = 1, length: int = settings.INVITE_CODE_LENGTH, max_rounds: int = 10) -> list:
+        """
+        批量生成邀请码或续期码，所有邀请码在同一个事务中写入
+
+        随机码由 secrets 生成，先在内存中去重，再用 INSERT OR IGNORE 批量写入；
+        与已有邀请码冲突而被忽略的部分会重新生成补足
+
+        Args:
+            count: 生成数量
+            code_type: 邀请码类型，'invite' 或 'renew'
+            expire_days: 过期天数或续期天数
+            create_user_id: 创建用户的 ID
+            length: 邀请码长度
+            max_rounds: 冲突补足的最大轮数
+
+        Returns:
+            按写入顺序排列的邀请码字符串列表
+        """
+        logger.info("开始批量生成邀请码: 数量={}, 类型={}, 长度={}, 天数={}, 创建者={}", count, code_type, length, expire_days, create_user_id)
         chars = string.ascii_uppercase + string.digits
-        code = ''.join(random.choice(chars) for _ in range(length))
         create_time = datetime.now()
+        expire_time = create_time + timedelta(days=expire_days) if code_type == 'invite' else None
+        inserted = 0
+        with db_transaction() as conn:
+            # BEGIN IMMEDIATE 期间没有其他写入者，大于 last_id 的行都是本批次写入的
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM InviteCodes").fetchone()[0]
+            # 剩余的码空间不足时只生成剩余数量，否则下面生成候选码的循环永远凑不够
+            used = conn.execute("SELECT COUNT(*) FROM InviteCodes WHERE length(code) = ?", (length,)).fetchone()[0]
+            target = min(count, max(0, len(chars) ** length - used))
+            for _ in range(max_rounds):
+                remaining = target - inserted
+                if remaining <= 0:
+                    break
+                candidates = set()
+                while len(candidates) < remaining:
+                    candidates.add(''.join(secrets.choice(chars) for _ in range(length)))
+                cursor = conn.executemany(
+                    "INSERT OR IGNORE INTO InviteCodes (code, is_used, create_time, expire_days, expire_time, create_user_id, type) VALUES (?, FALSE, ?, ?, ?, ?, ?)",
+                    [(code, create_time, expire_days, expire_time, create_user_id, code_type) for code in candidates]
+                )
+                inserted += cursor.rowcount
+                if cursor.rowcount < remaining:
+                    logger.debug("邀请码冲突，重新生成: 冲突数量={}", remaining - cursor.rowcount)
+            codes = [row[0] for row in conn.execute("SELECT code FROM InviteCodes WHERE id > ? ORDER BY id", (last_id,))]
 
-        # 创建邀请码对象
-        invite_code = InviteCode(
-            code=code,
-            create_time=create_time,
-            expire_days=expire_days,
-            create_user_id=user_id,
-            type=code_type
-        )
-        invite_code.save()
-        logger.info(f"邀请码生成成功: 邀请码={code}, 类型={type}")
+        index = get_invite_code_index()
+        for code in codes:
+            index.add(code, code_type, expire_time)
+
+        if len(codes) < count:
+            logger.warning("邀请码生成数量不足: 期望={}, 实际={}, 请增加邀请码长度", count, len(codes))
+        logger.info("批量生成邀请码成功: 数量={}, 类型={}", len(codes), code_type)
+        return codes
 
-        return invite_code
-    
     @staticmethod
     def get_all():
       """查询所有邀请码"""
       logger.info("查询所有邀请码")
-      conn = get_db_connection()
-      cursor = conn.cursor()
+      with db_session() as conn:
+          cursor = conn.cursor()
 
-      cursor.execute("SELECT * FROM InviteCodes")
-      rows = cursor.fetchall()
-      close_db_connection(conn)
-      logger.info(f"查询所有邀请码成功, 共 {len(rows)} 个邀请码")
+          cursor.execute("SELECT * FROM InviteCodes")
+          rows = cursor.fetchall()
+      logger.info("查询所有邀请码成功, 共 {} 个邀请码", len(rows))
 
-      return [InviteCode(row['code'], row['is_used'], row['user_id'], row['create_time'], row['expire_days'], row['create_user_id'], row['type'], row['id']) for row in rows]
+      return [InviteCode.from_row(row) for row in rows]
 
     @staticmethod
     def get_by_is_used(is_used):
         """根据邀请码使用状态查询"""
-        logger.info(f"查询邀请码,使用状态：is_used={is_used}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        logger.info("查询邀请码,使用状态：is_used={}", is_used)
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM InviteCodes WHERE is_used = ?", (is_used,))
-        rows = cursor.fetchall()
-        close_db_connection(conn)
+            cursor.execute("SELECT * FROM InviteCodes WHERE is_used = ?", (is_used,))
+            rows = cursor.fetchall()
         if rows:
-            logger.info(f"查询邀请码成功,使用状态：is_used={is_used}, count = {len(rows)}")
-            return [InviteCode(row['code'], row['is_used'], row['user_id'], row['create_time'], row['expire_days'], row['create_user_id'], row['type'], row['id']) for row in rows]
+            logger.info("查询邀请码成功,使用状态：is_used={}, count = {}", is_used, len(rows))
+            return [InviteCode.from_row(row) for row in rows]
         else:
-            logger.warning(f"查询邀请码为空,使用状态：is_used={is_used}")
+            logger.warning("查询邀请码为空,使用状态：is_used={}", is_used)
             return None
         
+    @staticmethod
+    def get_unused_code_entries():
+        """
+        查询所有未使用邀请码的 (code, type, expire_time)，用于重建内存索引
+        只读取索引需要的字段，走 (is_used, type) 索引
+        """
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT code, type, expire_time FROM InviteCodes WHERE is_used = FALSE")
+            rows = cursor.fetchall()
+        return [tuple(row) for row in rows]
+
+    @staticmethod
+    def find(code_type=None, is_used=None, unexpired=False):
+        """
+        按类型、使用状态和是否过期筛选邀请码，筛选条件都在 SQL 中完成
+
+        Args:
+            code_type: 邀请码类型，'invite' 或 'renew'，None 表示不筛选
+            is_used: 是否已使用，None 表示不筛选
+            unexpired: 为 True 时只返回未过期的邀请码 (续期码不过期)
+        """
+        conditions, values = [], []
+        if is_used is not None:
+            conditions.append("is_used = ?")
+            values.append(bool(is_used))
+        if code_type:
+            conditions.append("type = ?")
+            values.append(code_type)
+        if unexpired:
+            conditions.append("(expire_time IS NULL OR expire_time > ?)")
+            values.append(datetime.now())
+        sql = "SELECT * FROM InviteCodes"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        logger.debug("筛选邀请码: code_type={}, is_used={}, unexpired={}", code_type, is_used, unexpired)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(sql + " ORDER BY id", values)
+            rows = cursor.fetchall()
+        return [InviteCode.from_row(row) for row in rows]
+
+    @staticmethod
+    def purge_expired(now=None):
+        """
+        用一条 DELETE 语句删除所有已过期且未使用的邀请码
+
+        Returns:
+            被删除的邀请码字符串列表
+        """
+        with db_session() as conn:
+            cursor = conn.execute(
+                "DELETE FROM InviteCodes WHERE is_used = FALSE AND expire_time < ? RETURNING code",
+                (now or datetime.now(),)
+            )
+            codes = [row[0] for row in cursor.fetchall()]
+        index = get_invite_code_index()
+        for code in codes:
+            index.discard(code)
+        return codes
+
     def delete(self):
       """删除邀请码"""
-      logger.info(f"删除邀请码: id={self.id}, code={self.code}")
+      logger.info("删除邀请码: id={}, code={}", self.id, self.code)
       if self.id:
-          conn = get_db_connection()
-          cursor = conn.cursor()
-          cursor.execute("DELETE FROM InviteCodes WHERE id = ?", (self.id,))
-          conn.commit()
-          close_db_connection(conn)
-          logger.info(f"邀请码删除成功: id={self.id}, code={self.code}")
+          with db_session() as conn:
+              cursor = conn.cursor()
+              cursor.execute("DELETE FROM InviteCodes WHERE id = ?", (self.id,))
+          get_invite_code_index().discard(self.code)
+          logger.info("邀请码删除成功: id={}, code={}", self.id, self.code)
           self.id = None  # 删除后将 id 设置为 None
       else:
-          logger.warning(f"邀请码id 为空, 无法删除")
+          logger.warning("邀请码id 为空, 无法删除")
 
     def __str__(self):
-        return f"<InviteCode id={self.id}, code={self.code}, is_used={self.is_used}, user_id={self.user_id}, create_time={self.create_time}, expire_days={self.expire_days}, type={self.type}, create_user_id={self.create_user_id}>"
\ No newline at end of file
+        return f"<InviteCode id={self.id}, code={self.code}, is_used={self.is_used}, user_id={self.user_id}, create_time={self.create_time}, expire_days={self.expire_days}, expire_time={self.expire_time}, type={self.type}, create_user_id={self.create_user_id}>"
\ No newline at end of file
@@ -0,0 +1,55 @@
+from app.utils.db_utils import db_session
+from app.utils.logger import logger
+
+# 需要安装的模块：无
+
+
+class PendingDelete:
+    """
+    待删除消息模型
+    MessageQueue 的持久化副本，重启后从这里恢复尚未删除的消息；deadline 为 Unix 时间戳
+    """
+
+    __slots__ = ('chat_id', 'message_id', 'deadline', 'attempts')
+
+    def __init__(self, chat_id, message_id, deadline, attempts=0):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.deadline = deadline
+        self.attempts = attempts
+
+    @staticmethod
+    def save_many(entries):
+        """
+        批量写入或更新待删除消息
+
+        Args:
+            entries: [(chat_id, message_id, deadline, attempts), ...] 列表
+        """
+        logger.debug("批量写入待删除消息: count={}", len(entries))
+        with db_session() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO PendingDeletes (chat_id, message_id, deadline, attempts) VALUES (?, ?, ?, ?)",
+                entries
+            )
+
+    @staticmethod
+    def delete_many(keys):
+        """
+        批量删除已处理的消息
+
+        Args:
+            keys: [(chat_id, message_id), ...] 列表
+        """
+        logger.debug("批量删除待删除消息记录: count={}", len(keys))
+        with db_session() as conn:
+            conn.executemany("DELETE FROM PendingDeletes WHERE chat_id = ? AND message_id = ?", keys)
+
+    @staticmethod
+    def get_all():
+        """按删除时间顺序查询所有待删除消息"""
+        with db_session() as conn:
+            rows = conn.execute(
+                "SELECT chat_id, message_id, deadline, attempts FROM PendingDeletes ORDER BY deadline"
+            ).fetchall()
+        return [PendingDelete(*row) for row in rows]
@@ -0,0 +1,63 @@
+from app.utils.db_utils import db_session
+from app.utils.logger import logger
+
+# 需要安装的模块：无
+
+
+class ScheduledJob:
+    """
+    定时任务状态模型
+    保存需要跨重启的定时任务的触发方式和执行时间，时间均为 Unix 时间戳
+    """
+
+    __slots__ = ('name', 'trigger', 'next_run_at', 'last_run_at', 'last_status', 'last_error')
+
+    def __init__(self, name, trigger, next_run_at, last_run_at=None, last_status=None, last_error=None):
+        self.name = name
+        self.trigger = trigger  # "interval:3600" 或 "cron:0 4 * * *@Asia/Shanghai"
+        self.next_run_at = next_run_at
+        self.last_run_at = last_run_at
+        self.last_status = last_status
+        self.last_error = last_error
+
+    @staticmethod
+    def get(name):
+        """按任务名称查询"""
+        with db_session() as conn:
+            row = conn.execute(
+                "SELECT name, trigger, next_run_at, last_run_at, last_status, last_error FROM ScheduledJobs WHERE name = ?",
+                (name,)
+            ).fetchone()
+        return ScheduledJob(*row) if row else None
+
+    @staticmethod
+    def get_all():
+        """查询所有任务"""
+        with db_session() as conn:
+            rows = conn.execute(
+                "SELECT name, trigger, next_run_at, last_run_at, last_status, last_error FROM ScheduledJobs ORDER BY name"
+            ).fetchall()
+        return [ScheduledJob(*row) for row in rows]
+
+    @staticmethod
+    def save_schedule(name, trigger, next_run_at):
+        """写入任务的触发方式和下次执行时间，保留上次执行的记录"""
+        logger.debug("保存定时任务: name={}, trigger={}, next_run_at={}", name, trigger, next_run_at)
+        with db_session() as conn:
+            conn.execute("""
+                INSERT INTO ScheduledJobs (name, trigger, next_run_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET trigger = excluded.trigger, next_run_at = excluded.next_run_at
+            """, (name, trigger, next_run_at))
+
+    @staticmethod
+    def save_result(name, last_run_at, last_status, last_error=None):
+        """记录一次执行的结果"""
+        with db_session() as conn:
+            conn.execute("UPDATE ScheduledJobs SET last_run_at = ?, last_status = ?, last_error = ? WHERE name = ?",
+                         (last_run_at, last_status, last_error, name))
+
+    @staticmethod
+    def delete(name):
+        """删除任务"""
+        with db_session() as conn:
+            conn.execute("DELETE FROM ScheduledJobs WHERE name = ?", (name,))
@@ -0,0 +1,124 @@
+from app.utils.db_utils import db_session, after_transaction
+from app.utils.logger import logger
+from app.utils.user_cache import get_user_cache
+
+# 需要安装的模块：无
+
+
+class ScoreLedger:
+    """
+    积分流水模型
+    只追加不修改，每一次积分变动都记录一行；Users.score 是由流水汇总得到的余额
+    """
+
+    # 积分变动原因
+    REASON_OPENING = 'opening'  # 建立流水表时的期初余额
+    REASON_CHECKIN = 'checkin'
+    REASON_GIVE = 'give'
+    REASON_RED_PACKET = 'red_packet'
+    REASON_INVITE_PURCHASE = 'invite_purchase'
+    REASON_MAIL_PURCHASE = 'mail_purchase'
+    REASON_ADMIN = 'admin'
+
+    __slots__ = ('id', 'user_id', 'delta', 'reason', 'ref', 'ts')
+
+    def __init__(self, user_id, delta, reason, ref=None, ts=None, id=None):
+        self.id = id
+        self.user_id = user_id
+        self.delta = delta
+        self.reason = reason
+        self.ref = ref
+        self.ts = ts
+
+    @staticmethod
+    def add(user_id, delta, reason, ref=None):
+        """追加一条积分流水"""
+        logger.debug("追加积分流水: user_id={}, delta={}, reason={}, ref={}", user_id, delta, reason, ref)
+        with db_session() as conn:
+            conn.execute("INSERT INTO ScoreLedger (user_id, delta, reason, ref) VALUES (?, ?, ?, ?)",
+                         (user_id, delta, reason, None if ref is None else str(ref)))
+
+    @staticmethod
+    def add_many(entries):
+        """
+        批量追加积分流水，只为仍然存在的用户写入
+
+        Args:
+            entries: [(user_id, delta, reason, ref), ...] 列表
+        """
+        logger.debug("批量追加积分流水: count={}", len(entries))
+        with db_session() as conn:
+            conn.executemany(
+                "INSERT INTO ScoreLedger (user_id, delta, reason, ref) SELECT id, ?, ?, ? FROM Users WHERE id = ?",
+                [(delta, reason, None if ref is None else str(ref), user_id) for user_id, delta, reason, ref in entries]
+            )
+
+    @staticmethod
+    def get_by_user(user_id, limit=10):
+        """按时间倒序查询用户最近的积分流水"""
+        logger.debug("查询用户积分流水: user_id={}, limit={}", user_id, limit)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM ScoreLedger WHERE user_id = ? ORDER BY ts DESC, id DESC LIMIT ?",
+                           (user_id, limit))
+            rows = cursor.fetchall()
+
+        return [ScoreLedger(row['user_id'], row['delta'], row['reason'], row['ref'], row['ts'], row['id'])
+                for row in rows]
+
+    @staticmethod
+    def get_top_earners(since, limit=10):
+        """
+        查询 since 之后获得积分最多的用户，期初余额不计入
+
+        Args:
+            since: 开始时间，'YYYY-MM-DD HH:MM:SS' 格式的 UTC 时间字符串
+            limit: 返回的用户数量
+
+        Returns:
+            [{"user_id", "username", "telegram_id", "earned"}, ...] 列表
+        """
+        logger.debug("查询积分收入排行: since={}, limit={}", since, limit)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(
+                """
+                SELECT l.user_id, u.username, u.telegram_id, SUM(l.delta) AS earned
+                FROM ScoreLedger l JOIN Users u ON u.id = l.user_id
+                WHERE l.ts >= ? AND l.delta > 0 AND l.reason != ?
+                GROUP BY l.user_id
+                ORDER BY earned DESC
+                LIMIT ?
+                """,
+                (since, ScoreLedger.REASON_OPENING, limit)
+            )
+            rows = cursor.fetchall()
+
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def materialize_balances(only_drifted=True):
+        """
+        用流水汇总重新计算 Users.score
+
+        Args:
+            only_drifted: 为 True 时只更新余额与流水不一致的用户，为 False 时重建所有用户的余额
+
+        Returns:
+            被修改的用户数量
+        """
+        logger.debug("重新计算积分余额: only_drifted={}", only_drifted)
+        balance = "COALESCE((SELECT SUM(delta) FROM ScoreLedger WHERE user_id = Users.id), 0)"
+        sql = f"UPDATE Users SET score = {balance}"
+        if only_drifted:
+            sql += f" WHERE score != {balance}"
+        with db_session() as conn:
+            cursor = conn.execute(sql)
+            if cursor.rowcount:
+                after_transaction(get_user_cache().clear)
+        return cursor.rowcount
+
+    def __str__(self):
+        return f"<ScoreLedger id={self.id}, user_id={self.user_id}, delta={self.delta}, reason={self.reason}, ref={self.ref}, ts={self.ts}>"
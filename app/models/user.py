@@ -1,17 +1,36 @@
-from datetime import datetime
-from app.utils.db_utils import get_db_connection, close_db_connection
+from app.models.fields import LazyDatetime
+from app.utils.db_utils import db_session, db_transaction, after_transaction
 from app.utils.logger import logger
+from app.utils.user_cache import get_user_cache, UserCache
 from config import settings
 
 
+def _invalidate_user_cache(user_id=None, keys=()):
+    """
+    使用户缓存失效：立即失效一次，事务结束后再失效一次，
+    防止事务提交前被其他线程读到旧数据重新写入缓存
+    """
+    cache = get_user_cache()
+    cache.invalidate(user_id, keys)
+    after_transaction(lambda: cache.invalidate(user_id, keys))
+
+
 # 需要安装的模块：无
 class User:
     """
     用户模型基类
+    使用 __slots__ 减少内存占用，时间字段在第一次访问时才解析
     """
 
+    __slots__ = ('id', 'telegram_id', 'service_type', 'score', 'invite_code', 'username', 'status',
+                 '_expiration_date', '_last_sign_in_date', '_create_time')
+
+    expiration_date = LazyDatetime()  # 新增过期时间字段
+    last_sign_in_date = LazyDatetime()
+    create_time = LazyDatetime()
+
     def __init__(self, telegram_id, service_type, score=0, invite_code=None, id=None, last_sign_in_date=None,
-                 username=None, status='active', expiration_date=None):
+                 username=None, status='active', expiration_date=None, create_time=None):
         self.id = id
         self.telegram_id = telegram_id
         self.service_type = service_type
@@ -19,118 +38,129 @@ class User:
         self.invite_code = invite_code
         self.username = username
         self.status = status  # 新增状态字段
-        self.expiration_date = expiration_date  # 新增过期时间字段
-
-        if isinstance(last_sign_in_date, str):
-            self.last_sign_in_date = datetime.fromisoformat(last_sign_in_date)
-        else:
-            self.last_sign_in_date = last_sign_in_date
-        logger.debug(f"创建用户模型: id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}")
+        self._expiration_date = expiration_date
+        self._last_sign_in_date = last_sign_in_date
+        self._create_time = create_time
+
+    @classmethod
+    def from_row(cls, row):
+        """由查询结果行 (sqlite3.Row 或字典) 直接构造模型对象，跳过 __init__ 的参数处理"""
+        user = cls.__new__(cls)
+        user.id = row['id']
+        user.telegram_id = row['telegram_id']
+        user.service_type = row['service_type']
+        user.score = row['score']
+        user.invite_code = row['invite_code']
+        user.username = row['username']
+        user.status = row['status']
+        user._expiration_date = row['expiration_date']
+        user._last_sign_in_date = row['last_sign_in_date']
+        user._create_time = row['create_time']
+        return user
 
     def save(self):
         """保存用户信息到数据库"""
         logger.debug(
-            f"保存用户信息到数据库: id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        if self.id:
-            # 更新
-            cursor.execute(
-                "UPDATE Users SET telegram_id = ?, service_type = ?, score = ?, invite_code = ?, last_sign_in_date = ?, username = ?, status = ?, expiration_date = ? WHERE id = ?",
-                (self.telegram_id, self.service_type, self.score, self.invite_code, self.last_sign_in_date,
-                 self.username, self.status, self.expiration_date, self.id)
-            )
-            logger.debug(
-                f"更新用户数据: id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}")
-        else:
-            # 插入
-            cursor.execute(
-                "INSERT INTO Users (telegram_id, service_type, score, invite_code, last_sign_in_date, username, status, expiration_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (self.telegram_id, self.service_type, self.score, self.invite_code, self.last_sign_in_date,
-                 self.username, self.status, self.expiration_date)
-            )
-            self.id = cursor.lastrowid
-            logger.debug(
-                f"插入用户数据: id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}")
+            "保存用户信息到数据库: id={}, telegram_id={}, service_type={}", self.id, self.telegram_id, self.service_type)
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        conn.commit()
-        close_db_connection(conn)
+            if self.id:
+                # 更新，积分不随整行写回，只能通过 add_score/set_score 原子修改，避免覆盖并发的积分变更
+                cursor.execute(
+                    "UPDATE Users SET telegram_id = ?, service_type = ?, invite_code = ?, last_sign_in_date = ?, username = ?, status = ?, expiration_date = ? WHERE id = ?",
+                    (self.telegram_id, self.service_type, self.invite_code, self.last_sign_in_date,
+                     self.username, self.status, self.expiration_date, self.id)
+                )
+                logger.debug(
+                    "更新用户数据: id={}, telegram_id={}, service_type={}", self.id, self.telegram_id, self.service_type)
+            else:
+                # 插入
+                cursor.execute(
+                    "INSERT INTO Users (telegram_id, service_type, score, invite_code, last_sign_in_date, username, status, expiration_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.telegram_id, self.service_type, self.score, self.invite_code, self.last_sign_in_date,
+                     self.username, self.status, self.expiration_date)
+                )
+                self.id = cursor.lastrowid
+                logger.debug(
+                    "插入用户数据: id={}, telegram_id={}, service_type={}", self.id, self.telegram_id, self.service_type)
+
+        self._invalidate_cache()
         logger.debug(
-            f"用户信息保存成功: id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}")
+            "用户信息保存成功: id={}, telegram_id={}, service_type={}", self.id, self.telegram_id, self.service_type)
         return self
 
+    def _invalidate_cache(self):
+        """使当前用户的缓存失效"""
+        keys = [UserCache.telegram_id_key(self.telegram_id, self.service_type)]
+        if getattr(self, "service_user_id", None) is not None:
+            keys.append(UserCache.service_user_id_key(self.service_user_id))
+        _invalidate_user_cache(self.id, keys)
+
     @staticmethod
     def get_by_telegram_id_and_service_type(telegram_id, service_type=None):
         """根据 Telegram ID 和服务名称查询用户"""
-        logger.debug(f"查询用户: telegram_id={telegram_id}, service_type={service_type}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        logger.debug("查询用户: telegram_id={}, service_type={}", telegram_id, service_type)
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute(
-            "SELECT * FROM Users WHERE telegram_id = ? AND service_type = ?",
-            (telegram_id, service_type)
-        )
-        row = cursor.fetchone()
-        close_db_connection(conn)
+            cursor.execute(
+                "SELECT * FROM Users WHERE telegram_id = ? AND service_type = ?",
+                (telegram_id, service_type)
+            )
+            row = cursor.fetchone()
 
         if row:
-            logger.debug(f"查询用户成功: telegram_id={telegram_id}, service_type={service_type}, id={row['id']}")
-            return User(row['telegram_id'], row['service_type'], row['score'], row['invite_code'], row['id'],
-                        row['last_sign_in_date'], row['username'], row['status'], row['expiration_date'])
+            logger.debug("查询用户成功: telegram_id={}, service_type={}, id={}", telegram_id, service_type, row['id'])
+            return User.from_row(row)
         else:
-            logger.warning(f"用户不存在: telegram_id={telegram_id}, service_type={service_type}")
+            logger.warning("用户不存在: telegram_id={}, service_type={}", telegram_id, service_type)
             return None
 
     @staticmethod
     def get_by_id(user_id):
         """根据用户 ID 查询用户"""
-        logger.debug(f"查询用户: user_id={user_id}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        logger.debug("查询用户: user_id={}", user_id)
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM Users WHERE id = ?", (user_id,))
-        row = cursor.fetchone()
-        close_db_connection(conn)
+            cursor.execute("SELECT * FROM Users WHERE id = ?", (user_id,))
+            row = cursor.fetchone()
 
         if row:
-            logger.debug(f"查询用户成功: user_id={user_id}, telegram_id={row['telegram_id']}")
-            return User(row['telegram_id'], row['service_type'], row['score'], row['invite_code'], row['id'],
-                        row['last_sign_in_date'], row['username'], row['status'], row['expiration_date'])
+            logger.debug("查询用户成功: user_id={}, telegram_id={}", user_id, row['telegram_id'])
+            return User.from_row(row)
         else:
-            logger.warning(f"用户不存在: user_id={user_id}")
+            logger.warning("用户不存在: user_id={}", user_id)
             return None
 
     @staticmethod
     def get_all():
         """查询所有用户"""
         logger.debug("查询所有用户")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM Users")
-        rows = cursor.fetchall()
-        close_db_connection(conn)
+            cursor.execute("SELECT * FROM Users")
+            rows = cursor.fetchall()
 
-        logger.debug(f"查询所有用户成功，共 {len(rows)} 个用户")
-        return [User(row['telegram_id'], row['service_type'], row['score'], row['invite_code'], row['id'],
-                     row['last_sign_in_date'], row['username'], row['status'], row['expiration_date']) for row in rows]
+        logger.debug("查询所有用户成功，共 {} 个用户", len(rows))
+        return [User.from_row(row) for row in rows]
 
     def delete(self):
         """从数据库中删除用户"""
-        logger.debug(f"删除用户: id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}")
+        logger.debug("删除用户: id={}, telegram_id={}, service_type={}", self.id, self.telegram_id, self.service_type)
         if self.id:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM Users WHERE id = ?", (self.id,))
-            conn.commit()
-            close_db_connection(conn)
+            with db_session() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM Users WHERE id = ?", (self.id,))
+            self._invalidate_cache()
             logger.debug(
-                f"用户删除成功: id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}")
+                "用户删除成功: id={}, telegram_id={}, service_type={}", self.id, self.telegram_id, self.service_type)
             self.id = None  # 删除后将 id 设置为 None
         else:
             logger.warning(
-                f"用户 id 为空，无法删除用户: telegram_id={self.telegram_id}, service_type={self.service_type}")
+                "用户 id 为空，无法删除用户: telegram_id={}, service_type={}", self.telegram_id, self.service_type)
 
     def __str__(self):
         return f"<User id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}, score={self.score}, invite_code={self.invite_code}, last_sign_in_date={self.last_sign_in_date}, username={self.username}, status={self.status}, expiration_date={self.expiration_date}>"
@@ -141,152 +171,363 @@ class ServiceUser(User):
     {service_type} 用户模型
     """
 
+    __slots__ = ('service_user_id',)
+
     def __init__(self, telegram_id, score=0, invite_code=None, id=None, service_user_id=None, last_sign_in_date=None,
-                 service_type='navidrome', username=None, status='active', expiration_date=None):
+                 service_type='navidrome', username=None, status='active', expiration_date=None, create_time=None):
         super().__init__(telegram_id, service_type, score, invite_code, id, last_sign_in_date, username, status,
-                         expiration_date)
+                         expiration_date, create_time)
         self.service_user_id = service_user_id
-        logger.debug(
-            f"创建 {service_type} 用户模型: id={self.id}, telegram_id={self.telegram_id}, service_user_id={self.service_user_id}")
+
+    @classmethod
+    def from_row(cls, row):
+        """由查询结果行 (sqlite3.Row 或字典) 直接构造模型对象"""
+        user = super().from_row(row)
+        user.service_user_id = row['service_user_id']
+        return user
 
     def save(self):
         """保存用户信息到数据库"""
         logger.debug(
-            f"保存 {self.service_type} 用户信息到数据库: id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}, service_user_id={self.service_user_id}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        if self.id:
-            # 更新
-            cursor.execute(
-                "UPDATE Users SET telegram_id = ?, service_type = ?, score = ?, invite_code = ?, service_user_id = ?, last_sign_in_date = ?, username = ?, status = ?, expiration_date = ? WHERE id = ?",
-                (self.telegram_id, self.service_type, self.score, self.invite_code, self.service_user_id,
-                 self.last_sign_in_date, self.username, self.status, self.expiration_date, self.id)
-            )
-            logger.debug(
-                f"更新 {self.service_type} 用户数据: id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}, service_user_id={self.service_user_id}")
-        else:
-            # 插入
-            cursor.execute(
-                "INSERT INTO Users (telegram_id, service_type, score, invite_code, service_user_id, last_sign_in_date, username, status, expiration_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (self.telegram_id, self.service_type, self.score, self.invite_code, self.service_user_id,
-                 self.last_sign_in_date, self.username, self.status, self.expiration_date)
-            )
-            self.id = cursor.lastrowid
-            logger.debug(
-                f"插入 {self.service_type} 用户数据: id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}, service_user_id={self.service_user_id}")
+            "保存 {} 用户信息到数据库: id={}, telegram_id={}, service_type={}, service_user_id={}", self.service_type, self.id, self.telegram_id, self.service_type, self.service_user_id)
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        conn.commit()
-        close_db_connection(conn)
+            if self.id:
+                # 更新，积分不随整行写回，只能通过 add_score/set_score 原子修改，避免覆盖并发的积分变更
+                cursor.execute(
+                    "UPDATE Users SET telegram_id = ?, service_type = ?, invite_code = ?, service_user_id = ?, last_sign_in_date = ?, username = ?, status = ?, expiration_date = ? WHERE id = ?",
+                    (self.telegram_id, self.service_type, self.invite_code, self.service_user_id,
+                     self.last_sign_in_date, self.username, self.status, self.expiration_date, self.id)
+                )
+                logger.debug(
+                    "更新 {} 用户数据: id={}, telegram_id={}, service_type={}, service_user_id={}", self.service_type, self.id, self.telegram_id, self.service_type, self.service_user_id)
+            else:
+                # 插入
+                cursor.execute(
+                    "INSERT INTO Users (telegram_id, service_type, score, invite_code, service_user_id, last_sign_in_date, username, status, expiration_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.telegram_id, self.service_type, self.score, self.invite_code, self.service_user_id,
+                     self.last_sign_in_date, self.username, self.status, self.expiration_date)
+                )
+                self.id = cursor.lastrowid
+                logger.debug(
+                    "插入 {} 用户数据: id={}, telegram_id={}, service_type={}, service_user_id={}", self.service_type, self.id, self.telegram_id, self.service_type, self.service_user_id)
+
+        self._invalidate_cache()
         logger.debug(
-            f"{self.service_type} 用户信息保存成功: id={self.id}, telegram_id={self.telegram_id}, service_type={self.service_type}, service_user_id={self.service_user_id}")
+            "{} 用户信息保存成功: id={}, telegram_id={}, service_type={}, service_user_id={}", self.service_type, self.id, self.telegram_id, self.service_type, self.service_user_id)
         return self
 
     @staticmethod
     def get_by_telegram_id_and_service_type(telegram_id, service_type=None):
         """根据 Telegram ID 和服务名称查询用户"""
         service_type = service_type if service_type is not None else settings.SERVICE_TYPE
-        logger.debug(f"查询 {service_type} 用户: telegram_id={telegram_id}, service_type={service_type}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        logger.debug("查询 {} 用户: telegram_id={}, service_type={}", service_type, telegram_id, service_type)
+        cache_key = UserCache.telegram_id_key(telegram_id, service_type)
+        hit, row = get_user_cache().get(cache_key)
+        if hit:
+            return ServiceUser.from_row(row) if row else None
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute(
-            "SELECT * FROM Users WHERE telegram_id = ? AND service_type = ?",
-            (telegram_id, service_type)
-        )
-        row = cursor.fetchone()
-        close_db_connection(conn)
+            cursor.execute(
+                "SELECT * FROM Users WHERE telegram_id = ? AND service_type = ?",
+                (telegram_id, service_type)
+            )
+            row = cursor.fetchone()
 
         if row:
+            get_user_cache().put(row)
             logger.debug(
-                f"查询 {service_type} 用户成功: telegram_id={telegram_id}, service_type={service_type}, id={row['id']}")
-            return ServiceUser(row['telegram_id'], row['score'], row['invite_code'], row['id'], row['service_user_id'],
-                               row['last_sign_in_date'], row['service_type'], row['username'], row['status'],
-                               row['expiration_date'])
+                "查询 {} 用户成功: telegram_id={}, service_type={}, id={}", service_type, telegram_id, service_type, row['id'])
+            return ServiceUser.from_row(row)
         else:
-            logger.warning(f"{service_type} 用户不存在: telegram_id={telegram_id}, service_type={service_type}")
+            get_user_cache().put_missing(cache_key)
+            logger.warning("{} 用户不存在: telegram_id={}, service_type={}", service_type, telegram_id, service_type)
             return None
 
     @staticmethod
     def get_by_id(user_id, service_type=None):
         """根据用户 ID 查询用户"""
         service_type = service_type if service_type is not None else settings.SERVICE_TYPE
-        logger.debug(f"查询 {service_type} 用户: user_id={user_id}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        logger.debug("查询 {} 用户: user_id={}", service_type, user_id)
+        cache_key = UserCache.id_key(user_id)
+        hit, row = get_user_cache().get(cache_key)
+        if hit:
+            return ServiceUser.from_row(row) if row else None
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM Users WHERE id = ?", (user_id,))
-        row = cursor.fetchone()
-        close_db_connection(conn)
+            cursor.execute("SELECT * FROM Users WHERE id = ?", (user_id,))
+            row = cursor.fetchone()
 
         if row:
-            logger.debug(f"查询 {service_type} 用户成功: user_id={user_id}, telegram_id={row['telegram_id']}")
-            return ServiceUser(row['telegram_id'], row['score'], row['invite_code'], row['id'], row['service_user_id'],
-                               row['last_sign_in_date'], row['service_type'], row['username'], row['status'],
-                               row['expiration_date'])
+            get_user_cache().put(row)
+            logger.debug("查询 {} 用户成功: user_id={}, telegram_id={}", service_type, user_id, row['telegram_id'])
+            return ServiceUser.from_row(row)
         else:
-            logger.warning(f"{service_type} 用户不存在: user_id={user_id}")
+            get_user_cache().put_missing(cache_key)
+            logger.warning("{} 用户不存在: user_id={}", service_type, user_id)
             return None
 
     @staticmethod
     def get_by_service_id(user_id, service_type=None):
         """根据用户 ID 查询用户"""
         service_type = service_type if service_type is not None else settings.SERVICE_TYPE
-        logger.debug(f"查询 {service_type} 用户: user_id={user_id}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        logger.debug("查询 {} 用户: user_id={}", service_type, user_id)
+        cache_key = UserCache.service_user_id_key(user_id)
+        hit, row = get_user_cache().get(cache_key)
+        if hit:
+            return ServiceUser.from_row(row) if row else None
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM Users WHERE service_user_id = ?", (user_id,))
-        row = cursor.fetchone()
-        close_db_connection(conn)
+            cursor.execute("SELECT * FROM Users WHERE service_user_id = ?", (user_id,))
+            row = cursor.fetchone()
 
         if row:
-            logger.debug(f"查询 {service_type} 用户成功: user_id={user_id}, telegram_id={row['telegram_id']}")
-            return ServiceUser(row['telegram_id'], row['score'], row['invite_code'], row['id'], row['service_user_id'],
-                               row['last_sign_in_date'], row['service_type'], row['username'], row['status'],
-                               row['expiration_date'])
+            get_user_cache().put(row)
+            logger.debug("查询 {} 用户成功: user_id={}, telegram_id={}", service_type, user_id, row['telegram_id'])
+            return ServiceUser.from_row(row)
         else:
-            logger.warning(f"{service_type} 用户不存在: user_id={user_id}")
+            get_user_cache().put_missing(cache_key)
+            logger.warning("{} 用户不存在: user_id={}", service_type, user_id)
             return None
 
     @staticmethod
     def get_by_username(username, service_type=None):
         """根据 {service_type} 用户名查询用户"""
         service_type = service_type if service_type is not None else settings.SERVICE_TYPE
-        logger.debug(f"根据 {service_type} 用户名查询用户: username={username}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        logger.debug("根据 {} 用户名查询用户: username={}", service_type, username)
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM Users WHERE username = ?", (username,))
-        row = cursor.fetchone()
-        close_db_connection(conn)
+            cursor.execute("SELECT * FROM Users WHERE username = ? COLLATE NOCASE", (username,))
+            row = cursor.fetchone()
 
         if row:
             logger.debug(
-                f"根据 {service_type} 用户名查询用户成功: username={username}, telegram_id={row['telegram_id']},id={row['id']}")
-            return ServiceUser(row['telegram_id'], row['score'], row['invite_code'], row['id'], row['service_user_id'],
-                               row['last_sign_in_date'], row['service_type'], row['username'], row['status'],
-                               row['expiration_date'])
+                "根据 {} 用户名查询用户成功: username={}, telegram_id={},id={}", service_type, username, row['telegram_id'], row['id'])
+            return ServiceUser.from_row(row)
         else:
-            logger.warning(f"{service_type} 用户不存在: username={username}")
+            logger.warning("{} 用户不存在: username={}", service_type, username)
             return None
 
     @staticmethod
     def get_all(service_type=None):
         """查询所有用户"""
         service_type = service_type if service_type is not None else settings.SERVICE_TYPE
-        logger.debug("查询所有 {service_type} 用户")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        logger.debug("查询所有 {} 用户", service_type)
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM Users")
-        rows = cursor.fetchall()
-        close_db_connection(conn)
+            cursor.execute("SELECT * FROM Users")
+            rows = cursor.fetchall()
 
-        logger.debug(f"查询所有 {service_type} 用户成功, 共 {len(rows)} 个用户")
-        return [ServiceUser(row['telegram_id'], row['score'], row['invite_code'], row['id'], row['service_user_id'],
-                            row['last_sign_in_date'], row['service_type'], row['username'], row['status'],
-                            row['expiration_date']) for row in rows]
+        logger.debug("查询所有 {} 用户成功, 共 {} 个用户", service_type, len(rows))
+        return [ServiceUser.from_row(row) for row in rows]
+
+    @staticmethod
+    def get_by_sign_in_date_range(start_date, end_date):
+        """
+        查询签到时间在 [start_date, end_date) 范围内的用户
+
+        Args:
+            start_date: 开始日期（包含），'YYYY-MM-DD' 格式字符串，按签到时存储的上海时间比较
+            end_date: 结束日期（不包含），'YYYY-MM-DD' 格式字符串
+
+        Returns:
+            ServiceUser 对象列表
+        """
+        logger.debug("查询签到用户: start_date={}, end_date={}", start_date, end_date)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM Users WHERE last_sign_in_date >= ? AND last_sign_in_date < ?",
+                           (start_date, end_date))
+            rows = cursor.fetchall()
+
+        logger.debug("查询签到用户成功: start_date={}, end_date={}, count={}", start_date, end_date, len(rows))
+        return [ServiceUser.from_row(row) for row in rows]
+
+    @staticmethod
+    def get_by_create_time_range(start_date, end_date):
+        """
+        查询注册时间在 [start_date, end_date) 范围内的用户
+
+        Args:
+            start_date: 开始日期（包含），'YYYY-MM-DD' 格式字符串，按数据库中的 UTC 时间比较
+            end_date: 结束日期（不包含），'YYYY-MM-DD' 格式字符串
+
+        Returns:
+            ServiceUser 对象列表
+        """
+        logger.debug("查询注册用户: start_date={}, end_date={}", start_date, end_date)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM Users WHERE create_time >= ? AND create_time < ?", (start_date, end_date))
+            rows = cursor.fetchall()
+
+        logger.debug("查询注册用户成功: start_date={}, end_date={}, count={}", start_date, end_date, len(rows))
+        return [ServiceUser.from_row(row) for row in rows]
+
+    @staticmethod
+    def get_by_status(status):
+        """查询指定状态的用户"""
+        logger.debug("查询指定状态的用户: status={}", status)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM Users WHERE status = ?", (status,))
+            rows = cursor.fetchall()
+
+        logger.debug("查询指定状态的用户成功: status={}, count={}", status, len(rows))
+        return [ServiceUser.from_row(row) for row in rows]
+
+    @staticmethod
+    def get_top_by_score(limit=10):
+        """按积分降序查询前 limit 个用户"""
+        logger.debug("查询积分排行: limit={}", limit)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM Users ORDER BY score DESC LIMIT ?", (limit,))
+            rows = cursor.fetchall()
+
+        logger.debug("查询积分排行成功: limit={}, count={}", limit, len(rows))
+        return [ServiceUser.from_row(row) for row in rows]
+
+    @staticmethod
+    def count(status=None):
+        """统计用户数量，指定 status 时只统计该状态的用户"""
+        logger.debug("统计用户数量: status={}", status)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            if status is None:
+                cursor.execute("SELECT COUNT(*) FROM Users")
+            else:
+                cursor.execute("SELECT COUNT(*) FROM Users WHERE status = ?", (status,))
+            total = cursor.fetchone()[0]
+
+        logger.debug("统计用户数量成功: status={}, count={}", status, total)
+        return total
+
+    @staticmethod
+    def add_score(user_id, delta, min_score=None):
+        """
+        原子地增减用户积分
+
+        Args:
+            user_id: 用户 ID
+            delta: 积分变化量，负数表示扣除
+            min_score: 扣除前要求的最低积分，不满足时不做修改
+
+        Returns:
+            修改后的 ServiceUser 对象，用户不存在或积分不足时返回 None
+        """
+        logger.debug("修改用户积分: user_id={}, delta={}, min_score={}", user_id, delta, min_score)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            if min_score is None:
+                cursor.execute("UPDATE Users SET score = score + ? WHERE id = ? RETURNING *", (delta, user_id))
+            else:
+                cursor.execute("UPDATE Users SET score = score + ? WHERE id = ? AND score >= ? RETURNING *",
+                               (delta, user_id, min_score))
+            row = cursor.fetchone()
+            _invalidate_user_cache(user_id)
+
+        if row:
+            logger.debug("修改用户积分成功: user_id={}, delta={}, score={}", user_id, delta, row['score'])
+            return ServiceUser.from_row(row)
+        else:
+            logger.warning("修改用户积分失败，用户不存在或积分不足: user_id={}, delta={}", user_id, delta)
+            return None
+
+    @staticmethod
+    def add_score_bulk(grants):
+        """
+        批量增加用户积分
+
+        Args:
+            grants: [(user_id, delta), ...] 列表
+
+        Returns:
+            实际修改的用户数量
+        """
+        logger.debug("批量修改用户积分: count={}", len(grants))
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.executemany("UPDATE Users SET score = score + ? WHERE id = ?",
+                               [(delta, user_id) for user_id, delta in grants])
+            updated = cursor.rowcount
+        # 批量修改的用户较多，直接清空缓存
+        get_user_cache().clear()
+        after_transaction(get_user_cache().clear)
+
+        logger.debug("批量修改用户积分成功: count={}", updated)
+        return updated
+
+    @staticmethod
+    def set_score(user_id, score):
+        """
+        直接设置用户积分
+        修改前的积分在同一个写事务中从数据库读取 (不经过缓存)，调用方据此计算积分流水，保证流水与余额一致
+
+        Returns:
+            (修改后的 ServiceUser 对象, 修改前的积分)，用户不存在时返回 (None, None)
+        """
+        logger.debug("设置用户积分: user_id={}, score={}", user_id, score)
+        with db_transaction() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT score FROM Users WHERE id = ?", (user_id,))
+            old = cursor.fetchone()
+            if old is None:
+                logger.warning("设置用户积分失败，用户不存在: user_id={}", user_id)
+                return None, None
+            cursor.execute("UPDATE Users SET score = ? WHERE id = ? RETURNING *", (score, user_id))
+            row = cursor.fetchone()
+            _invalidate_user_cache(user_id)
+
+        logger.debug("设置用户积分成功: user_id={}, score={}", user_id, score)
+        return ServiceUser.from_row(row), old['score']
+
+    @staticmethod
+    def sign_in(user_id, score, sign_in_time, day_start):
+        """
+        原子地完成签到：仅当上次签到早于 day_start 时增加积分并记录签到时间
+
+        Args:
+            user_id: 用户 ID
+            score: 签到获得的积分
+            sign_in_time: 本次签到时间
+            day_start: 当天开始日期，'YYYY-MM-DD' 格式字符串，与存储的签到时间按字符串比较
+
+        Returns:
+            签到后的 ServiceUser 对象，用户不存在或今天已签到时返回 None
+        """
+        logger.debug("用户签到: user_id={}, score={}, day_start={}", user_id, score, day_start)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "UPDATE Users SET score = score + ?, last_sign_in_date = ? "
+                "WHERE id = ? AND (last_sign_in_date IS NULL OR last_sign_in_date < ?) RETURNING *",
+                (score, sign_in_time, user_id, day_start)
+            )
+            row = cursor.fetchone()
+            _invalidate_user_cache(user_id)
+
+        if row:
+            logger.debug("用户签到成功: user_id={}, score={}", user_id, row['score'])
+            return ServiceUser.from_row(row)
+        else:
+            logger.warning("用户签到失败，用户不存在或今天已签到: user_id={}", user_id)
+            return None
 
     @staticmethod
     def update_username(telegram_id, new_username, service_type=None):
@@ -298,76 +539,71 @@ class ServiceUser(User):
           修改后的 ServiceUser对象
         """
         service_type = service_type if service_type is not None else settings.SERVICE_TYPE
-        logger.debug(f"修改 {service_type} 用户名: new_username={new_username}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("UPDATE Users SET username = ? WHERE telegram_id = ? AND service_type = ?",
-                       (new_username, telegram_id, service_type))
-        conn.commit()
-        # 获取更新后的数据
-        cursor.execute(
-            "SELECT * FROM Users WHERE telegram_id = ? AND service_type = ?",
-            (telegram_id, service_type)
-        )
-        row = cursor.fetchone()
-        close_db_connection(conn)
+        logger.debug("修改 {} 用户名: new_username={}", service_type, new_username)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("UPDATE Users SET username = ? WHERE telegram_id = ? AND service_type = ?",
+                           (new_username, telegram_id, service_type))
+            _invalidate_user_cache(keys=[UserCache.telegram_id_key(telegram_id, service_type)])
+            # 获取更新后的数据
+            cursor.execute(
+                "SELECT * FROM Users WHERE telegram_id = ? AND service_type = ?",
+                (telegram_id, service_type)
+            )
+            row = cursor.fetchone()
         if row:
             logger.debug(
-                f"修改 {service_type} 用户名成功, 返回新的ServiceUser对象: new_username={new_username}, telegram_id={telegram_id}, service_type={service_type}, id={row['id']}")
-            return ServiceUser(row['telegram_id'], row['score'], row['invite_code'], row['id'], row['service_user_id'],
-                               service_type=row['service_type'])
+                "修改 {} 用户名成功, 返回新的ServiceUser对象: new_username={}, telegram_id={}, service_type={}, id={}", service_type, new_username, telegram_id, service_type, row['id'])
+            return ServiceUser.from_row(row)
         else:
             logger.error(
-                f"修改 {service_type} 用户名失败: new_username={new_username}, telegram_id={telegram_id}, service_type={service_type}")
+                "修改 {} 用户名失败: new_username={}, telegram_id={}, service_type={}", service_type, new_username, telegram_id, service_type)
             return None
 
     @staticmethod
     def get_status(telegram_id, service_type=None):
         """获取用户状态"""
         service_type = service_type if service_type is not None else settings.SERVICE_TYPE
-        logger.debug(f"获取 {service_type} 用户状态: telegram_id={telegram_id}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        logger.debug("获取 {} 用户状态: telegram_id={}", service_type, telegram_id)
+        with db_session() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT status FROM Users WHERE telegram_id = ? AND service_type = ?",
-                       (telegram_id, service_type))
-        row = cursor.fetchone()
-        close_db_connection(conn)
+            cursor.execute("SELECT status FROM Users WHERE telegram_id = ? AND service_type = ?",
+                           (telegram_id, service_type))
+            row = cursor.fetchone()
 
         if row:
-            logger.debug(f"获取 {service_type} 用户状态成功: telegram_id={telegram_id}, status={row['status']}")
+            logger.debug("获取 {} 用户状态成功: telegram_id={}, status={}", service_type, telegram_id, row['status'])
             return row['status']
         else:
-            logger.warning(f"{service_type} 用户不存在: telegram_id={telegram_id}")
+            logger.warning("{} 用户不存在: telegram_id={}", service_type, telegram_id)
             return None
 
     @staticmethod
     def update_status(telegram_id, new_status, service_type=None):
         """修改用户状态"""
         service_type = service_type if service_type is not None else settings.SERVICE_TYPE
-        logger.debug(f"修改 {service_type} 用户状态: telegram_id={telegram_id}, new_status={new_status}")
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("UPDATE Users SET status = ? WHERE telegram_id = ? AND service_type = ?",
-                       (new_status, telegram_id, service_type))
-        conn.commit()
-        # 获取更新后的数据
-        cursor.execute(
-            "SELECT * FROM Users WHERE telegram_id = ? AND service_type = ?",
-            (telegram_id, service_type)
-        )
-        row = cursor.fetchone()
-        close_db_connection(conn)
+        logger.debug("修改 {} 用户状态: telegram_id={}, new_status={}", service_type, telegram_id, new_status)
+        with db_session() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("UPDATE Users SET status = ? WHERE telegram_id = ? AND service_type = ?",
+                           (new_status, telegram_id, service_type))
+            _invalidate_user_cache(keys=[UserCache.telegram_id_key(telegram_id, service_type)])
+            # 获取更新后的数据
+            cursor.execute(
+                "SELECT * FROM Users WHERE telegram_id = ? AND service_type = ?",
+                (telegram_id, service_type)
+            )
+            row = cursor.fetchone()
         if row:
             logger.debug(
-                f"修改 {service_type} 用户状态成功, 返回新的ServiceUser对象: new_status={new_status}, telegram_id={telegram_id}, service_type={service_type}, id={row['id']}")
-            return ServiceUser(row['telegram_id'], row['score'], row['invite_code'], row['id'], row['service_user_id'],
-                               service_type=row['service_type'], status={new_status})
+                "修改 {} 用户状态成功, 返回新的ServiceUser对象: new_status={}, telegram_id={}, service_type={}, id={}", service_type, new_status, telegram_id, service_type, row['id'])
+            return ServiceUser.from_row(row)
         else:
             logger.error(
-                f"修改 {service_type} 用户状态失败: new_status={new_status}, telegram_id={telegram_id}, service_type={service_type}")
+                "修改 {} 用户状态失败: new_status={}, telegram_id={}, service_type={}", service_type, new_status, telegram_id, service_type)
             return None
 
     def __str__(self):
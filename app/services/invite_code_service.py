@@ -1,6 +1,8 @@
 # 邀请码服务层
 from app.models import InviteCode
 from app.utils.logger import logger
+from app.utils.db_utils import write_lock
+from app.utils.invite_code_index import get_invite_code_index
 from config import settings
 from datetime import datetime, timedelta
 from typing import Optional
@@ -31,24 +33,48 @@ class InviteCodeService:
             生成的邀请码对象，如果生成失败则返回 None
         """
         logger.debug(
-            f"开始生成邀请码: create_user_id={create_user_id}, length={length}, expire_days={expire_days}, code_type={code_type}")
+            "开始生成邀请码: create_user_id={}, length={}, expire_days={}, code_type={}", create_user_id, length, expire_days, code_type)
 
         # 检查 code_type 是否合法
         if code_type not in ['invite', 'renew']:
-            logger.error(f"无效的邀请码类型: {code_type}")
+            logger.error("无效的邀请码类型: {}", code_type)
             return None
-        if code_type == 'invite':
-            # 生成邀请码
-            invite_code = InviteCode.generate_code(length=length, user_id=create_user_id, code_type=code_type,
-                                                   expire_days=expire_days)
+        invite_code = InviteCode.generate_code(length=length, user_id=create_user_id, code_type=code_type,
+                                               expire_days=expire_days)
 
         if invite_code:
-            logger.debug(f"邀请码生成成功: invite_code={invite_code.code}")
+            logger.debug("邀请码生成成功: invite_code={}", invite_code.code)
             return invite_code
         else:
             logger.error("邀请码生成失败")
             return None
 
+    @staticmethod
+    def generate_invite_codes(create_user_id: int, count: int, expire_days: int = settings.INVITE_CODE_EXPIRATION_DAYS,
+                              code_type: str = 'invite', length: int = settings.INVITE_CODE_LENGTH) -> Optional[list]:
+        """
+        批量生成邀请码或续期码
+
+        Args:
+            create_user_id: 创建邀请码的用户 telegram_id
+            count: 生成数量，不能超过 settings.INVITE_CODE_BATCH_MAX
+            expire_days: 邀请码有效天数或续期天数
+            code_type: 邀请码类型，'invite' 或 'renew'
+            length: 邀请码长度
+
+        Returns:
+            邀请码字符串列表，如果参数不合法则返回 None
+        """
+        logger.debug("开始批量生成邀请码: create_user_id={}, count={}, expire_days={}, code_type={}", create_user_id, count, expire_days, code_type)
+        if code_type not in ['invite', 'renew']:
+            logger.error("无效的邀请码类型: {}", code_type)
+            return None
+        if count <= 0 or count > settings.INVITE_CODE_BATCH_MAX:
+            logger.error("邀请码生成数量不合法: count={}", count)
+            return None
+        return InviteCode.generate_batch(count, code_type=code_type, expire_days=expire_days,
+                                         create_user_id=create_user_id, length=length)
+
     @staticmethod
     def get_invite_code(code):
         """
@@ -60,15 +86,41 @@ class InviteCodeService:
         Returns:
             邀请码对象，如果邀请码不存在则返回 None
         """
-        logger.debug(f"查询邀请码: code={code}")
+        logger.debug("查询邀请码: code={}", code)
         invite_code = InviteCode.get_by_code(code)
         if invite_code:
-            logger.debug(f"邀请码查询成功: invite_code={invite_code}")
+            logger.debug("邀请码查询成功: invite_code={}", invite_code)
             return invite_code
         else:
-            logger.warning(f"邀请码不存在: code={code}")
+            logger.warning("邀请码不存在: code={}", code)
             return None
 
+    @staticmethod
+    def rebuild_index():
+        """从数据库重建未使用邀请码的内存索引 (启动时调用)"""
+        get_invite_code_index().rebuild(InviteCode.get_unused_code_entries())
+
+    @staticmethod
+    def is_code_available(code: str, code_type: str = 'invite') -> bool:
+        """
+        判断邀请码是否存在、未使用且未过期
+        先查内存索引，索引判定无效的邀请码不再查询数据库
+
+        Args:
+            code: 邀请码
+            code_type: 邀请码类型，'invite' 或 'renew'
+
+        Returns:
+            True 如果邀请码可用，否则返回 False
+        """
+        if not get_invite_code_index().might_be_valid(code, code_type):
+            logger.debug("邀请码索引判定无效: code={}", code)
+            return False
+        invite_code = InviteCode.get_by_code(code)
+        if not invite_code or invite_code.is_used or invite_code.type != code_type:
+            return False
+        return not invite_code.is_expired()
+
     @staticmethod
     def use_invite_code(code: str, user_id: int, code_type: str = 'invite') -> bool:
         """
@@ -81,83 +133,89 @@ class InviteCodeService:
         Returns:
             True 如果使用成功，否则返回 False
         """
-        logger.debug(f"开始使用邀请码: code={code}, user_id={user_id}")
-        invite_code = InviteCode.get_by_code(code)
-        if invite_code:
-            if invite_code.is_used:
-                logger.warning(f"邀请码已被使用: code={code}")
-                return False
-
-            # 根据邀请码类型处理
-            if invite_code.type == 'invite' and code_type == 'invite':
-                # 计算过期时间
-                expire_time = invite_code.create_time + timedelta(days=invite_code.expire_days)
-                if expire_time < datetime.now():
-                    logger.warning(f"邀请码已过期: code={code}")
+        logger.debug("开始使用邀请码: code={}, user_id={}", code, user_id)
+        if not get_invite_code_index().might_be_valid(code, code_type):
+            logger.warning("邀请码无效: code={}", code)
+            return False
+        # 同一个邀请码的检查和标记使用需要串行执行，防止被重复使用
+        with write_lock(("invite_code", code)):
+            invite_code = InviteCode.get_by_code(code)
+            if invite_code:
+                if invite_code.is_used:
+                    logger.warning("邀请码已被使用: code={}", code)
                     return False
-                # 处理邀请码逻辑
-                invite_code.is_used = True
-                invite_code.user_id = user_id
-                invite_code.save()
-                logger.debug(f"邀请码使用成功: code={code}, user_id={user_id}")
-                return True
-            elif invite_code.type == 'renew' and code_type == 'renew':
-                # 处理续期码逻辑
-                service_user = ServiceUser.get_by_telegram_id_and_service_type(user_id)
-                if service_user:
-                    # 更新用户的过期时间
-                    if service_user.expiration_date:
-                        new_expiration_date = service_user.expiration_date + timedelta(days=invite_code.expire_days)
-                    else:
-                        new_expiration_date = datetime.now() + timedelta(days=invite_code.expire_days)
-                    service_user.expiration_date = new_expiration_date
-                    service_user.save()
+
+                # 根据邀请码类型处理
+                if invite_code.type == 'invite' and code_type == 'invite':
+                    # 计算过期时间
+                    if invite_code.is_expired():
+                        logger.warning("邀请码已过期: code={}", code)
+                        return False
+                    # 处理邀请码逻辑
                     invite_code.is_used = True
                     invite_code.user_id = user_id
                     invite_code.save()
-                    logger.debug(f"续期码使用成功: code={code}, user_id={user_id}, 新过期时间={new_expiration_date}")
+                    logger.debug("邀请码使用成功: code={}, user_id={}", code, user_id)
                     return True
+                elif invite_code.type == 'renew' and code_type == 'renew':
+                    # 处理续期码逻辑
+                    service_user = ServiceUser.get_by_telegram_id_and_service_type(user_id)
+                    if service_user:
+                        # 更新用户的过期时间
+                        if service_user.expiration_date:
+                            new_expiration_date = service_user.expiration_date + timedelta(days=invite_code.expire_days)
+                        else:
+                            new_expiration_date = datetime.now() + timedelta(days=invite_code.expire_days)
+                        service_user.expiration_date = new_expiration_date
+                        service_user.save()
+                        invite_code.is_used = True
+                        invite_code.user_id = user_id
+                        invite_code.save()
+                        logger.debug("续期码使用成功: code={}, user_id={}, 新过期时间={}", code, user_id, new_expiration_date)
+                        return True
+                    else:
+                        logger.warning("用户不存在: user_id={}", user_id)
+                        return False
                 else:
-                    logger.warning(f"用户不存在: user_id={user_id}")
+                    logger.error("未知的邀请码类型: type={}", invite_code.type)
                     return False
             else:
-                logger.error(f"未知的邀请码类型: type={invite_code.type}")
+                logger.warning("邀请码不存在: code={}", code)
                 return False
-        else:
-            logger.warning(f"邀请码不存在: code={code}")
-            return False
 
     @staticmethod
-    def get_all_invite_codes(code_type: str = None, is_used: bool = None):
+    def get_all_invite_codes(code_type: str = None, is_used: bool = None, unexpired: bool = False):
         """
-        获取所有邀请码，支持根据 code_type 和 is_used 筛选
+        获取所有邀请码，支持根据 code_type、is_used 和是否过期筛选
 
         Args:
             code_type: 邀请码类型，'invite' 或 'renew'，默认为 None（不筛选）
             is_used: 是否使用，True 或 False，默认为 None（不筛选）
+            unexpired: 为 True 时只返回未过期的邀请码，默认为 False
 
         Returns:
             符合条件的邀请码列表，如果获取失败则返回 None
         """
-        logger.debug(f"获取所有邀请码: code_type={code_type}, is_used={is_used}")
-        invite_codes = InviteCode.get_all()
+        logger.debug("获取所有邀请码: code_type={}, is_used={}, unexpired={}", code_type, is_used, unexpired)
+        invite_codes = InviteCode.find(code_type=code_type, is_used=is_used, unexpired=unexpired)
         if invite_codes:
-            # 根据 code_type 筛选
-            if code_type:
-                invite_codes = [code for code in invite_codes if code.type == code_type]
-            # 根据 is_used 筛选
-            if is_used is not None:
-                invite_codes = [code for code in invite_codes if code.is_used == is_used]
-            logger.debug(f"获取所有邀请码成功: invite_codes={invite_codes}")
+            logger.debug("获取所有邀请码成功: count={}", len(invite_codes))
             return invite_codes
         else:
             logger.warning("获取所有邀请码失败")
             return None
 
+    @staticmethod
+    def purge_expired_codes():
+        """删除所有已过期且未使用的邀请码 (定时任务)"""
+        codes = InviteCode.purge_expired()
+        logger.info("已清理过期邀请码: count={}", len(codes))
+        return len(codes)
+
     @staticmethod
     def delete_invite_code(invite_code):
         """删除邀请码"""
-        logger.debug(f"删除邀请码: invite_code={invite_code}")
+        logger.debug("删除邀请码: invite_code={}", invite_code)
         invite_code.delete()
-        logger.debug(f"邀请码删除成功: invite_code={invite_code}")
+        logger.debug("邀请码删除成功: invite_code={}", invite_code)
         return True
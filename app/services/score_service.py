@@ -1,12 +1,12 @@
 # 积分服务
-from app.models import User
+from app.models import User, ServiceUser, ScoreLedger
 from app.utils.logger import logger
 from app.services.user_service import UserService
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import pytz
 import json
 import random
-from app.utils.db_utils import insert_data, select_data, update_data
+from app.utils.db_utils import insert_data, select_data, update_data, write_lock, db_transaction
 # 需要安装的模块：无
 
 class ScoreService:
@@ -25,65 +25,138 @@ class ScoreService:
         Returns:
             用户积分，如果用户不存在则返回 None
         """
-        logger.debug(f"获取用户积分: user_id={user_id}")
+        logger.debug("获取用户积分: user_id={}", user_id)
         user = UserService.get_user_by_id(user_id)
         if user:
-            logger.debug(f"获取用户积分成功: user_id={user_id}, score={user.score}")
+            logger.debug("获取用户积分成功: user_id={}, score={}", user_id, user.score)
             return user.score
         else:
-            logger.warning(f"用户不存在: user_id={user_id}")
+            logger.warning("用户不存在: user_id={}", user_id)
             return None
 
     @staticmethod
-    def add_score(user_id, score):
+    def add_score(user_id, score, reason=ScoreLedger.REASON_ADMIN, ref=None):
         """
         增加用户积分
 
         Args:
             user_id: 用户 ID
             score: 增加的积分
+            reason: 积分变动原因，记录在积分流水中
+            ref: 关联的对象 (例如红包活动 ID)
 
         Returns:
             更新后的用户对象，如果用户不存在则返回 None
         """
-        logger.debug(f"增加用户积分: user_id={user_id}, score={score}")
-        user = UserService.get_user_by_id(user_id)
+        logger.debug("增加用户积分: user_id={}, score={}, reason={}", user_id, score, reason)
+        with db_transaction():
+            user = ServiceUser.add_score(user_id, score)
+            if user:
+                ScoreLedger.add(user_id, score, reason, ref)
         if user:
-            user.score += score
-            user.save()
-            logger.debug(f"增加用户积分成功: user_id={user_id}, score={user.score}")
-            return user
-        else:
-            logger.warning(f"用户不存在: user_id={user_id}")
-            return None
+            logger.debug("增加用户积分成功: user_id={}, score={}", user_id, user.score)
+        return user
 
     @staticmethod
-    def reduce_score(user_id, score):
+    def reduce_score(user_id, score, reason=ScoreLedger.REASON_ADMIN, ref=None):
         """
-        减少用户积分
+        减少用户积分，积分不足时不扣除
 
         Args:
             user_id: 用户 ID
             score: 减少的积分
+            reason: 积分变动原因，记录在积分流水中
+            ref: 关联的对象
 
         Returns:
-            更新后的用户对象，如果用户不存在则返回 None
+            更新后的用户对象，如果用户不存在或积分不足则返回 None
         """
-        logger.debug(f"减少用户积分: user_id={user_id}, score={score}")
-        user = UserService.get_user_by_id(user_id)
+        logger.debug("减少用户积分: user_id={}, score={}, reason={}", user_id, score, reason)
+        with db_transaction():
+            user = ServiceUser.add_score(user_id, -score, min_score=score)
+            if user:
+                ScoreLedger.add(user_id, -score, reason, ref)
         if user:
-            if user.score >= score:
-                user.score -= score
-                user.save()
-                logger.debug(f"减少用户积分成功: user_id={user_id}, score={user.score}")
-                return user
-            else:
-                logger.warning(f"用户积分不足: user_id={user_id}, score={user.score}, required={score}")
-                return None
-        else:
-            logger.warning(f"用户不存在: user_id={user_id}")
+            logger.debug("减少用户积分成功: user_id={}, score={}", user_id, user.score)
+        return user
+
+    @staticmethod
+    def add_scores(grants, reason=ScoreLedger.REASON_ADMIN, ref=None):
+        """
+        在一个事务中批量增加用户积分，并批量写入积分流水
+
+        Args:
+            grants: [(user_id, score), ...] 列表
+            reason: 积分变动原因
+            ref: 关联的对象
+
+        Returns:
+            实际增加积分的用户数量
+        """
+        logger.debug("批量增加用户积分: count={}, reason={}", len(grants), reason)
+        with db_transaction():
+            updated = ServiceUser.add_score_bulk(grants)
+            ScoreLedger.add_many([(user_id, score, reason, ref) for user_id, score in grants])
+        logger.debug("批量增加用户积分成功: count={}", updated)
+        return updated
+
+    @staticmethod
+    def grant_random_scores(user_ids, max_score=10, reason=ScoreLedger.REASON_ADMIN):
+        """
+        批量为用户发放随机积分：先生成全部随机积分，再在一个事务中批量写入
+
+        Args:
+            user_ids: 用户 ID 列表
+            max_score: 每个用户可获得的最大积分
+            reason: 积分变动原因
+
+        Returns:
+            发放结果汇总 {"count": 发放人数, "total": 发放总积分, "min": 最小积分, "max": 最大积分}
+        """
+        logger.debug("批量发放随机积分: count={}, max_score={}", len(user_ids), max_score)
+        grants = [(user_id, random.randint(1, max_score)) for user_id in user_ids]
+        count = ScoreService.add_scores(grants, reason=reason) if grants else 0
+        scores = [score for _, score in grants]
+        summary = {
+            "count": count,
+            "total": sum(scores),
+            "min": min(scores, default=0),
+            "max": max(scores, default=0),
+        }
+        logger.info("批量发放随机积分完成: {}", summary)
+        return summary
+
+    @staticmethod
+    def transfer_score(sender_id, receiver_id, score):
+        """
+        在一个事务中完成积分转账：扣除赠送者积分并增加接收者积分，任一步失败都不会产生修改
+
+        Args:
+            sender_id: 赠送者用户 ID
+            receiver_id: 接收者用户 ID
+            score: 转账积分
+
+        Returns:
+            (赠送者, 接收者) 更新后的用户对象，积分不足或用户不存在时返回 None
+        """
+        logger.debug("积分转账: sender_id={}, receiver_id={}, score={}", sender_id, receiver_id, score)
+        try:
+            with db_transaction():
+                sender = ServiceUser.add_score(sender_id, -score, min_score=score)
+                if not sender:
+                    return None
+                receiver = ServiceUser.add_score(receiver_id, score)
+                if not receiver:
+                    # 抛出异常使事务回滚，撤销已扣除的积分
+                    raise LookupError(f"接收者不存在: receiver_id={receiver_id}")
+                ScoreLedger.add_many([(sender_id, -score, ScoreLedger.REASON_GIVE, receiver_id),
+                                      (receiver_id, score, ScoreLedger.REASON_GIVE, sender_id)])
+        except LookupError as e:
+            logger.warning("积分转账失败: {}", e)
             return None
-    
+        logger.debug("积分转账成功: sender_id={}, receiver_id={}, score={}", sender_id, receiver_id, score)
+        return sender, receiver
+
     @staticmethod
     def update_user_score(user_id, score):
         """
@@ -96,16 +169,15 @@ class ScoreService:
         Returns:
             更新后的用户对象，如果用户不存在则返回 None
         """
-        logger.debug(f"设置用户积分: user_id={user_id}, score={score}")
-        user = UserService.get_user_by_id(user_id)
+        logger.debug("设置用户积分: user_id={}, score={}", user_id, score)
+        with db_transaction():
+            # 修改前的积分在写事务中读取，不使用可能过期的缓存
+            user, old_score = ServiceUser.set_score(user_id, score)
+            if user and score != old_score:
+                ScoreLedger.add(user_id, score - old_score, ScoreLedger.REASON_ADMIN)
         if user:
-            user.score = score
-            user.save()
-            logger.debug(f"设置用户积分成功: user_id={user_id}, score={user.score}")
-            return user
-        else:
-            logger.warning(f"用户不存在: user_id={user_id}")
-            return None
+            logger.debug("设置用户积分成功: user_id={}, score={}", user_id, user.score)
+        return user
 
     @staticmethod
     def sign_in(user_id, max_score=10):
@@ -119,34 +191,27 @@ class ScoreService:
         Returns:
             签到结果，如果签到成功则返回 sign_in_score，如果用户不存在或已签到则返回 False
         """
-        logger.debug(f"用户签到: user_id={user_id}")
-        user = UserService.get_user_by_id(user_id)
+        logger.debug("用户签到: user_id={}", user_id)
+        shanghai_tz = pytz.timezone('Asia/Shanghai')
+        now_shanghai = datetime.now(shanghai_tz)
+
+        # 签到，增加随机积分；是否已签到由 UPDATE 的条件判断，重复点击不会重复加分
+        sign_in_score = random.randint(1, max_score)  # 生成 1 到 max_score 之间的随机整数
+        with db_transaction():
+            user = ServiceUser.sign_in(user_id, sign_in_score, now_shanghai, now_shanghai.date().isoformat())
+            if user:
+                ScoreLedger.add(user_id, sign_in_score, ScoreLedger.REASON_CHECKIN)
         if user:
-            # 检查今天是否已签到
-            shanghai_tz = pytz.timezone('Asia/Shanghai')
-            now_shanghai = datetime.now(shanghai_tz)
-            
-            last_sign_in_date = getattr(user, 'last_sign_in_date', None)
-            if last_sign_in_date and last_sign_in_date.astimezone(shanghai_tz).date() == now_shanghai.date():
-                logger.warning(f"用户今日已签到: user_id={user_id}")
-                return False
-
-            # 签到，增加随机积分
-            import random
-            sign_in_score = random.randint(1, max_score)  # 生成 1 到 max_score 之间的随机整数
-            user.score += sign_in_score
-            user.last_sign_in_date = now_shanghai
-            user.save()
-            logger.debug(f"用户签到成功: user_id={user_id}, 获得积分={sign_in_score}, 总积分={user.score}, 时间={now_shanghai}")
+            logger.debug("用户签到成功: user_id={}, 获得积分={}, 总积分={}, 时间={}", user_id, sign_in_score, user.score, now_shanghai)
             return sign_in_score
         else:
-            logger.warning(f"用户不存在: user_id={user_id}")
+            logger.warning("用户不存在或今日已签到: user_id={}", user_id)
             return False
-    
+
     @staticmethod
     def create_random_score_event(create_user_id, telegram_chat_id, total_score, participants_count):
       """创建随机积分活动"""
-      logger.debug(f"创建随机积分活动，create_user_id={create_user_id}, telegram_chat_id={telegram_chat_id}, total_score={total_score}, participants_count={participants_count}")
+      logger.debug("创建随机积分活动，create_user_id={}, telegram_chat_id={}, total_score={}, participants_count={}", create_user_id, telegram_chat_id, total_score, participants_count)
 
       score_list = ScoreService._generate_random_scores(total_score=total_score, participants_count=participants_count)
       data = {
@@ -157,13 +222,45 @@ class ScoreService:
               "score_list": json.dumps(score_list),
             }
       row_id = insert_data("RandomScoreEvents", data)
-      logger.debug(f"创建随机积分活动成功，id={row_id}")
+      logger.debug("创建随机积分活动成功，id={}", row_id)
       return row_id
 
+    @staticmethod
+    def send_random_score_event(user_id, create_user_id, telegram_chat_id, total_score, participants_count):
+        """
+        发送随机积分红包：在一个事务中扣除发送者积分并创建随机积分活动
+
+        Args:
+            user_id: 发送者用户 ID
+            create_user_id: 发送者 Telegram ID
+            telegram_chat_id: 红包所在的聊天 ID
+            total_score: 红包总积分
+            participants_count: 红包个数
+
+        Returns:
+            活动 ID，积分不足或创建失败时返回 None
+        """
+        logger.debug("发送随机积分红包, user_id={}, total_score={}, participants_count={}", user_id, total_score, participants_count)
+        try:
+            with db_transaction():
+                if not ServiceUser.add_score(user_id, -total_score, min_score=total_score):
+                    return None
+                event_id = ScoreService.create_random_score_event(create_user_id, telegram_chat_id, total_score,
+                                                                  participants_count)
+                if not event_id:
+                    # 抛出异常使事务回滚，退还已扣除的积分
+                    raise RuntimeError("创建随机积分活动失败")
+                ScoreLedger.add(user_id, -total_score, ScoreLedger.REASON_RED_PACKET, event_id)
+        except RuntimeError as e:
+            logger.error("发送随机积分红包失败, user_id={}, error={}", user_id, e)
+            return None
+        logger.debug("发送随机积分红包成功, event_id={}", event_id)
+        return event_id
+
     @staticmethod
     def _generate_random_scores(total_score, participants_count):
         """生成随机积分列表，使用二倍均值算法"""
-        logger.debug(f"生成随机积分列表，total_score={total_score}, participants_count={participants_count}")
+        logger.debug("生成随机积分列表，total_score={}, participants_count={}", total_score, participants_count)
         if participants_count <= 0 or total_score <= 0 or participants_count > total_score:
             logger.warning("参与人数或者总积分必须大于0或总积分必须大于人数！")
             return []
@@ -185,72 +282,110 @@ class ScoreService:
           scores.append(remaining_score)
         
         random.shuffle(scores)
-        logger.debug(f"生成随机积分列表成功，scores={scores}")
+        logger.debug("生成随机积分列表成功，scores={}", scores)
         return scores
     
     @staticmethod
     def get_random_score_event(event_id):
         """根据id获取随机积分活动"""
-        logger.debug(f"根据id获取随机积分活动，event_id={event_id}")
+        logger.debug("根据id获取随机积分活动，event_id={}", event_id)
         query = f"id = ?"
         event_data = select_data("RandomScoreEvents", query, where_values = [event_id])
         if event_data:
-           logger.debug(f"根据id获取随机积分活动成功，event_id={event_id}")
+           logger.debug("根据id获取随机积分活动成功，event_id={}", event_id)
            return event_data[0]
         else:
-           logger.warning(f"根据id获取随机积分活动失败，event_id={event_id}")
+           logger.warning("根据id获取随机积分活动失败，event_id={}", event_id)
            return None
 
     @staticmethod
     def use_random_score(event_id, user_id, user_name):
         """使用随机积分"""
-        logger.debug(f"使用随机积分, event_id={event_id}, user_id={user_id}, user_name={user_name}")
+        logger.debug("使用随机积分, event_id={}, user_id={}, user_name={}", event_id, user_id, user_name)
+        user = UserService.get_user_by_telegram_id(user_id)
+        # 领取记录的读-改-写按活动加锁，不同群里的红包互不阻塞；领取记录和加分在同一个事务中完成
+        with write_lock(("random_score_event", event_id)), db_transaction():
+            user_score = ScoreService._claim_random_score(event_id, user_id, user_name)
+            if user_score is not None and user:
+                ServiceUser.add_score(user.id, user_score)
+                ScoreLedger.add(user.id, user_score, ScoreLedger.REASON_RED_PACKET, event_id)
+                logger.debug("已为{}增加积分: {}分", user.username, user_score)
+        return user_score
+
+    @staticmethod
+    def _claim_random_score(event_id, user_id, user_name):
+        """记录用户领取的随机积分，返回领取到的积分，无法领取时返回 None，调用方需持有活动写锁"""
         event_data = ScoreService.get_random_score_event(event_id)
-        if event_data:
-           score_list = json.loads(event_data['score_list'])
-           if event_data['score_result']:
-               score_result = json.loads(event_data['score_result'])
-           else:
-               score_result = []
-
-           if any(item.get('user_id') == user_id for item in score_result):
-              logger.warning(f"用户已经获取过随机积分, user_id={user_id}")
-              return None
-           
-           if len(score_list) <= len(score_result):
-              logger.warning(f"积分已经分发完毕")
-              return None
-
-           user_score_data = score_list[len(score_result)]
-           user_score = user_score_data
-
-           score_result.append({"user_id": user_id, 'user_name': user_name, 'score':user_score })
-           
-           data = {
+        if not event_data:
+            logger.warning("未获取到活动信息, event_id={}", event_id)
+            return None
+
+        score_list = json.loads(event_data['score_list'])
+        if event_data['score_result']:
+            score_result = json.loads(event_data['score_result'])
+        else:
+            score_result = []
+
+        if any(item.get('user_id') == user_id for item in score_result):
+            logger.warning("用户已经获取过随机积分, user_id={}", user_id)
+            return None
+
+        if len(score_list) <= len(score_result):
+            logger.warning("积分已经分发完毕")
+            return None
+
+        user_score = score_list[len(score_result)]
+        score_result.append({"user_id": user_id, 'user_name': user_name, 'score': user_score})
+
+        data = {
             "score_result": json.dumps(score_result),
-           }
-           
-           if len(score_list) == len(score_result):
+        }
+
+        if len(score_list) == len(score_result):
             data['is_finished'] = True
             data['end_time'] = datetime.now()
-            logger.debug(f"积分分发完成, 设置is_finished=True")
-
-           update_data("RandomScoreEvents", data, f"id = {event_id}")
-           
-           user = UserService.get_user_by_telegram_id(user_id)
-           if user:
-               # 扣除赠送者积分，增加接收者积分
-            ScoreService.add_score(user.id, user_score)
-            logger.debug(f"已为{user.username}增加积分: {user_score}分")
-           return user_score
+            logger.debug("积分分发完成, 设置is_finished=True")
+
+        update_data("RandomScoreEvents", data, "id = ?", [event_id])
+        return user_score
+
+    @staticmethod
+    def get_score_history(user_id, limit=10):
+        """获取用户最近的积分流水"""
+        logger.debug("获取用户积分流水, user_id={}, limit={}", user_id, limit)
+        return ScoreLedger.get_by_user(user_id, limit)
+
+    @staticmethod
+    def get_top_earners(days=7, limit=10):
+        """获取最近 days 天获得积分最多的用户"""
+        logger.debug("获取积分收入排行, days={}, limit={}", days, limit)
+        # 流水时间使用数据库的 CURRENT_TIMESTAMP (UTC)
+        since = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        return ScoreLedger.get_top_earners(since, limit)
+
+    @staticmethod
+    def reconcile_balances(rebuild=False):
+        """
+        按积分流水校正用户积分余额
+
+        Args:
+            rebuild: 为 True 时重建所有用户的余额，否则只修正与流水不一致的用户
+
+        Returns:
+            被修正的用户数量
+        """
+        with db_transaction():
+            changed = ScoreLedger.materialize_balances(only_drifted=not rebuild)
+        if changed and not rebuild:
+            logger.warning("积分余额与流水不一致，已按流水修正: count={}", changed)
         else:
-          logger.warning(f"未获取到活动信息, event_id={event_id}")
-          return None
-    
+            logger.debug("积分余额校正完成: count={}, rebuild={}", changed, rebuild)
+        return changed
+
     @staticmethod
     def _generate_random_score(max_score=10):
         """生成随机积分"""
-        logger.debug(f"生成随机积分, max_score={max_score}")
+        logger.debug("生成随机积分, max_score={}", max_score)
         score = random.randint(1, max_score)
-        logger.debug(f"生成随机积分成功: score={score}")
+        logger.debug("生成随机积分成功: score={}", score)
         return score
\ No newline at end of file
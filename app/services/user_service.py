@@ -1,10 +1,10 @@
 from app.models import User, ServiceUser
 from app.utils.api_clients import service_api_client
+from app.utils.api_clients.async_client import get_async_api_client
 from app.utils.logger import logger
 from config import settings
 from datetime import datetime, timedelta
 import pytz
-import operator
 
 
 # 需要安装的模块：无
@@ -24,14 +24,14 @@ class UserService:
             user = ServiceUser(telegram_id=telegram_id, service_type=service_type, service_user_id=service_user_id,
                                username=username, invite_code=invite_code, expiration_date=expiration_date)
             user.save()
-            logger.debug(f"本地用户创建成功: username={username}")
+            logger.debug("本地用户创建成功: username={}", username)
             return user
         else:
             user = ServiceUser(id=user.id, telegram_id=telegram_id, score=user.score, service_type=service_type,
                                service_user_id=service_user_id, username=username, invite_code=invite_code,
                                expiration_date=user.expiration_date, last_sign_in_date=user.last_sign_in_date)
             user.save()
-            logger.debug(f"本地用户更新成功: username={username}")
+            logger.debug("本地用户更新成功: username={}", username)
             return user
 
     @staticmethod
@@ -51,7 +51,7 @@ class UserService:
         """
         # service_type = settings.SERVICE_TYPE
         logger.debug(
-            f"开始注册用户: telegram_id={telegram_id}, service_type={service_type}， username={username}, password={password}")
+            "开始注册用户: telegram_id={}, service_type={}， username={}, password={}", telegram_id, service_type, username, password)
 
         result = service_api_client.create_user(username, password)
         if result and result['status'] == 'success':
@@ -64,10 +64,10 @@ class UserService:
                     service_user_id = result['data']['user']['id']
                 case _:
                     service_user_id = None
-                    logger.warning(f"不支持的服务类型：{service_type}")
-            logger.debug(f"{service_type} 用户创建成功: service_user_id={service_user_id}")
+                    logger.warning("不支持的服务类型：{}", service_type)
+            logger.debug("{} 用户创建成功: service_user_id={}", service_type, service_user_id)
         else:
-            logger.error(f"{service_type} 用户创建失败: {result}")
+            logger.error("{} 用户创建失败: {}", service_type, result)
             return None
 
         user = ServiceUser.get_by_telegram_id_and_service_type(telegram_id, service_type)
@@ -77,14 +77,14 @@ class UserService:
             user = ServiceUser(telegram_id=telegram_id, service_type=service_type, service_user_id=service_user_id,
                                username=username, invite_code=code, expiration_date=expiration_date)
             user.save()
-            logger.debug(f"本地用户创建成功: user_id={user.id}")
+            logger.debug("本地用户创建成功: user_id={}", user.id)
             return user
         else:
             user = ServiceUser(id=user.id, score=user.score, telegram_id=user.telegram_id, service_type=user.service_type,
                                service_user_id=service_user_id, username=username, invite_code=user.invite_code,
                                expiration_date=expiration_date, last_sign_in_date=user.last_sign_in_date)
             user.save()
-            logger.debug(f"本地用户更新成功: user_id={user.id}")
+            logger.debug("本地用户更新成功: user_id={}", user.id)
             return user
 
     @staticmethod
@@ -93,10 +93,10 @@ class UserService:
         if user.service_type:
             # 删除本地用户
             user.delete()
-            logger.warning(f"本地用户删除成功: user_name={user.username}")
+            logger.warning("本地用户删除成功: user_name={}", user.username)
             return True
         else:
-            logger.error(f"{user.service_type} 用户删除失败")
+            logger.error("{} 用户删除失败", user.service_type)
             return False
 
     @staticmethod
@@ -104,14 +104,14 @@ class UserService:
         """删除用户"""
         result = service_api_client.delete_user(user.service_user_id)
         if result and result['status'] == 'success':
-            logger.warning(f"{user.service_type} 用户删除成功: user_id={user.service_user_id}")
+            logger.warning("{} 用户删除成功: user_id={}", user.service_type, user.service_user_id)
             # 删除本地用户
             user.delete()
-            logger.warning(f"本地用户删除成功: user_id={user.id}")
+            logger.warning("本地用户删除成功: user_id={}", user.id)
             return True
         else:
             user.delete()
-            logger.error(f"{user.service_type} 用户删除失败: {result}")
+            logger.error("{} 用户删除失败: {}", user.service_type, result)
             return False
 
     @staticmethod
@@ -126,19 +126,19 @@ class UserService:
         Returns:
             User 对象，如果用户不存在则返回 None
         """
-        logger.debug(f"查询用户: telegram_id={telegram_id}")
+        logger.debug("查询用户: telegram_id={}", telegram_id)
         user = ServiceUser.get_by_telegram_id_and_service_type(telegram_id, service_type)
-        logger.debug(f"{user}")
+        logger.debug("{}", user)
         if user and user.service_type:
             if user.service_type:
-                logger.debug(f"获取用户信息成功: {user.username}, 服务：{user.service_type}")
+                logger.debug("获取用户信息成功: {}, 服务：{}", user.username, user.service_type)
                 return user
 
             else:
-                logger.error(f"不支持的服务名称: {user.service_type}")
+                logger.error("不支持的服务名称: {}", user.service_type)
                 return None
         else:
-            logger.warning(f"用户不存在: telegram_id={telegram_id}")
+            logger.warning("用户不存在: telegram_id={}", telegram_id)
             return None
 
     @staticmethod
@@ -152,13 +152,13 @@ class UserService:
         Returns:
             User 对象，如果用户不存在则返回 None
         """
-        logger.debug(f"查询用户: user_id={user_id}")
+        logger.debug("查询用户: user_id={}", user_id)
         user = ServiceUser.get_by_id(user_id)
         if user:
-            logger.debug(f"用户查询成功: user={user}")
+            logger.debug("用户查询成功: user={}", user)
             return user
         else:
-            logger.warning(f"用户不存在: user_id={user_id}")
+            logger.warning("用户不存在: user_id={}", user_id)
             return None
 
     @staticmethod
@@ -172,13 +172,13 @@ class UserService:
         Returns:
             ServiceUser 对象，如果用户不存在则返回 None
         """
-        logger.debug(f"查询用户: user_id={user_id}")
+        logger.debug("查询用户: user_id={}", user_id)
         user = ServiceUser.get_by_service_id(user_id)
         if user:
-            logger.debug(f"用户查询成功: user={user}")
+            logger.debug("用户查询成功: user={}", user)
             return user
         else:
-            logger.warning(f"用户不存在: user_id={user_id}")
+            logger.warning("用户不存在: user_id={}", user_id)
             return None
 
     @staticmethod
@@ -192,13 +192,13 @@ class UserService:
         Returns:
             ServiceUser 对象，如果用户不存在则返回 None
         """
-        logger.debug(f"查询用户: username={username}")
+        logger.debug("查询用户: username={}", username)
         user = ServiceUser.get_by_username(username)
         if user:
-            logger.debug(f"用户查询成功: user={user}")
+            logger.debug("用户查询成功: user={}", user)
             return user
         else:
-            logger.warning(f"用户不存在: username={username}")
+            logger.warning("用户不存在: username={}", username)
             return None
 
     @staticmethod
@@ -207,7 +207,7 @@ class UserService:
         logger.debug("获取所有用户")
         users = ServiceUser.get_all(service_type)
         if users:
-            logger.debug(f"获取所有用户成功: users={users}")
+            logger.debug("获取所有用户成功: count={}", len(users))
             return users
         else:
             logger.warning("获取所有用户失败")
@@ -224,28 +224,26 @@ class UserService:
         Returns:
             True 如果是管理员，否则返回 False
         """
-        logger.debug(f"检查用户是否是管理员: telegram_id={telegram_id}")
+        logger.debug("检查用户是否是管理员: telegram_id={}", telegram_id)
         is_admin = telegram_id in settings.ADMIN_TELEGRAM_IDS
-        logger.debug(f"检查结果: {is_admin}")
+        logger.debug("检查结果: {}", is_admin)
         return is_admin
 
     @staticmethod
     def update_user_score(user, score):
-        """更新用户积分"""
-        user.score = score
-        user.save()
-        logger.debug(f"用户积分更新成功: user_id={user.id}, score={user.score}")
-        return user
+        """更新用户积分 (委托给 ScoreService，积分和积分流水只在一处修改)"""
+        from app.services.score_service import ScoreService  # score_service 导入了本模块，这里延迟导入
+        return ScoreService.update_user_score(user.id, score)
 
     @staticmethod
     def auth_user_by_username_and_password(username, password):
         """认证用户绑定"""
         user_id = service_api_client.auth_user(username, password)
         if user_id:
-            logger.info(f"用户认证成功: service_user_id={user_id['id']}")
+            logger.info("用户认证成功: service_user_id={}", user_id['id'])
             return user_id['id']
         else:
-            logger.error(f"服务器未找到该用户！: {username}")
+            logger.error("服务器未找到该用户！: {}", username)
             return False
 
     @staticmethod
@@ -253,39 +251,60 @@ class UserService:
         """重置密码"""
         result = service_api_client.update_username_or_password(user.service_user_id, username=user.username,
                                                                 password=new_password)
+        return UserService._check_reset_password_result(result)
+
+    @staticmethod
+    async def reset_password_async(user, new_password):
+        """重置密码 (协程版本，供协程处理函数调用)"""
+        result = await get_async_api_client().update_username_or_password(user.service_user_id, username=user.username,
+                                                                          password=new_password)
+        return UserService._check_reset_password_result(result)
 
+    @staticmethod
+    def _check_reset_password_result(result):
+        """检查重置密码的请求结果"""
         if result and result['status'] == 'success':
             logger.debug("密码重置成功")
             return True
         else:
-            logger.error(f"密码重置失败: {result}")
+            logger.error("密码重置失败: {}", result)
             return False
 
     @staticmethod
     def update_user_telegram_id(user, telegram_id):
         """更新本地数据库中的用户telegram_id"""
-        logger.debug(f"更新用户Telegram ID")
+        logger.debug("更新用户Telegram ID")
         user.telegram_id = telegram_id
         user.save()
-        logger.debug(f"用户Telegram ID更新成功！")
+        logger.debug("用户Telegram ID更新成功！")
         return user
     
     @staticmethod
     def update_user_name(user, username):
         """更新本地数据库中的用户名"""
-        logger.debug(f"用户重置为：{username}")
+        logger.debug("用户重置为：{}", username)
         return ServiceUser.update_username(user.telegram_id, username)
 
     @staticmethod
     def reset_username(user, new_username):
         """重置用户名"""
         result = service_api_client.update_username_or_password(user.service_user_id, username=new_username)
+        return UserService._check_reset_username_result(result, new_username)
+
+    @staticmethod
+    async def reset_username_async(user, new_username):
+        """重置用户名 (协程版本，供协程处理函数调用)"""
+        result = await get_async_api_client().update_username_or_password(user.service_user_id, username=new_username)
+        return UserService._check_reset_username_result(result, new_username)
 
+    @staticmethod
+    def _check_reset_username_result(result, new_username):
+        """检查重置用户名的请求结果"""
         if result and result['status'] == 'success':
-            logger.debug(f"用户重置为：{new_username}")
+            logger.debug("用户重置为：{}", new_username)
             return True
         else:
-            logger.error(f"用户重置用户名失败: {result}")
+            logger.error("用户重置用户名失败: {}", result)
             return False
 
     @staticmethod
@@ -295,30 +314,30 @@ class UserService:
         expired_users = service_api_client._get_expired_users()
         if 'warning' in expired_users and expired_users['warning']:
             for user in expired_users['warning']:
-                logger.warning(f"用户将在3天后过期，请注意: service_user_id={user['service_user_id']}")
+                logger.warning("用户将在3天后过期，请注意: service_user_id={}", user['service_user_id'])
         if 'expired' in expired_users and expired_users['expired']:
             user_list = []
             for user in expired_users['expired']:
                 u = ServiceUser.get_by_service_id(user['service_user_id'])
                 if u:
                     if u.status == 'whitelist':
-                        logger.info(f"发现白名单用户{user['username']}, 不处理！")
+                        logger.info("发现白名单用户{}, 不处理！", user['username'])
                         pass
                     else:
-                        logger.warning(f"删除过期用户: service_user_id={user['service_user_id']}")
+                        logger.warning("删除过期用户: service_user_id={}", user['service_user_id'])
                         service_api_client.delete_user(user['service_user_id'])
                         user_list.append(user['username'])
                         navi = ServiceUser.get_by_service_id(user['service_user_id'])
-                        logger.warning(f"删除本地过期用户: telegram_id={navi.telegram_id}")
+                        logger.warning("删除本地过期用户: telegram_id={}", navi.telegram_id)
                         navi.delete()
                         # if navi:
-                        #     logger.warning(f"删除本地过期用户: telegram_id={navi.telegram_id}")
+                        #     logger.warning("删除本地过期用户: telegram_id={}", navi.telegram_id)
                         #     navi.delete()
                         # else:
                         #     logger.warning("本地无用户信息，无需删除！")
                         #     pass
                 else:
-                    logger.warning(f"该用户没有绑定TG账户 service_user_id={user['service_user_id']}")
+                    logger.warning("该用户没有绑定TG账户 service_user_id={}", user['service_user_id'])
                     service_api_client.delete_user(user['service_user_id'])
                     user_list.append(user['username'])
             return user_list
@@ -334,6 +353,9 @@ class UserService:
     def start_clean_expired_users():
         """启动和关闭清理系统"""
         logger.debug("准备关闭/开启清理系统")
+        if not hasattr(service_api_client, "start_clean_expired_users"):
+            logger.warning("当前服务不支持定时清理过期用户: service_type={}", settings.SERVICE_TYPE)
+            return
         service_api_client.start_clean_expired_users()
 
     @staticmethod
@@ -346,26 +368,22 @@ class UserService:
       Returns:
         符合条件的用户列表
       """
-        logger.debug(f"获取指定注册时间范围内注册的用户, start_time={start_time}, end_time={end_time}")
+        logger.debug("获取指定注册时间范围内注册的用户, start_time={}, end_time={}", start_time, end_time)
         if start_time is None and end_time is None:
-            logger.debug(f"未指定时间区间，获取所有用户的列表")
+            logger.debug("未指定时间区间，获取所有用户的列表")
             return UserService.get_all_users()
 
         try:
             start_date = datetime.strptime(start_time, "%Y-%m-%d").date()
             end_date = datetime.strptime(end_time, "%Y-%m-%d").date()
         except ValueError:
-            logger.warning(f"时间格式错误, 请使用 'YYYY-MM-DD'格式, start_time={start_time}, end_time={end_time}")
+            logger.warning("时间格式错误, 请使用 'YYYY-MM-DD'格式, start_time={}, end_time={}", start_time, end_time)
             return []
-        users = UserService.get_all_users()
-        if not users:
-            logger.warning("没有用户，无法获取签到用户列表！")
-            return []
-
-        user_list = [user for user in users if hasattr(user, 'id') and user.id and User.get_by_id(
-            user.id).create_time and start_date <= User.get_by_id(user.id).create_time.date() <= end_date]
+        # 结束日期包含当天，因此查询上界取结束日期的下一天
+        user_list = ServiceUser.get_by_create_time_range(start_date.isoformat(),
+                                                         (end_date + timedelta(days=1)).isoformat())
         logger.debug(
-            f"获取指定注册时间范围内注册的用户成功, start_time={start_time}, end_time={end_time}, count={len(user_list)}")
+            "获取指定注册时间范围内注册的用户成功, start_time={}, end_time={}, count={}", start_time, end_time, len(user_list))
         return user_list
 
     @staticmethod
@@ -379,42 +397,26 @@ class UserService:
         Returns:
             符合条件的用户列表
         """
-        logger.debug(f"获取签到用户列表，时间范围: {time_range}")
+        logger.debug("获取签到用户列表，时间范围: {}", time_range)
         shanghai_tz = pytz.timezone('Asia/Shanghai')
         now_shanghai = datetime.now(shanghai_tz)
-        users = UserService.get_all_users()
-        if not users:
-            logger.warning("没有用户，无法获取签到用户列表！")
-            return []
 
-        user_list = []
-        if time_range == "today":
-            user_list = [user for user in users if hasattr(user,
-                                                           'last_sign_in_date') and user.last_sign_in_date and user.last_sign_in_date.astimezone(
-                shanghai_tz).date() == now_shanghai.date()]
-        elif time_range == "yesterday":
-            yesterday_shanghai = now_shanghai - timedelta(days=1)
-            user_list = [user for user in users if hasattr(user,
-                                                           'last_sign_in_date') and user.last_sign_in_date and user.last_sign_in_date.astimezone(
-                shanghai_tz).date() == yesterday_shanghai.date()]
+        target_date = now_shanghai.date()
+        if time_range == "yesterday":
+            target_date = (now_shanghai - timedelta(days=1)).date()
         elif isinstance(time_range, str) and len(time_range) == 10 and time_range[4] == "-" and time_range[7] == "-":
             try:
                 target_date = datetime.strptime(time_range, "%Y-%m-%d").date()
-                user_list = [user for user in users if hasattr(user,
-                                                               'last_sign_in_date') and user.last_sign_in_date and user.last_sign_in_date.astimezone(
-                    shanghai_tz).date() == target_date]
             except ValueError:
-                logger.warning(f"时间格式错误，请使用YYYY-MM-DD格式，使用today查询，time_range={time_range}")
-                user_list = [user for user in users if hasattr(user,
-                                                               'last_sign_in_date') and user.last_sign_in_date and user.last_sign_in_date.astimezone(
-                    shanghai_tz).date() == now_shanghai.date()]
-        else:
-            logger.warning(f"不支持的时间范围: {time_range}, 使用today查询")
-            user_list = [user for user in users if hasattr(user,
-                                                           'last_sign_in_date') and user.last_sign_in_date and user.last_sign_in_date.astimezone(
-                shanghai_tz).date() == now_shanghai.date()]
+                logger.warning("时间格式错误，请使用YYYY-MM-DD格式，使用today查询，time_range={}", time_range)
+        elif time_range != "today":
+            logger.warning("不支持的时间范围: {}, 使用today查询", time_range)
+
+        # 签到时间以上海时间存储，按日期字符串区间查询即可命中索引
+        user_list = ServiceUser.get_by_sign_in_date_range(target_date.isoformat(),
+                                                          (target_date + timedelta(days=1)).isoformat())
 
-        logger.debug(f"成功获取签到用户列表: {time_range}, count={len(user_list)}")
+        logger.debug("成功获取签到用户列表: {}, count={}", time_range, len(user_list))
         return user_list
 
     @staticmethod
@@ -424,12 +426,21 @@ class UserService:
         Args:
             user_id (str): 服务器中的用户名id
         """
-        user = service_api_client.get_user(user_id)
+        return UserService._check_service_user(service_api_client.get_user(user_id))
+
+    @staticmethod
+    async def get_info_in_service_by_user_id_async(user_id):
+        """通过 id 获取服务器中注册信息 (协程版本，供协程处理函数调用)"""
+        return UserService._check_service_user(await get_async_api_client().get_user(user_id))
+
+    @staticmethod
+    def _check_service_user(user):
+        """检查服务器返回的用户信息"""
         if user:
-            logger.debug(f"获取用户信息成功: {user}")
+            logger.debug("获取用户信息成功: {}", user)
             return user
         else:
-            logger.error(f"获取用户信息失败: {user}")
+            logger.error("获取用户信息失败: {}", user)
             return None
 
     @staticmethod
@@ -441,27 +452,21 @@ class UserService:
         """
         user = service_api_client.get_user_by_username(user_name)
         if user:
-            logger.debug(f"获取用户信息成功: {user}")
+            logger.debug("获取用户信息成功: {}", user)
             return user
         else:
-            logger.error(f"获取用户信息失败: {user}")
+            logger.error("获取用户信息失败: {}", user)
             return None
 
     @staticmethod
     def get_score_chart(limit=10):
         """获取积分排行榜"""
-        logger.debug(f"获取积分排行榜，limit={limit}")
-        users = UserService.get_all_users()
-        if not users:
+        logger.debug("获取积分排行榜，limit={}", limit)
+        top_users = ServiceUser.get_top_by_score(limit)
+        if not top_users:
             logger.warning("没有用户，无法获取排行榜")
             return []
 
-        # 按积分降序排序
-        sorted_users = sorted(users, key=operator.attrgetter('score'), reverse=True)
-
-        # 获取指定数量的用户
-        top_users = sorted_users[:limit]
-
         # 创建排行榜数据列表
         rank = 1
         chart = []
@@ -469,121 +474,119 @@ class UserService:
             chart.append(
                 {"rank": rank, "telegram_id": user.telegram_id, "username": user.username, "score": user.score})
             rank += 1
-        logger.debug(f"获取积分排行榜成功, limit={limit}")
+        logger.debug("获取积分排行榜成功, limit={}", limit)
         return chart
 
     @staticmethod
     def get_user_status(user_id):
         """获取用户状态"""
-        logger.debug(f"获取用户状态: user_id={user_id}")
+        logger.debug("获取用户状态: user_id={}", user_id)
         user = UserService.get_user_by_id(user_id)
         if user:
-            logger.debug(f"获取用户状态成功: user={user.username}")
+            logger.debug("获取用户状态成功: user={}", user.username)
             return user.status
         else:
-            logger.warning(f"获取用户状态失败: user_id={user_id}")
+            logger.warning("获取用户状态失败: user_id={}", user_id)
             return None
 
     @staticmethod
     def set_user_status(user_id, new_status):
         """设置用户状态"""
-        logger.debug(f"设置用户状态: user_id={user_id}, new_status={new_status}")
+        logger.debug("设置用户状态: user_id={}, new_status={}", user_id, new_status)
         user = UserService.get_user_by_id(user_id)
         if user:
             user.status = new_status
             user.save()
-            logger.debug(f"设置用户状态成功: user={user.username}")
+            logger.debug("设置用户状态成功: user={}", user.username)
             return user
         else:
-            logger.warning(f"设置用户状态失败: user_id={user_id}")
+            logger.warning("设置用户状态失败: user_id={}", user_id)
             return None
 
     @staticmethod
     def clear_user_by_expired(user_id, del_server_user=False):
         """清理过期用户"""
-        logger.debug(f"清理过期用户: user_id={user_id}")
+        logger.debug("清理过期用户: user_id={}", user_id)
         user = UserService.get_user_by_id(user_id)
         if user:
             user.delete()
-            logger.debug(f"清理本地过期用户成功: user={user}")
+            logger.debug("清理本地过期用户成功: user={}", user)
         else:
-            logger.warning(f"清理本地过期用户失败: user_id={user_id}")
+            logger.warning("清理本地过期用户失败: user_id={}", user_id)
             return False
 
         if del_server_user:
             service_api_client.delete_user(user.service_user_id)
-            logger.debug(f"清理服务器过期用户成功: user={user.username}")
+            logger.debug("清理服务器过期用户成功: user={}", user.username)
         else:
-            logger.warning(f"清理服务器过期用户失败: user_id={user_id}")
+            logger.warning("清理服务器过期用户失败: user_id={}", user_id)
             return False
 
     @staticmethod
     def block_user(user_id):
         """封禁用户"""
-        logger.debug(f"封禁用户: user_id={user_id}")
+        logger.debug("封禁用户: user_id={}", user_id)
         user = UserService.get_user_by_id(user_id)
         if user:
             user.status = "blocked"
             user.save()
-            logger.debug(f"封禁用户成功: user={user.username}")
+            logger.debug("封禁用户成功: user={}", user.username)
             return user
         else:
-            logger.warning(f"封禁用户失败: user_id={user_id}")
+            logger.warning("封禁用户失败: user_id={}", user_id)
             return None
 
     @staticmethod
     def unblock_user(user_id):
         """解封用户"""
-        logger.debug(f"解封用户: user_id={user_id}")
+        logger.debug("解封用户: user_id={}", user_id)
         user = UserService.get_user_by_id(user_id)
         if user:
             user.status = "active"
             user.save()
-            logger.debug(f"解封用户成功: user={user.username}")
+            logger.debug("解封用户成功: user={}", user.username)
             return user
         else:
-            logger.warning(f"解封用户失败: user_id={user_id}")
+            logger.warning("解封用户失败: user_id={}", user_id)
             return None
 
     @staticmethod
     def block_server_user(user_id):
         """封禁服务器用户"""
-        logger.debug(f"封禁服务器用户: user_id={user_id}")
+        logger.debug("封禁服务器用户: user_id={}", user_id)
         user = UserService.get_user_by_id(user_id)
         if user:
             service_api_client.block_user(user.service_user_id)
-            logger.debug(f"封禁服务器用户成功: user={user.username}")
+            logger.debug("封禁服务器用户成功: user={}", user.username)
             return user
         else:
-            logger.warning(f"封禁服务器用户失败: user_id={user_id}")
+            logger.warning("封禁服务器用户失败: user_id={}", user_id)
             return None
 
     @staticmethod
     def unblock_server_user(user_id):
         """解封服务器用户"""
-        logger.debug(f"解封服务器用户: user_id={user_id}")
+        logger.debug("解封服务器用户: user_id={}", user_id)
         user = UserService.get_user_by_id(user_id)
         if user:
             service_api_client.unblock_user(user.service_user_id)
-            logger.debug(f"解封服务器用户成功: user={user.username}")
+            logger.debug("解封服务器用户成功: user={}", user.username)
             return user
         else:
-            logger.warning(f"解封服务器用户失败: user_id={user_id}")
+            logger.warning("解封服务器用户失败: user_id={}", user_id)
             return None
 
     @staticmethod
     def get_block_users():
         """获取封禁用户"""
         logger.debug("获取封禁用户")
-        users = UserService.get_all_users()
-        block_users = {}
-        if users:
-            for user in users:
-                if user.status == "blocked":
-                    logger.debug(f"获取封禁用户成功: user={user.username}")
-                    block_users.update({"username": user.username, "telegram_id": user.telegram_id})
-            return block_users
-        else:
-            logger.debug("获取封禁用户失败")
-            return
+        users = ServiceUser.get_by_status("blocked")
+        block_users = [{"username": user.username, "telegram_id": user.telegram_id} for user in users]
+        logger.debug("获取封禁用户成功: count={}", len(block_users))
+        return block_users
 
+    @staticmethod
+    def count_users(status=None):
+        """统计本地数据库用户数量，指定 status 时只统计该状态的用户"""
+        logger.debug("统计用户数量: status={}", status)
+        return ServiceUser.count(status)
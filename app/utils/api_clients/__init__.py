@@ -10,17 +10,17 @@ def init_service(service_type=None):
         case "navidrome":
             from app.utils.api_clients.navidrome import NavidromeAPIClient
             service_api_client = NavidromeAPIClient()
-            logger.info(f"Navidrome 服务启动中")
+            logger.info("Navidrome 服务启动中")
             return service_api_client
         case "emby":
             from app.utils.api_clients.emby import EmbyAPIClient
             service_api_client = EmbyAPIClient()
-            logger.info(f"Emby 服务启动中")
+            logger.info("Emby 服务启动中")
             return service_api_client
         case "audiobookshelf":
             from app.utils.api_clients.audiobookshelf import AudiobookshelfAPIClient
             service_api_client = AudiobookshelfAPIClient()
-            logger.info(f"Audiobookshelf 服务启动中")
+            logger.info("Audiobookshelf 服务启动中")
             return service_api_client
         case _:
             logger.error("不支持的服务！")
@@ -0,0 +1,52 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+
+# 需要安装的模块：无 (asyncio 是 Python 内置模块)
+
+_async_api_client = None
+
+
+class AsyncAPIClient:
+    """
+    API 客户端的异步包装
+    同步客户端 (Navidrome、Emby、Audiobookshelf) 的公开方法都可以在协程中 await 调用，参数与同步客户端完全一致；
+    请求在独立的线程池中执行，复用同步客户端的连接池和认证状态，慢的后端请求只占用该线程池，不占用处理更新的线程
+    """
+
+    def __init__(self, client, max_workers=settings.SERVICE_ASYNC_WORKERS):
+        self.client = client
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="service-api")
+
+    def __getattr__(self, name):
+        # 只包装公开方法，私有方法和未初始化的属性不转发
+        if name.startswith("_") or name in ("client", "executor"):
+            raise AttributeError(name)
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(attr, *args, **kwargs))
+
+        return call
+
+
+def create_async_api_client():
+    """创建异步 API 客户端实例，并赋值给全局变量_async_api_client"""
+    global _async_api_client
+    if not _async_api_client:
+        from app.utils.api_clients import service_api_client
+        _async_api_client = AsyncAPIClient(service_api_client)
+    return _async_api_client
+
+
+def get_async_api_client():
+    """获取异步 API 客户端实例"""
+    global _async_api_client
+    if not _async_api_client:
+        _async_api_client = create_async_api_client()
+    return _async_api_client
@@ -26,7 +26,7 @@ class AudiobookshelfAPIClient(BaseAPIClient):
             self.session.headers.update({"Authorization": f"Bearer {self.token}"})
             result = self.get_libraries()
             if result and result['status'] == 'success':
-                logger.info(f"Audiobookshelf 使用 Key 认证，登录成功")
+                logger.info("Audiobookshelf 使用 Key 认证，登录成功")
         else:
             self.token = self._login()  # 初始化时登录并获取 token
         if self._get_copy_config():
@@ -44,11 +44,11 @@ class AudiobookshelfAPIClient(BaseAPIClient):
             response = self.session.post(url, json=data)
             response.raise_for_status()
             token = response.json().get("token")
-            logger.info(f"Audiobookshelf 登录成功")
+            logger.info("Audiobookshelf 登录成功")
             self.session.headers.update({"Authorization": f"Bearer {token}"})
             return token
         except requests.exceptions.RequestException as e:
-            logger.error(f"Audiobookshelf 登录失败: {e}")
+            logger.error("Audiobookshelf 登录失败: {}", e)
             return None
     
     def _make_request(self, method, endpoint, params=None, data=None, headers=None):
@@ -63,7 +63,7 @@ class AudiobookshelfAPIClient(BaseAPIClient):
         response = None
         try:
             response = self.session.request(method, url, params=params, json=data, headers=_headers)
-            # logger.debug(f"{response.status_code}")
+            # logger.debug("{}", response.status_code)
             # 根据状态码返回不同的结果
             if response.status_code == 200:
                 return {"status": "success", "data": response.json(), "headers": response.headers}
@@ -74,28 +74,28 @@ class AudiobookshelfAPIClient(BaseAPIClient):
                 retries = 0
 
                 while retries < max_retries:
-                    logger.warning(f"Audiobookshelf token 过期，尝试第{retries}次重新登录...")
+                    logger.warning("Audiobookshelf token 过期，尝试第{}次重新登录...", retries)
                     self.token = self._login()
                     if self.token:
                         logger.info("Audiobookshelf 重新登录成功，使用新 token 重新发送请求")
                         return self._make_request(method, endpoint, params, data, headers)
                     else:
-                        logger.warning(f"尝试第{retries}次重新登录失败...")
+                        logger.warning("尝试第{}次重新登录失败...", retries)
                         retries += 1
             else:
                 raise requests.exceptions.RequestException
         except requests.exceptions.RequestException as e:
-            logger.error(f"Audiobookshelf API 请求失败: {e}")
+            logger.error("Audiobookshelf API 请求失败: {}", e)
             return {"status": "error", "message": str(e)}
 
     def _get_copy_config(self):
         from_id = settings.AUDIOBOOKSHELF_COPY_FROM_ID
         if from_id:
-            logger.debug(f"发现用户配置模块，使用模板创建用户")
+            logger.debug("发现用户配置模块，使用模板创建用户")
             resp = self.get_user(from_id)
             return resp['data']['permissions']
         else:
-            logger.warning(f"未发现用户配置模块，使用默认模板创建用户")
+            logger.warning("未发现用户配置模块，使用默认模板创建用户")
             return None
             
     def get_libraries(self):
@@ -116,16 +116,16 @@ class AudiobookshelfAPIClient(BaseAPIClient):
     def get_user(self, user_id):
         """获取 Audiobookshelf 用户"""
         endpoint = f"/api/users/{user_id}"
-        logger.debug(f"Audiobookshelf 获取用户: {user_id}")
+        logger.debug("Audiobookshelf 获取用户: {}", user_id)
         return self._make_request("GET", endpoint)
     
     def get_users(self, online=False):
         """获取 所有 Audiobookshelf 用户"""
         if not online:
             endpoint = f"/api/users/{online}"
-            logger.debug(f"Audiobookshelf 获取所有在线用户")
+            logger.debug("Audiobookshelf 获取所有在线用户")
         endpoint = f"/api/users"
-        logger.debug(f"Audiobookshelf 获取所有用户")
+        logger.debug("Audiobookshelf 获取所有用户")
         return self._make_request("GET", endpoint)
     
     def create_user(self, username, password):
@@ -139,14 +139,14 @@ class AudiobookshelfAPIClient(BaseAPIClient):
             "permissions": self.config
         }
         data = {k: v for k, v in user_data.items() if v is not None}
-        logger.debug(f"Audiobookshelf 创建用户: {data}")
+        logger.debug("Audiobookshelf 创建用户: {}", data)
         return self._make_request("POST", endpoint, data=data)
     
     def update_user(self, user_id, user_data):
         """更新 Audiobookshelf 用户信息"""
         endpoint = f"/api/users/{user_id}"
         data = {k: v for k, v in user_data.items() if v is not None}
-        logger.debug(f"Audiobookshelf 更新用户: {data}")
+        logger.debug("Audiobookshelf 更新用户: {}", data)
         return self._make_request("PATCH", endpoint, data=data)
 
     def auth_user(self, username, password):
@@ -158,10 +158,10 @@ class AudiobookshelfAPIClient(BaseAPIClient):
             response = requests.post(url, json=data)
             response.raise_for_status()
             user_id = response.json().get("id")
-            logger.info(f"用户认证成功")
+            logger.info("用户认证成功")
             return {"id": user_id}
         except requests.exceptions.RequestException as e:
-            logger.error(f"用户认证失败: {e}")
+            logger.error("用户认证失败: {}", e)
             return None
 
 
@@ -174,7 +174,7 @@ class AudiobookshelfAPIClient(BaseAPIClient):
             "permissions": self.config
         }
         data = {k: v for k, v in user_data.items() if v is not None}
-        logger.debug(f"Audiobookshelf 更新用户: {data}")
+        logger.debug("Audiobookshelf 更新用户: {}", data)
         return self._make_request("PATCH", endpoint, data=data)
 
     def block_user(self, user_id):
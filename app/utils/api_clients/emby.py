@@ -25,7 +25,7 @@ class EmbyAPIClient(BaseAPIClient):
             params = {"Limit": 1}
             result = self.get_users(params=params)
             if result and result['status'] == 'success':
-                logger.info(f"Emby 使用 Key 认证，登录成功")
+                logger.info("Emby 使用 Key 认证，登录成功")
         else:
             self.token = self._login()  # 初始化时登录并获取 token
         # scheduler.add_job(job_name="Emby_keep_live", interval=settings.CLEAN_INTERVAL, job_func=self._keep_alive)
@@ -42,7 +42,7 @@ class EmbyAPIClient(BaseAPIClient):
             response = self.session.post(url, json=data, params=params)
             response.raise_for_status()
             token = response.json().get("AccessToken")
-            logger.info(f"Emby 登录成功")
+            logger.info("Emby 登录成功")
             self.session.headers.update({"X-Emby-Token": f"{token}"})
             return token
         except requests.exceptions.RequestException as e:
@@ -73,18 +73,18 @@ class EmbyAPIClient(BaseAPIClient):
                 retries = 0
 
                 while retries < max_retries:
-                    logger.warning(f"Emby token 过期，尝试第{retries}次重新登录...")
+                    logger.warning("Emby token 过期，尝试第{}次重新登录...", retries)
                     self.token = self._login()
                     if self.token:
                         logger.info("Emby 重新登录成功，使用新 token 重新发送请求")
                         return self._make_request(method, endpoint, params, data, headers)
                     else:
-                        logger.warning(f"尝试第{retries}次重新登录失败...")
+                        logger.warning("尝试第{}次重新登录失败...", retries)
                         retries += 1
             else:
                 raise requests.exceptions.RequestException
         except requests.exceptions.RequestException as e:
-            logger.error(f"Emby API 请求失败: {e}")
+            logger.error("Emby API 请求失败: {}", e)
             return {"status": "error", "message": str(e)}
 
     def get_user(self, user_id):
@@ -117,12 +117,12 @@ class EmbyAPIClient(BaseAPIClient):
             "UserCopyOptions": "UserPolicy,UserConfiguration"
             }
         data = {k: v for k, v in user_data.items() if v is not None}
-        logger.debug(f"Emby 创建用户: {data}")
+        logger.debug("Emby 创建用户: {}", data)
         resp = self._make_request("POST", endpoint, data=data)
         try:
             self.update_password(resp['data']['Id'], password)
         except requests.exceptions.RequestException as e:
-            logger.error(f"Emby API 请求失败: {e}")
+            logger.error("Emby API 请求失败: {}", e)
             return {"status": "error", "message": str(e)}
         return resp
 
@@ -142,7 +142,7 @@ class EmbyAPIClient(BaseAPIClient):
             response = requests.post(url, json=data, params=params)
             response.raise_for_status()
             user_id = response.json().get("Id")
-            logger.info(f"用户认证成功")
+            logger.info("用户认证成功")
             return {"id": user_id}
         except requests.exceptions.RequestException as e:
             print(f"用户认证失败: {e}")
@@ -176,7 +176,7 @@ class EmbyAPIClient(BaseAPIClient):
         data = {
             "NewPw": f"{password}"
             }
-        logger.debug(f"Emby 更新用户密码: {data}")
+        logger.debug("Emby 更新用户密码: {}", data)
         return self._make_request("POST", endpoint, data=data)
     
     def block_user(self, user_id):
@@ -41,7 +41,7 @@ class NavidromeAPIClient(BaseAPIClient):
             response = self.session.post(url, json=data)
             response.raise_for_status()
             token = response.json().get("token")
-            logger.info(f"Navidrome 登录成功")
+            logger.info("Navidrome 登录成功")
             self.session.headers.update({"x-nd-authorization": f"Bearer {token}"})
             return token
         except requests.exceptions.RequestException as e:
@@ -57,9 +57,15 @@ class NavidromeAPIClient(BaseAPIClient):
     def _setup_clean_expired_users_job(self):
         """启动清理过期用户的定时器"""
         if settings.ENABLE_EXPIRED_USER_CLEAN:
-            scheduler.add_job(job_name="clean_expired_users", interval=settings.DELAY_INTERVAL,
-                              job_func=self._clean_expired_users)
-            logger.info(f"Navidrome 过期用户清理定时任务启动，时间间隔：{settings.DELAY_INTERVAL} 秒")
+            # 保存到数据库，重启不会重新计时；设置了 CLEAN_CRON 时在固定时间执行
+            if settings.CLEAN_CRON:
+                scheduler.add_cron_job(job_name="clean_expired_users", cron=settings.CLEAN_CRON,
+                                       job_func=self._clean_expired_users, persistent=True)
+                logger.info("Navidrome 过期用户清理定时任务启动，执行时间：{}", settings.CLEAN_CRON)
+            else:
+                scheduler.add_job(job_name="clean_expired_users", interval=settings.CLEAN_INTERVAL,
+                                  job_func=self._clean_expired_users, persistent=True)
+                logger.info("Navidrome 过期用户清理定时任务启动，时间间隔：{} 秒", settings.CLEAN_INTERVAL)
         else:
             logger.info("Navidrome 过期用户清理定时任务未启动")
 
@@ -75,27 +81,27 @@ class NavidromeAPIClient(BaseAPIClient):
                 expired_users = self._get_expired_users()
                 if 'warning' in expired_users and expired_users['warning']:
                     for user in expired_users['warning']:
-                        logger.warning(f"用户名：{user['username']}将在3天后过期，请注意！")
+                        logger.warning("用户名：{}将在3天后过期，请注意！", user['username'])
                 if 'expired' in expired_users and expired_users['expired']:
                     for user in expired_users['expired']:
                         logger.info(
-                            f"删除过期用户: username={user['username']}, service_user_id: {user['service_user_id']}")
+                            "删除过期用户: username={}, service_user_id: {}", user['username'], user['service_user_id'])
                         self.delete_user(user['service_user_id'])
             else:
-                logger.error(f"无法获取token, 无法执行清理过期用户")
+                logger.error("无法获取token, 无法执行清理过期用户")
 
     def _get_expired_users(self):
         """获取过期用户和即将过期的用户(不包括管理员)"""
         expired_users = []
         warning_users = []
         users = self.get_users()
-        logger.debug(f"day: {settings.EXPIRED_DAYS}, warning: {settings.WARNING_DAYS}")
+        logger.debug("day: {}, warning: {}", settings.EXPIRED_DAYS, settings.WARNING_DAYS)
         if users and users['status'] == 'success':
             now = datetime.now().astimezone()
             local_tz = now.tzinfo  # 获取本地时区
             for user_data in users['data']:
                 if not user_data['isAdmin']:
-                    logger.debug(f"正在检查用户: {user_data['userName']}")
+                    logger.debug("正在检查用户: {}", user_data['userName'])
                     last_login_at = user_data.get('lastLoginAt')
                     last_access_at = user_data.get('lastAccessAt')
 
@@ -111,7 +117,7 @@ class NavidromeAPIClient(BaseAPIClient):
                             dt = datetime.fromisoformat(time_str)
                             return dt.astimezone(local_tz).replace(second=0, microsecond=0)
                         except Exception as e:
-                            logger.error(f"解析时间字符串失败: {time_str}，错误信息为 {e}")
+                            logger.error("解析时间字符串失败: {}，错误信息为 {}", time_str, e)
                             return None
 
                     last_login_time = parse_datetime_str(last_login_at)
@@ -123,21 +129,21 @@ class NavidromeAPIClient(BaseAPIClient):
 
                     if last_time:
                         if (now - last_time) > timedelta(days=settings.EXPIRED_DAYS):
-                            logger.debug(f"发现过期用户: {user_data['userName']}")
+                            logger.debug("发现过期用户: {}", user_data['userName'])
                             expired_users.append(
                                 {'service_user_id': user_data['id'], 'username': user_data['userName']})
                         elif (now - last_time) < timedelta(days=settings.WARNING_DAYS):
-                            logger.debug(f"发现即将过期用户: {user_data['userName']}")
+                            logger.debug("发现即将过期用户: {}", user_data['userName'])
                             warning_users.append(
                                 {'service_user_id': user_data['id'], 'username': user_data['userName']})
                         else:
-                            logger.debug(f"该用户正常: {user_data['userName']}")
+                            logger.debug("该用户正常: {}", user_data['userName'])
                     else:
                         # 如果 lastLoginAt 和 lastAccessAt 都是 None，则立即删除
-                        logger.debug(f"该用户从未登录过: {user_data['userName']}")
+                        logger.debug("该用户从未登录过: {}", user_data['userName'])
                         expired_users.append({'service_user_id': user_data['id'], 'username': user_data['userName']})
                 else:
-                    logger.debug(f"发现管理员账号：{user_data['userName']}")
+                    logger.debug("发现管理员账号：{}", user_data['userName'])
         return {'expired': expired_users, 'warning': warning_users}
 
     def _keep_alive(self):
@@ -149,7 +155,7 @@ class NavidromeAPIClient(BaseAPIClient):
                 if result and result['status'] == 'success':
                     logger.info("Navidrome 保活请求成功")
                 else:
-                    logger.warning(f"Navidrome 保活请求失败, result: {result} , 重新获取token")
+                    logger.warning("Navidrome 保活请求失败, result: {} , 重新获取token", result)
                     self.token = self._login()
                     if self.token:
                         logger.info("Navidrome 重新登录成功")
@@ -164,7 +170,7 @@ class NavidromeAPIClient(BaseAPIClient):
         self._keep_alive_timer = threading.Timer(interval, self._keep_alive)
         self._keep_alive_timer.daemon = True  # 设置为守护线程，防止主线程退出时阻塞
         self._keep_alive_timer.start()
-        logger.info(f"Navidrome 保活定时器启动，时间间隔：{interval} 秒")
+        logger.info("Navidrome 保活定时器启动，时间间隔：{} 秒", interval)
 
     def _make_request(self, method, endpoint, params=None, data=None, headers=None):
         """发送 API 请求"""
@@ -187,18 +193,18 @@ class NavidromeAPIClient(BaseAPIClient):
                 retries = 0
 
                 while retries < max_retries:
-                    logger.warning(f"Navidrome token 过期，尝试第{retries}次重新登录...")
+                    logger.warning("Navidrome token 过期，尝试第{}次重新登录...", retries)
                     self.token = self._login()
                     if self.token:
                         logger.info("Navidrome 重新登录成功，使用新 token 重新发送请求")
                         return self._make_request(method, endpoint, params, data, headers)
                     else:
-                        logger.warning(f"尝试第{retries}次重新登录失败...")
+                        logger.warning("尝试第{}次重新登录失败...", retries)
                         retries += 1
             else:
                 raise requests.exceptions.RequestException
         except requests.exceptions.RequestException as e:
-            logger.error(f"Navidrome API 请求失败: {e}")
+            logger.error("Navidrome API 请求失败: {}", e)
             return {"status": "error", "message": str(e)}
 
     def get_user(self, user_id):
@@ -216,7 +222,7 @@ class NavidromeAPIClient(BaseAPIClient):
         users = self.get_users()
         if users and users['status'] == 'success':
             for index, user in enumerate(users['data']):
-                logger.info(f"index: {index}, user: {user}")
+                logger.info("index: {}, user: {}", index, user)
                 if user['userName'] == username:
                     return users['data'][index]
         return None
@@ -249,7 +255,7 @@ class NavidromeAPIClient(BaseAPIClient):
             response = requests.post(url, json=data)
             response.raise_for_status()
             user_id = response.json().get('id')
-            logger.info(f"Navidrome 用户认证成功")
+            logger.info("Navidrome 用户认证成功")
             return {"id": user_id}
         except requests.exceptions.RequestException as e:
             print(f"Navidrome 用户认证失败: {e}")
@@ -269,7 +275,7 @@ class NavidromeAPIClient(BaseAPIClient):
         if password:
             data['changePassword'] = True
             data['password'] = password
-        logger.debug(f"data: {data}")
+        logger.debug("data: {}", data)
         return self._make_request("PUT", endpoint, data=data)
 
     def delete_user(self, user_id):
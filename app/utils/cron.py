@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+import pytz
+
+# 需要安装的模块：pytz
+# pip install pytz
+
+# 各字段的取值范围：分 时 日 月 周 (周日为 0，也可以写 7)
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+_MONTH_NAMES = {name: i for i, name in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1)}
+_DAY_NAMES = {name: i for i, name in enumerate(("sun", "mon", "tue", "wed", "thu", "fri", "sat"))}
+_ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+
+def _parse_value(value, names):
+    value = value.lower()
+    if value in names:
+        return names[value]
+    return int(value)
+
+
+def _parse_field(field, low, high, names=None):
+    """解析单个字段，返回取值集合；支持 *、a-b、*/n、a-b/n 和逗号分隔的列表"""
+    names = names or {}
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/", 1)
+            step = int(step)
+            if step <= 0:
+                raise ValueError(f"步长必须大于 0: {field}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (_parse_value(v, names) for v in part.split("-", 1))
+        else:
+            start = _parse_value(part, names)
+            # 单个值带步长 (例如 5/15) 表示从该值开始到最大值
+            end = high if step > 1 else start
+        if not (low <= start <= high and low <= end <= high and start <= end):
+            raise ValueError(f"取值超出范围 {low}-{high}: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpression:
+    """
+    cron 表达式 (分 时 日 月 周)
+    例如 "0 4 * * *" 表示每天 04:00；日和周都有限制时，满足其中一个即可 (与 crontab 相同)
+    """
+
+    def __init__(self, expression, timezone="Asia/Shanghai"):
+        self.expression = expression.strip()
+        self.timezone = pytz.timezone(timezone) if isinstance(timezone, str) else timezone
+        fields = _ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"cron 表达式必须是 5 个字段: {expression}")
+        (minute_low, minute_high), (hour_low, hour_high), (day_low, day_high), (month_low, month_high), \
+            (dow_low, dow_high) = _FIELD_RANGES
+        self.minutes = _parse_field(fields[0], minute_low, minute_high)
+        self.hours = _parse_field(fields[1], hour_low, hour_high)
+        self.days = _parse_field(fields[2], day_low, day_high)
+        self.months = _parse_field(fields[3], month_low, month_high, _MONTH_NAMES)
+        # 周日可以写 0 或 7，统一成 Python 的 weekday (周一为 0)
+        self.weekdays = {(d - 1) % 7 for d in _parse_field(fields[4], dow_low, dow_high, _DAY_NAMES)}
+        self.day_restricted = fields[2] != "*"
+        self.weekday_restricted = fields[4] != "*"
+
+    def _day_matches(self, value):
+        day_match = value.day in self.days
+        weekday_match = value.weekday() in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_after(self, after=None):
+        """
+        计算 after 之后的下一个执行时间
+
+        Args:
+            after: datetime (无时区时按 self.timezone 处理) 或 Unix 时间戳，默认为当前时间
+
+        Returns:
+            带时区的 datetime
+        """
+        if after is None:
+            after = datetime.now(self.timezone)
+        elif isinstance(after, (int, float)):
+            after = datetime.fromtimestamp(after, self.timezone)
+        elif after.tzinfo is None:
+            after = self.timezone.localize(after)
+        else:
+            after = after.astimezone(self.timezone)
+        # 在本地时间上逐级跳过不匹配的月、日、时、分
+        value = after.replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limit = value + timedelta(days=366 * 5)
+        while value <= limit:
+            if value.month not in self.months:
+                value = (value.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(value):
+                value = (value + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if value.hour not in self.hours:
+                value = (value + timedelta(hours=1)).replace(minute=0)
+                continue
+            if value.minute not in self.minutes:
+                value += timedelta(minutes=1)
+                continue
+            return self.timezone.normalize(self.timezone.localize(value))
+        raise ValueError(f"cron 表达式没有可执行的时间: {self.expression}")
+
+    def __str__(self):
+        return self.expression
@@ -1,166 +1,371 @@
+import asyncio
+import atexit
+import functools
 import sqlite3
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from config import settings
+from app.utils.logger import logger
+from app.utils.metrics import get_metrics
 
 # 需要安装的模块：无 (sqlite3 是 Python 内置模块)
 
-db_lock = threading.Lock()
-def get_db_connection():
-    """获取数据库连接"""
-    conn = sqlite3.connect(settings.DATABASE_URL)
+# 写锁分段表：写操作按逻辑键 (用户 ID、活动 ID、邀请码) 映射到固定数量的锁上，
+# 不同键的写操作互不阻塞；读操作依赖 WAL 快照，不加 Python 锁
+_write_locks = [threading.RLock() for _ in range(max(1, settings.DB_WRITE_LOCK_STRIPES))]
+
+# 每个线程持有一个长连接，避免每次查询都重新打开数据库
+_local = threading.local()
+# 所有已创建的连接: {线程 ident: (线程对象, 连接)}，用于关闭时统一释放
+_connections = {}
+_connections_lock = threading.Lock()
+_db_executor = None
+
+# PRAGMA 查询返回的是数字，自检时换算成可读名称
+_PRAGMA_VALUE_NAMES = {
+    "synchronous": {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"},
+    "temp_store": {0: "DEFAULT", 1: "FILE", 2: "MEMORY"},
+}
+
+
+def _tuning_pragmas():
+    """根据配置生成需要在每个连接上执行的 PRAGMA"""
+    return [
+        ("journal_mode", settings.SQLITE_JOURNAL_MODE),
+        ("synchronous", settings.SQLITE_SYNCHRONOUS),
+        ("busy_timeout", settings.SQLITE_BUSY_TIMEOUT),
+        ("cache_size", settings.SQLITE_CACHE_SIZE),
+        ("mmap_size", settings.SQLITE_MMAP_SIZE),
+        ("temp_store", settings.SQLITE_TEMP_STORE),
+    ]
+
+
+def _apply_tuning(conn):
+    """在连接上应用 SQLite 调优参数"""
+    for name, value in _tuning_pragmas():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def _create_connection():
+    """创建一个新的数据库连接"""
+    conn = sqlite3.connect(
+        settings.DATABASE_URL,
+        timeout=settings.SQLITE_BUSY_TIMEOUT / 1000,
+        check_same_thread=False,  # 允许在关闭钩子中由其他线程关闭
+        cached_statements=settings.DB_STATEMENT_CACHE_SIZE,  # 预编译语句缓存
+    )
     conn.row_factory = sqlite3.Row  # 使查询结果可以像字典一样访问
+    _apply_tuning(conn)
     return conn
 
+
+def check_db_settings():
+    """
+    自检：读取当前连接上实际生效的 PRAGMA 值并记录日志
+    配置值与实际值不一致时（例如文件系统不支持 WAL）给出警告
+
+    Returns:
+        {pragma 名称: 实际值} 字典
+    """
+    conn = get_db_connection()
+    effective = {}
+    for name, expected in _tuning_pragmas():
+        value = conn.execute(f"PRAGMA {name}").fetchone()[0]
+        value = _PRAGMA_VALUE_NAMES.get(name, {}).get(value, value)
+        effective[name] = value
+        if str(value).lower() != str(expected).lower():
+            logger.warning("SQLite 参数未按配置生效: {}={}, 期望值={}", name, value, expected)
+    logger.info("SQLite 当前参数: " + ", ".join(f"{name}={value}" for name, value in effective.items()))
+    return effective
+
+
+def _prune_dead_connections():
+    """关闭已退出线程遗留的连接 (调用方需持有 _connections_lock)"""
+    for ident, (thread, conn) in list(_connections.items()):
+        if not thread.is_alive():
+            conn.close()
+            del _connections[ident]
+
+
+def get_db_connection():
+    """获取当前线程的数据库长连接，首次调用或连接已被 close_all_connections 关闭时创建"""
+    conn = getattr(_local, "conn", None)
+    # 关闭时会从 _connections 中移除，不在登记表里的连接已关闭，需要重新创建
+    # (只读取字典，不加锁；当前线程的登记只会被当前线程或 close_all_connections 修改)
+    if conn is not None and _connections.get(threading.get_ident(), (None, None))[1] is not conn:
+        conn = None
+    if conn is None:
+        conn = _create_connection()
+        _local.conn = conn
+        _local.depth = 0
+        thread = threading.current_thread()
+        with _connections_lock:
+            _prune_dead_connections()
+            _connections[thread.ident] = (thread, conn)
+    return conn
+
+
 def close_db_connection(conn):
-    """关闭数据库连接"""
-    if conn:
-        conn.close()
+    """
+    归还数据库连接
+    连接由连接池长期持有，这里只回滚未提交的事务，不会真正关闭连接
+    """
+    if conn and conn.in_transaction:
+        conn.rollback()
+
+
+@contextmanager
+def db_session():
+    """
+    数据库会话上下文管理器，models 和 services 共用
+    正常退出时提交事务，发生异常时回滚；嵌套使用时只由最外层提交
+
+    用法:
+        with db_session() as conn:
+            conn.execute("UPDATE Users SET score = ? WHERE id = ?", (score, user_id))
+    """
+    conn = get_db_connection()
+    _local.depth += 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth -= 1
+        if _local.depth == 0:
+            if conn.in_transaction:
+                conn.rollback()
+            _run_after_transaction()
+        raise
+    else:
+        _local.depth -= 1
+        if _local.depth == 0:
+            if conn.in_transaction:
+                conn.commit()
+            _run_after_transaction()
+
+
+def after_transaction(func):
+    """
+    注册在当前线程最外层会话结束 (提交或回滚) 后执行的回调，例如让缓存失效；
+    不在会话中时立即执行
+    """
+    if getattr(_local, "depth", 0) == 0:
+        func()
+        return
+    if not hasattr(_local, "after_transaction"):
+        _local.after_transaction = []
+    _local.after_transaction.append(func)
+
+
+def _run_after_transaction():
+    """执行并清空当前线程注册的事务后回调"""
+    callbacks = getattr(_local, "after_transaction", None)
+    if not callbacks:
+        return
+    _local.after_transaction = []
+    for func in callbacks:
+        try:
+            func()
+        except Exception as e:
+            logger.error("事务后回调执行失败: {}", e)
+
+
+@contextmanager
+def db_transaction():
+    """
+    显式写事务上下文管理器 (BEGIN IMMEDIATE)
+    事务开始时即获取数据库写锁，适用于多条语句需要原子执行的场景；
+    如果当前线程已处于事务中，则直接加入外层事务
+    """
+    with db_session() as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
+
+
+@contextmanager
+def write_lock(*keys):
+    """
+    按逻辑键串行化写操作，例如 write_lock(("user", user_id))
+    同一个键的读-改-写会排队执行，不同键只有在落到同一分段时才会互相等待。
+    需要同时锁多个键时一次性传入，按分段序号顺序加锁以避免死锁；
+    不要在持有写锁时再去获取其他键的写锁。
+    加锁等待时间记录在 db.write_lock_wait 指标中
+    """
+    stripes = sorted({hash(key) % len(_write_locks) for key in keys})
+    start = time.perf_counter()
+    acquired = []
+    try:
+        for stripe in stripes:
+            _write_locks[stripe].acquire()
+            acquired.append(stripe)
+        get_metrics().observe("db.write_lock_wait", time.perf_counter() - start)
+        yield
+    finally:
+        for stripe in reversed(acquired):
+            _write_locks[stripe].release()
+
+
+def _get_db_executor():
+    """获取数据库专用线程池 (协程处理函数使用，每个线程持有自己的连接)"""
+    global _db_executor
+    with _connections_lock:
+        if _db_executor is None:
+            _db_executor = ThreadPoolExecutor(max_workers=max(1, settings.DB_ASYNC_WORKERS),
+                                              thread_name_prefix="db")
+    return _db_executor
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    在数据库线程池中执行同步的数据库操作，供协程调用，避免阻塞事件循环
+
+    Examples:
+        user = await run_db(UserService.get_user_by_telegram_id, telegram_id)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), functools.partial(func, *args, **kwargs))
+
+
+def close_all_connections():
+    """
+    关闭所有线程的数据库连接 (程序退出时调用)
+    连接同时从 _connections 中移除，仍在运行的线程下次调用 get_db_connection 时会重新连接
+    """
+    with _connections_lock:
+        for thread, conn in _connections.values():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+    _local.__dict__.clear()
+
+
+atexit.register(close_all_connections)
+
 
 def create_tables():
     """创建数据库表"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # 创建 Users 表
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS Users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            telegram_id INTEGER UNIQUE NOT NULL,
-            service_type TEXT NOT NULL,
-            username TEXT,
-            service_user_id TEXT,
-            score INTEGER DEFAULT 0,
-            invite_code TEXT,
-            service_name TEXT,
-            status TEXT DEFAULT 'active',
-            expiration_date DATETIME, 
-            last_sign_in_date DATETIME,
-            create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(telegram_id, service_type) 
-        )
-    """)
-
-    # 创建 InviteCodes 表
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS InviteCodes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            code TEXT UNIQUE NOT NULL,
-            is_used BOOLEAN DEFAULT FALSE,
-            user_id INTEGER,
-            type TEXT NOT NULL CHECK(type IN ('invite', 'renew')),
-            create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-            expire_days INTEGER NOT NULL,
-            expire_time DATETIME,
-            create_user_id INTEGER NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES Users(id)
-        )
-    """)
+    with db_session() as conn:
+        cursor = conn.cursor()
+
+        # 创建 Users 表
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                telegram_id INTEGER UNIQUE NOT NULL,
+                service_type TEXT NOT NULL,
+                username TEXT,
+                service_user_id TEXT,
+                score INTEGER DEFAULT 0,
+                invite_code TEXT,
+                service_name TEXT,
+                status TEXT DEFAULT 'active',
+                expiration_date DATETIME, 
+                last_sign_in_date DATETIME,
+                create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(telegram_id, service_type) 
+            )
+        """)
+
+        # 创建 InviteCodes 表
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS InviteCodes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                code TEXT UNIQUE NOT NULL,
+                is_used BOOLEAN DEFAULT FALSE,
+                user_id INTEGER,
+                type TEXT NOT NULL CHECK(type IN ('invite', 'renew')),
+                create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+                expire_days INTEGER NOT NULL,
+                expire_time DATETIME,
+                create_user_id INTEGER NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES Users(id)
+            )
+        """)
     
-    # 创建 RandomScoreEvents 表
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS RandomScoreEvents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            create_user_id INTEGER NOT NULL,
-            telegram_chat_id INTEGER NOT NULL,
-            total_score INTEGER NOT NULL,
-            participants_count INTEGER NOT NULL,
-            score_list TEXT NOT NULL,
-            score_result TEXT,
-            create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-            end_time DATETIME,
-            is_finished BOOLEAN DEFAULT FALSE
-        )
-    """)
-
-    conn.commit()
-    close_db_connection(conn)
+        # 创建 RandomScoreEvents 表
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS RandomScoreEvents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                create_user_id INTEGER NOT NULL,
+                telegram_chat_id INTEGER NOT NULL,
+                total_score INTEGER NOT NULL,
+                participants_count INTEGER NOT NULL,
+                score_list TEXT NOT NULL,
+                score_result TEXT,
+                create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+                end_time DATETIME,
+                is_finished BOOLEAN DEFAULT FALSE
+            )
+        """)
+
 
 def insert_data(table_name, data):
     """插入数据"""
-    with db_lock:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        columns = ', '.join(data.keys())
-        placeholders = ', '.join(['?'] * len(data))
-        values = tuple(data.values())
+    columns = ', '.join(data.keys())
+    placeholders = ', '.join(['?'] * len(data))
+    values = tuple(data.values())
 
-        try:
-            cursor.execute(f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})", values)
-            conn.commit()
-            return cursor.lastrowid  # 返回插入的行ID
-        except sqlite3.Error as e:
-            print(f"Error inserting data into {table_name}: {e}")
-            return None
-        finally:
-            close_db_connection(conn)
+    try:
+        with db_session() as conn:
+            cursor = conn.execute(f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})", values)
+        return cursor.lastrowid  # 返回插入的行ID
+    except sqlite3.Error as e:
+        print(f"Error inserting data into {table_name}: {e}")
+        return None
 
 def select_data(table_name, where_clause=None, order_by=None, where_values = None):
     """查询数据"""
-    with db_lock:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+    query = f"SELECT * FROM {table_name}"
+    if where_clause:
+        query += f" WHERE {where_clause}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
 
-        query = f"SELECT * FROM {table_name}"
-        if where_clause:
-            query += f" WHERE {where_clause}"
-        if order_by:
-            query += f" ORDER BY {order_by}"
-
-        try:
+    try:
+        with db_session() as conn:
             if where_values:
-                cursor.execute(query, tuple(where_values))
+                cursor = conn.execute(query, tuple(where_values))
             else:
-              cursor.execute(query)
+                cursor = conn.execute(query)
             rows = cursor.fetchall()
-            return [dict(row) for row in rows]
-        except sqlite3.Error as e:
-            print(f"Error selecting data from {table_name}: {e}")
-            return None
-        finally:
-            close_db_connection(conn)
+        return [dict(row) for row in rows]
+    except sqlite3.Error as e:
+        print(f"Error selecting data from {table_name}: {e}")
+        return None
 
 def update_data(table_name, data, where_clause, where_values = None):
     """更新数据"""
-    with db_lock:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        set_clause = ', '.join([f"{key} = ?" for key in data.keys()])
-        values = tuple(data.values())
+    set_clause = ', '.join([f"{key} = ?" for key in data.keys()])
+    values = tuple(data.values())
 
-        try:
+    try:
+        with db_session() as conn:
             if where_values:
-              cursor.execute(f"UPDATE {table_name} SET {set_clause} WHERE {where_clause}", values + tuple(where_values))
+                cursor = conn.execute(f"UPDATE {table_name} SET {set_clause} WHERE {where_clause}", values + tuple(where_values))
             else:
-              cursor.execute(f"UPDATE {table_name} SET {set_clause} WHERE {where_clause}", values )
-            conn.commit()
-            return cursor.rowcount  # 返回更新的行数
-        except sqlite3.Error as e:
-            print(f"Error updating data in {table_name}: {e}")
-            return None
-        finally:
-            close_db_connection(conn)
+                cursor = conn.execute(f"UPDATE {table_name} SET {set_clause} WHERE {where_clause}", values)
+        return cursor.rowcount  # 返回更新的行数
+    except sqlite3.Error as e:
+        print(f"Error updating data in {table_name}: {e}")
+        return None
 
 def delete_data(table_name, where_clause, where_values = None):
     """删除数据"""
-    with db_lock:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        try:
+    try:
+        with db_session() as conn:
             if where_values:
-                cursor.execute(f"DELETE FROM {table_name} WHERE {where_clause}", tuple(where_values))
+                cursor = conn.execute(f"DELETE FROM {table_name} WHERE {where_clause}", tuple(where_values))
             else:
-                cursor.execute(f"DELETE FROM {table_name} WHERE {where_clause}")
-            conn.commit()
-            return cursor.rowcount  # 返回删除的行数
-        except sqlite3.Error as e:
-            print(f"Error deleting data from {table_name}: {e}")
-            return None
-        finally:
-            close_db_connection(conn)
-        
+                cursor = conn.execute(f"DELETE FROM {table_name} WHERE {where_clause}")
+        return cursor.rowcount  # 返回删除的行数
+    except sqlite3.Error as e:
+        print(f"Error deleting data from {table_name}: {e}")
+        return None
+    
 # 示例用法 (可选)
 if __name__ == "__main__":
     create_tables()
\ No newline at end of file
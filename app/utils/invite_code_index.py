@@ -0,0 +1,95 @@
+import threading
+from datetime import datetime
+from app.utils.logger import logger
+from app.utils.metrics import get_metrics
+
+# 需要安装的模块：无
+
+_invite_code_index = None
+
+
+class InviteCodeIndex:
+    """
+    未使用邀请码的内存索引
+    精确字典 {code: (type, expire_time)}，不存在、已使用、已过期或类型不符的邀请码不查数据库直接拒绝。
+    生成、使用、删除邀请码时同步更新，启动时从数据库重建；数据库仍是最终依据，索引只用于快速拒绝无效邀请码
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.loaded = False  # 未从数据库加载前不做拒绝判断
+        self._lock = threading.Lock()
+
+    def rebuild(self, rows):
+        """
+        用数据库中所有未使用的邀请码重建索引
+
+        Args:
+            rows: [(code, type, expire_time), ...]，expire_time 为 None 表示不过期
+        """
+        codes = {code: (code_type, self._parse_time(expire_time)) for code, code_type, expire_time in rows}
+        with self._lock:
+            self.codes = codes
+            self.loaded = True
+        get_metrics().set_gauge("invite_code_index.size", len(codes))
+        logger.info("邀请码索引已重建: count={}", len(codes))
+
+    def add(self, code, code_type, expire_time=None):
+        """添加一个未使用的邀请码"""
+        with self._lock:
+            self.codes[code] = (code_type, self._parse_time(expire_time))
+            size = len(self.codes)
+        get_metrics().set_gauge("invite_code_index.size", size)
+
+    def discard(self, code):
+        """移除已使用或已删除的邀请码"""
+        with self._lock:
+            self.codes.pop(code, None)
+            size = len(self.codes)
+        get_metrics().set_gauge("invite_code_index.size", size)
+
+    def might_be_valid(self, code, code_type=None):
+        """
+        判断邀请码是否可能有效
+
+        Returns:
+            False 表示邀请码一定不存在、已使用、已过期或类型不符；True 表示需要查询数据库确认
+        """
+        if not self.loaded:
+            return True
+        metrics = get_metrics()
+        entry = self.codes.get(code)
+        if entry is None:
+            metrics.incr("invite_code_index.miss")
+            return False
+        entry_type, expire_time = entry
+        if code_type and entry_type != code_type:
+            metrics.incr("invite_code_index.miss")
+            return False
+        if expire_time and expire_time < datetime.now():
+            metrics.incr("invite_code_index.expired")
+            return False
+        metrics.incr("invite_code_index.hit")
+        return True
+
+    @staticmethod
+    def _parse_time(value):
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+        return value
+
+
+def create_invite_code_index():
+    """创建邀请码索引实例，并赋值给全局变量_invite_code_index"""
+    global _invite_code_index
+    if not _invite_code_index:
+        _invite_code_index = InviteCodeIndex()
+    return _invite_code_index
+
+
+def get_invite_code_index():
+    """获取邀请码索引实例"""
+    global _invite_code_index
+    if not _invite_code_index:
+        _invite_code_index = create_invite_code_index()
+    return _invite_code_index
@@ -1,28 +1,139 @@
 from loguru import logger
+import atexit
 import os
+import random
 import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from config import settings
 
 # 需要安装的模块：loguru
 # pip install loguru
 
-# 确保日志目录存在
-log_dir = "logs"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
 
-# 确保日志目录存在
-log_dir = "logs"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+def _parse_module_levels(value):
+    """解析 "app.services=DEBUG,app.utils.db_utils=WARNING" 格式的模块日志级别配置"""
+    levels = {}
+    for item in value.split(","):
+        if "=" in item:
+            module, level = item.split("=", 1)
+            levels[module.strip()] = logger.level(level.strip().upper()).no
+    return levels
 
-# 配置 logger
-logger.add(os.path.join(log_dir, "error.log"), rotation="10 MB", level="ERROR", format="{time} {level} {message}", backtrace=True, diagnose=True)  # 错误日志
-logger.add(os.path.join(log_dir, "warning.log"), rotation="10 MB", level="WARNING", format="{time} {level} {message}")  # 警告日志
-logger.add(os.path.join(log_dir, "info.log"), rotation="1 week", level="INFO", format="{time} {level} {message}")  # 信息日志
-logger.add(os.path.join(log_dir, "debug.log"), rotation="1 week", level="DEBUG", format="{time} {level} {message}", backtrace=True, diagnose=True)  # 调试日志
 
-logger.remove() # 移除默认控制台输出
-logger.add(sys.stdout, level="INFO", format="<green>{time}</green> <level>{level: <8}</level> <level>{message}</level>") # 添加控制台输出，级别为 INFO
+_default_level_no = logger.level(settings.LOG_LEVEL.upper()).no
+_module_levels = _parse_module_levels(settings.LOG_MODULE_LEVELS)
+# 模块名按长度倒序，优先匹配最具体的配置
+_module_prefixes = sorted(_module_levels, key=len, reverse=True)
+
+
+def module_level_filter(record):
+    """按模块配置的日志级别过滤，未配置的模块使用 LOG_LEVEL"""
+    name = record["name"] or ""
+    for prefix in _module_prefixes:
+        if name == prefix or name.startswith(prefix + "."):
+            return record["level"].no >= _module_levels[prefix]
+    return record["level"].no >= _default_level_no
+
+
+# sink 的级别取所有配置中最低的级别，具体过滤交给 module_level_filter，低于该级别的日志不会格式化消息
+min_level_no = min([_default_level_no, *_module_levels.values()])
+
+
+class _NullLogger:
+    """丢弃所有日志的占位 logger"""
+
+    def __getattr__(self, name):
+        return self._discard
+
+    def _discard(self, *args, **kwargs):
+        return None
+
+
+_null_logger = _NullLogger()
+_throttle_last = {}
+_throttle_lock = threading.Lock()
+
+
+def throttled(key, interval=None):
+    """
+    限流日志：同一个 key 在 interval 秒内只输出一次，其余直接丢弃
+    用法: throttled(("user_blocked", telegram_id)).warning("用户已被封禁: {}", telegram_id)
+    """
+    interval = settings.LOG_THROTTLE_INTERVAL if interval is None else interval
+    now = time.monotonic()
+    with _throttle_lock:
+        last = _throttle_last.get(key)
+        if last is not None and now - last < interval:
+            return _null_logger
+        _throttle_last[key] = now
+        # 防止 key 无限增长，过期的记录定期清理
+        if len(_throttle_last) > 10000:
+            for stale in [k for k, t in _throttle_last.items() if now - t >= interval]:
+                del _throttle_last[stale]
+    return logger
+
+
+def sampled(rate=None):
+    """采样日志：按 rate 的概率输出，用于每个请求都会触发的日志"""
+    rate = settings.LOG_SAMPLE_RATE if rate is None else rate
+    return logger if random.random() < rate else _null_logger
+
+
+@contextmanager
+def log_context(handler, request_id=None, **fields):
+    """
+    为当前线程中的日志附加请求上下文 (request_id、handler 等)，JSON 日志中以 extra 字段输出
+    用法:
+        with log_context("checkin_command", telegram_id=telegram_id):
+            ...
+    """
+    with logger.contextualize(request_id=request_id or uuid.uuid4().hex[:12], handler=handler, **fields):
+        yield
+
+
+CONSOLE_FORMAT = ("<green>{time}</green> <level>{level: <8}</level> "
+                  "<cyan>{extra[request_id]}</cyan> <level>{message}</level>")
+FILE_FORMAT = "{time} {level} {extra[request_id]} {extra[handler]} {name}:{function}:{line} {message}"
+
+_configured = False
+
+
+def setup_logging():
+    """
+    配置日志输出，只在第一次调用时生效
+    所有 sink 都使用 enqueue=True，由后台线程写入，日志 I/O 不阻塞处理消息的线程；
+    只有 ERROR 日志开启 backtrace/diagnose，避免在普通日志中输出变量值
+    """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    os.makedirs(settings.LOG_DIR, exist_ok=True)
+    logger.remove()  # 移除默认控制台输出
+    logger.configure(extra={"request_id": "-", "handler": "-"})
+
+    # 控制台和普通日志文件，级别由 LOG_LEVEL 和 LOG_MODULE_LEVELS 决定
+    logger.add(sys.stdout, level=min_level_no, filter=module_level_filter, format=CONSOLE_FORMAT, enqueue=True)
+    logger.add(os.path.join(settings.LOG_DIR, "info.log"), rotation="1 week", level=min_level_no,
+               filter=module_level_filter, format=FILE_FORMAT, enqueue=True)
+    # 错误日志
+    logger.add(os.path.join(settings.LOG_DIR, "error.log"), rotation="10 MB", level="ERROR", format=FILE_FORMAT,
+               enqueue=True, backtrace=True, diagnose=True)
+    # JSON Lines 结构化日志，每行一条记录，request_id、handler 等上下文在 record.extra 中
+    if settings.LOG_JSON_FILE:
+        logger.add(settings.LOG_JSON_FILE, rotation="1 week", level=min_level_no, filter=module_level_filter,
+                   serialize=True, enqueue=True)
+
+    # 退出前等待后台线程写完队列中的日志
+    atexit.register(logger.remove)
+
+
+setup_logging()
+
 # 使用示例
 if __name__ == "__main__":
     logger.debug("这是一条调试日志")
@@ -22,16 +22,16 @@ class MailuClient:
         
         try:
             response = self.session.request(method, url, params=params, json=data, headers=headers)
-            # logger.debug(f"code: {response.status_code}, data: {response.json()}")
+            # logger.debug("code: {}, data: {}", response.status_code, response.json())
             if response.status_code == 200:
                 return {"status": "success", "data": response.json()}
             else:
                 raise requests.exceptions.RequestException
         except requests.exceptions.RequestException as e:
             if response.status_code == 409:
-                logger.warning(f"user is duplicate.")
+                logger.warning("user is duplicate.")
                 return {"status": "duplicate", "message": response.json()['message']}
-            logger.error(f"Mailu API 请求失败: {e}")
+            logger.error("Mailu API 请求失败: {}", e)
             return {"status": "error", "message": str(e)}
     
     def get_users(self):
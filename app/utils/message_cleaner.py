@@ -4,8 +4,12 @@ from app.utils.message_queue import get_message_queue
 import telebot
 from app.bot.core.bot_instance import bot
 from config import settings
+from app.utils.metrics import get_metrics
 # 需要安装的模块：无
 
+# delete_messages 一次最多删除 100 条消息
+DELETE_BATCH_SIZE = 100
+
 class MessageCleaner:
     """
     消息清理器
@@ -17,25 +21,52 @@ class MessageCleaner:
         self.message_queue = get_message_queue()
     
     def _clean_messages(self):
-      """清理消息"""
+      """清理消息：按聊天每 100 条调用一次 delete_messages，失败的按指数退避重试"""
+
+      messages_to_delete = self.message_queue.pop_expired()
+      for (chat_id, attempts), message_ids in messages_to_delete.items():
+          for i in range(0, len(message_ids), DELETE_BATCH_SIZE):
+            batch = message_ids[i:i + DELETE_BATCH_SIZE]
+            try:
+              self.bot.delete_messages(chat_id=chat_id, message_ids=batch)
+              self.message_queue.done(chat_id, batch)
+              get_metrics().incr("message_cleaner.deleted", len(batch))
+              logger.debug("定时清理消息成功, chat_id={}, count={}", chat_id, len(batch))
+            except Exception as e:
+              self._retry_later(chat_id, batch, attempts, e)
+      self.message_queue.flush()
 
-      messages_to_delete = self.message_queue.get_messages_to_delete()
-      for chat_id, message_ids in messages_to_delete.items():
-          try:
-            self.bot.delete_messages(chat_id=chat_id, message_ids=message_ids)
-            logger.debug(f"定时清理消息成功, chat_id={chat_id}, message_id={message_ids}")
-          except telebot.apihelper.ApiTelegramException as e:
-            logger.warning(f"定时清理消息失败: chat_id={chat_id}, message_id={message_ids}, error={e}")
+    def _retry_later(self, chat_id, message_ids, attempts, error):
+      """删除失败时重试；400/403 (消息或聊天不存在、没有权限) 重试也不会成功，直接放弃"""
+      metrics = get_metrics()
+      retryable = True
+      delay = settings.MESSAGE_DELETE_RETRY_DELAY * (2 ** attempts)
+      if isinstance(error, telebot.apihelper.ApiTelegramException):
+        if error.error_code == 429:
+          delay = max(delay, (error.result_json or {}).get("parameters", {}).get("retry_after", delay))
+        elif error.error_code in (400, 403):
+          retryable = False
+      if retryable and attempts < settings.MESSAGE_DELETE_MAX_RETRIES:
+        metrics.incr("message_cleaner.retry", len(message_ids))
+        self.message_queue.retry_messages(chat_id, message_ids, delay, attempts + 1)
+        logger.warning("定时清理消息失败，{}秒后重试: chat_id={}, count={}, error={}", delay, chat_id, len(message_ids), error)
+      else:
+        self.message_queue.done(chat_id, message_ids)
+        metrics.incr("message_cleaner.failed", len(message_ids))
+        logger.warning("定时清理消息失败: chat_id={}, message_id={}, error={}", chat_id, message_ids, error)
             
     
     def start(self):
       """启动定时清理任务"""
+      # 先删除停机期间已经到期的消息，再定时清理
+      self._clean_messages()
       self.scheduler.add_job(job_name="clean_message", interval=settings.DELAY_INTERVAL, job_func=self._clean_messages)
       logger.info("启动消息清理器")
     
     def stop(self):
       """停止定时清理任务"""
       self.scheduler.remove_job("clean_message")
+      self.message_queue.flush()
       # self.message_queue.close()
       logger.info("停止消息清理器")
       
@@ -1,6 +1,12 @@
+import heapq
+import itertools
+import threading
+import time
 from app.utils.logger import logger
-from datetime import datetime, timedelta
+from datetime import datetime
 from config import settings
+from app.utils.metrics import get_metrics
+from app.models.pending_delete import PendingDelete
 # 需要安装的模块：无
 
 
@@ -18,10 +24,18 @@ _message_queue = None
 class MessageQueue:
     """
     消息队列
+    按删除时间排序的小顶堆，添加和取出都是 O(log n)，每次清理只处理已到期的消息。
+    同一条消息重复添加时以最后一次为准，旧的堆条目在取出时跳过。
+    队列同时持久化到 PendingDeletes 表：添加消息只在内存中记录一次待写入，由 flush 批量写入数据库，
+    重启后用 load 恢复，已经到期的消息在第一次清理时批量删除
     """
 
     def __init__(self):
-        self.messages = {}
+        self.heap = []  # [(删除时间, 序号, chat_id, message_id, 重试次数)]，删除时间为 Unix 时间戳
+        self.deadlines = {}  # {(chat_id, message_id): 删除时间}
+        self.pending_writes = {}  # {(chat_id, message_id): (删除时间, 重试次数)，None 表示删除记录}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
 
     def add_message(self, message, delay=settings.DELAY_INTERVAL):
         """添加待删除的消息"""
@@ -31,30 +45,106 @@ class MessageQueue:
         
         chat_id = message.chat.id
         message_id = message.message_id 
-        if chat_id not in self.messages:
-            self.messages[chat_id] = {}
-        self.messages[chat_id][message_id] =  Message(chat_id=chat_id, message_id=message_id, delay=delay)
-        logger.debug(f"添加待删除的消息, chat_id={chat_id}, message_id={message_id}, delay={delay}")
-    
+        self._push(chat_id, message_id, time.time() + delay, 0)
+        logger.debug("添加待删除的消息, chat_id={}, message_id={}, delay={}", chat_id, message_id, delay)
+
+    def retry_messages(self, chat_id, message_ids, delay, attempts):
+        """删除失败的消息在 delay 秒后重试"""
+        deadline = time.time() + delay
+        for message_id in message_ids:
+            self._push(chat_id, message_id, deadline, attempts)
+
+    def _push(self, chat_id, message_id, deadline, attempts):
+        with self._lock:
+            self.deadlines[(chat_id, message_id)] = deadline
+            self.pending_writes[(chat_id, message_id)] = (deadline, attempts)
+            heapq.heappush(self.heap, (deadline, next(self._seq), chat_id, message_id, attempts))
+            size = len(self.deadlines)
+        get_metrics().set_gauge("message_queue.size", size)
+
+    def pop_expired(self, now=None):
+        """
+        取出所有已到期的消息
+
+        Returns:
+            {(chat_id, 重试次数): [message_id, ...]}
+        """
+        now = time.time() if now is None else now
+        expired = {}
+        with self._lock:
+            while self.heap and self.heap[0][0] <= now:
+                deadline, _, chat_id, message_id, attempts = heapq.heappop(self.heap)
+                key = (chat_id, message_id)
+                # 被重新添加过的消息，以最新的删除时间为准
+                if self.deadlines.get(key) != deadline:
+                    continue
+                del self.deadlines[key]
+                expired.setdefault((chat_id, attempts), []).append(message_id)
+            size = len(self.deadlines)
+        get_metrics().set_gauge("message_queue.size", size)
+        return expired
+
+    def done(self, chat_id, message_ids):
+        """删除成功或放弃重试的消息，从数据库中移除记录 (期间被重新添加的消息除外)"""
+        with self._lock:
+            for message_id in message_ids:
+                key = (chat_id, message_id)
+                if key not in self.deadlines:
+                    self.pending_writes[key] = None
+
+    def flush(self):
+        """把内存中积累的变更批量写入数据库"""
+        with self._lock:
+            if not self.pending_writes:
+                return
+            pending_writes, self.pending_writes = self.pending_writes, {}
+        saves = [(chat_id, message_id, entry[0], entry[1])
+                 for (chat_id, message_id), entry in pending_writes.items() if entry is not None]
+        deletes = [key for key, entry in pending_writes.items() if entry is None]
+        try:
+            if saves:
+                PendingDelete.save_many(saves)
+            if deletes:
+                PendingDelete.delete_many(deletes)
+        except Exception as e:
+            # 写入失败时放回，下次再写；期间产生的新变更优先
+            with self._lock:
+                for key, entry in pending_writes.items():
+                    self.pending_writes.setdefault(key, entry)
+            logger.error("待删除消息写入数据库失败: {}", e)
+
+    def load(self):
+        """启动时从数据库恢复待删除消息"""
+        entries = PendingDelete.get_all()
+        with self._lock:
+            for entry in entries:
+                key = (entry.chat_id, entry.message_id)
+                if key in self.deadlines:
+                    continue
+                self.deadlines[key] = entry.deadline
+                heapq.heappush(self.heap, (entry.deadline, next(self._seq), entry.chat_id, entry.message_id,
+                                           entry.attempts))
+            size = len(self.deadlines)
+        get_metrics().set_gauge("message_queue.size", size)
+        logger.info("已恢复待删除消息: count={}", len(entries))
+
     def get_messages_to_delete(self):
         """获取需要删除的消息"""
         messages_to_delete = {}
-        for chat_id, msgs in list(self.messages.items()):
-          for message_id, message in list(msgs.items()):
-            if (datetime.now() - message.create_time) > timedelta(seconds = message.delay):
-               if chat_id not in messages_to_delete:
-                 messages_to_delete[chat_id] = []
-               messages_to_delete[chat_id].append(message_id)
-               del self.messages[chat_id][message_id]
-
-          if not msgs:
-            del self.messages[chat_id]
+        for (chat_id, _), message_ids in self.pop_expired().items():
+            messages_to_delete.setdefault(chat_id, []).extend(message_ids)
         return messages_to_delete
+
+    def __len__(self):
+        return len(self.deadlines)
     
     def close(self):
         """清空消息列表"""
         global _message_queue
-        self.messages = None
+        with self._lock:
+            self.heap = []
+            self.deadlines = {}
+            self.pending_writes = {}
         _message_queue = None
         logger.info("消息队列已关闭")
      
@@ -70,4 +160,4 @@ def get_message_queue():
     global _message_queue
     if not _message_queue:
       _message_queue = create_message_queue()
-    return _message_queue
\ No newline at end of file
+    return _message_queue
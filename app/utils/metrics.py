@@ -0,0 +1,103 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# 需要安装的模块：无
+
+_metrics = None
+
+# 耗时分布的桶上界，单位为秒
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+
+class Metrics:
+    """
+    运行指标
+    提供计数器、仪表值和耗时分布三类指标，所有方法都是线程安全的
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {}
+        self.gauges = {}
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1):
+        """计数器累加"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """设置仪表值 (例如队列长度)"""
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        """记录一次耗时"""
+        with self._lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = {"count": 0, "total": 0.0, "max": 0.0, "buckets": [0] * (len(self.buckets) + 1)}
+                self.timings[name] = timing
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    timing["buckets"][i] += 1
+                    break
+            else:
+                timing["buckets"][-1] += 1
+
+    @contextmanager
+    def timer(self, name):
+        """统计代码块耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """获取当前所有指标的副本"""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "timings": {name: dict(timing, buckets=list(timing["buckets"]))
+                            for name, timing in self.timings.items()},
+            }
+
+    def render_text(self):
+        """将指标渲染为便于在 Telegram 中阅读的文本"""
+        snapshot = self.snapshot()
+        lines = []
+        if snapshot["counters"]:
+            lines.append("计数器:")
+            lines.extend(f"  {name}: {value}" for name, value in sorted(snapshot["counters"].items()))
+        if snapshot["gauges"]:
+            lines.append("仪表值:")
+            lines.extend(f"  {name}: {value}" for name, value in sorted(snapshot["gauges"].items()))
+        if snapshot["timings"]:
+            lines.append("耗时 (次数 / 平均 / 最大, 毫秒):")
+            for name, timing in sorted(snapshot["timings"].items()):
+                avg = timing["total"] / timing["count"] * 1000
+                lines.append(f"  {name}: {timing['count']} / {avg:.2f} / {timing['max'] * 1000:.2f}")
+        return "\n".join(lines) if lines else "暂无指标数据"
+
+
+def create_metrics():
+    """创建运行指标实例，并赋值给全局变量_metrics"""
+    global _metrics
+    if not _metrics:
+        _metrics = Metrics()
+    return _metrics
+
+
+def get_metrics():
+    """获取运行指标实例"""
+    global _metrics
+    if not _metrics:
+        _metrics = create_metrics()
+    return _metrics
@@ -1,11 +1,20 @@
-import sqlite3
-import os
+from app.utils.db_utils import db_session, db_transaction
+from app.utils.logger import logger
 
+# 需要安装的模块：无
 
-def migrate_database(db_path):
-    # 连接到现有数据库
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
+
+def _column_names(cursor, table_name):
+    """获取表的所有字段名"""
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _upgrade_legacy_schema(cursor):
+    """升级旧版本数据库结构 (Users 表仍使用 navidrome_user_id 字段)"""
+    if "navidrome_user_id" not in _column_names(cursor, "Users"):
+        logger.debug("数据库结构已是新版本，无需升级")
+        return
 
     # 第一步：重命名旧的 Users 表
     cursor.execute("ALTER TABLE Users RENAME TO Users_old")
@@ -80,20 +89,136 @@ def migrate_database(db_path):
 
     # 删除旧的 InviteCodes 表
     cursor.execute("DROP TABLE InviteCodes_old")
+    logger.info("旧版本数据库结构升级完成")
+
+
+def _add_users_indexes(cursor):
+    """为 Users 表的常用查询条件添加索引"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_service_user_id ON Users(service_user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON Users(username COLLATE NOCASE)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_score ON Users(score DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_last_sign_in_date ON Users(last_sign_in_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_create_time ON Users(create_time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_status ON Users(status)")
+
+
+def _add_invite_codes_indexes(cursor):
+    """为 InviteCodes 表的使用状态和类型筛选添加索引"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invite_codes_is_used_type ON InviteCodes(is_used, type)")
+
+
+def _create_score_ledger(cursor):
+    """创建积分流水表，并把现有积分记为期初余额"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ScoreLedger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            ref TEXT,
+            ts DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_score_ledger_user_id_ts ON ScoreLedger(user_id, ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_score_ledger_ts ON ScoreLedger(ts)")
+    cursor.execute("""
+        INSERT INTO ScoreLedger (user_id, delta, reason)
+        SELECT id, score, 'opening' FROM Users
+        WHERE score != 0 AND id NOT IN (SELECT user_id FROM ScoreLedger)
+    """)
+
+
+def _backfill_invite_code_expire_time(cursor):
+    """回填邀请码的过期时间，并为过期筛选和过期清理添加索引 (续期码的 expire_days 是续期天数，续期码不过期)"""
+    cursor.execute("""
+        UPDATE InviteCodes SET expire_time = datetime(create_time, '+' || expire_days || ' days')
+        WHERE type = 'invite' AND expire_time IS NULL
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_invite_codes_is_used_type")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invite_codes_is_used_type_expire ON InviteCodes(is_used, type, expire_time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invite_codes_is_used_expire ON InviteCodes(is_used, expire_time)")
+
+
+def _create_pending_deletes(cursor):
+    """创建待删除消息表，重启后恢复消息清理队列"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS PendingDeletes (
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            deadline REAL NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (chat_id, message_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pending_deletes_deadline ON PendingDeletes(deadline)")
+
+
+def _create_scheduled_jobs(cursor):
+    """创建定时任务状态表，重启后恢复定时任务的执行时间"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ScheduledJobs (
+            name TEXT PRIMARY KEY,
+            trigger TEXT NOT NULL,
+            next_run_at REAL NOT NULL,
+            last_run_at REAL,
+            last_status TEXT,
+            last_error TEXT
+        )
+    """)
+
+
+# 迁移列表：(版本号, 描述, 迁移函数)，版本号必须递增，迁移函数必须可以重复执行
+MIGRATIONS = [
+    (1, "升级旧版本数据库结构", _upgrade_legacy_schema),
+    (2, "添加 Users 常用查询索引", _add_users_indexes),
+    (3, "添加 InviteCodes 使用状态和类型索引", _add_invite_codes_indexes),
+    (4, "创建积分流水表", _create_score_ledger),
+    (5, "回填邀请码过期时间并添加过期索引", _backfill_invite_code_expire_time),
+    (6, "创建待删除消息表", _create_pending_deletes),
+    (7, "创建定时任务状态表", _create_scheduled_jobs),
+]
+
+
+def get_schema_version():
+    """获取当前数据库结构版本，未执行过迁移时返回 0"""
+    with db_session() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
 
-    # 提交更改并关闭连接
-    connection.commit()
-    connection.close()
+def run_migrations():
+    """
+    按版本顺序执行尚未执行的迁移
+    每个迁移在独立的事务中执行，成功后写入 schema_version，失败则回滚并停止后续迁移
 
+    Returns:
+        迁移完成后的数据库结构版本
+    """
+    current_version = get_schema_version()
+    logger.info("当前数据库结构版本: {}", current_version)
+    for version, description, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+        logger.info("执行数据库迁移: version={}, {}", version, description)
+        try:
+            with db_transaction() as conn:
+                migration(conn.cursor())
+                conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                             (version, description))
+        except Exception as e:
+            logger.error("数据库迁移失败: version={}, error={}", version, e)
+            raise
+        current_version = version
+    logger.info("数据库结构已是最新版本: {}", current_version)
+    return current_version
 
-# 调用迁移函数
-current_dir = os.path.dirname(__file__)
-db_path = os.path.join(current_dir, '../../data/data.db')
-db_path = os.path.abspath(db_path)
-migrate_database(db_path)
 
-if __name__ == 'main':
-    current_dir = os.path.dirname(__file__)
-    db_path = os.path.join(current_dir, '../../data/data.db')
-    db_path = os.path.abspath(db_path)
-    migrate_database(db_path)
+if __name__ == "__main__":
+    run_migrations()
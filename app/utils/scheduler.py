@@ -1,22 +1,105 @@
-import schedule
+import heapq
+import itertools
+import math
+import random
 import time
-import uuid
 import threading
-from app.utils.logger import logger
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+from app.utils.logger import logger, throttled
+from app.utils.metrics import get_metrics
+from app.utils.cron import CronExpression
+from app.models.scheduled_job import ScheduledJob
 
-# 需要安装的模块：schedule
-# pip install schedule
+# 需要安装的模块：无
 
 _scheduler = None
+
+# 一次性延迟任务没有名称，统计时归为一类
+DELAYED_JOB_NAME = "delayed"
+
+
+class Job:
+    """
+    定时任务
+    按 interval 周期执行，或按 cron 表达式执行；两者都为 None 的是只执行一次的延迟任务。
+    cancel() 只做标记，调度线程取到已取消的任务时直接丢弃
+    """
+
+    __slots__ = ("name", "func", "args", "interval", "next_run", "cancelled", "max_instances", "coalesce",
+                 "jitter", "misfire_grace_time", "running", "cron", "persistent")
+
+    def __init__(self, name, func, args, interval, next_run, max_instances=1, coalesce=True, jitter=0,
+                 misfire_grace_time=None, cron=None, persistent=False):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.interval = interval
+        self.cron = cron  # CronExpression
+        self.persistent = persistent  # 是否把执行时间保存到数据库，重启后继续计时
+        self.next_run = next_run  # 计划执行时间 (Unix 时间戳，不含随机延迟)
+        self.cancelled = False
+        self.max_instances = max_instances  # 同时执行的最大实例数，上一次还没执行完时跳过本次
+        self.coalesce = coalesce  # 错过多次执行时只补执行一次
+        self.jitter = jitter  # 每次执行随机推迟 0~jitter 秒，避免多个任务同时执行
+        self.misfire_grace_time = misfire_grace_time  # 超过计划时间多少秒后放弃本次执行，None 表示总是执行
+        self.running = 0
+
+    def cancel(self):
+        """取消任务，O(1)"""
+        self.cancelled = True
+
+    @property
+    def trigger(self):
+        """触发方式的文本表示，用于判断数据库中保存的执行时间是否还适用"""
+        if self.cron is not None:
+            return f"cron:{self.cron.expression}@{self.cron.timezone.zone}"
+        return f"interval:{self.interval}"
+
+    def is_periodic(self):
+        return self.interval is not None or self.cron is not None
+
+    def compute_next_run(self, now):
+        """计算下次计划执行时间"""
+        if self.cron is not None:
+            # 合并错过的执行时从当前时间算起，否则从上次计划时间算起逐个补执行
+            return self.cron.next_after(max(now, self.next_run) if self.coalesce else self.next_run).timestamp()
+        # 固定频率：按计划时间推算，而不是按执行结束时间
+        next_run = self.next_run + self.interval
+        if next_run <= now and self.coalesce:
+            # 跳过已经错过的执行，直接排到下一个未来的时间点
+            next_run += (math.floor((now - next_run) / self.interval) + 1) * self.interval
+        return next_run
+
+
 class Scheduler:
     """
     定时任务管理
+    所有任务 (周期任务和一次性延迟任务) 按下次执行时间放在一个小顶堆中，添加 O(log n)，取消 O(1)；
+    调度线程只在最早的任务到期或有新任务加入时醒来，把到期的任务交给线程池执行，自身不执行任务代码。
+    周期任务按固定频率计算下次执行时间，不受执行耗时影响。
+    persistent=True 的任务把执行时间和结果保存到 ScheduledJobs 表，重启后继续计时；停机期间错过的执行在启动时补执行一次
     """
-    def __init__(self):
-        self.jobs = {}
+    def __init__(self, workers=settings.SCHEDULER_WORKERS):
+        self.jobs = {}  # 有名称的周期任务 {job_name: Job}
         self.scheduler_thread = None
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scheduler-job")
+        self._heap = []  # [(执行时间, 序号, Job)]
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {}  # 每个任务的执行统计 {job_name: {...}}
+        self.history = deque(maxlen=settings.SCHEDULER_HISTORY_SIZE)  # 最近的执行记录
+
+    def _schedule(self, job):
+        """把任务放入堆中 (调用方需持有 _cond)，比堆顶更早时唤醒调度线程"""
+        run_at = job.next_run + (random.uniform(0, job.jitter) if job.jitter else 0)
+        heapq.heappush(self._heap, (run_at, next(self._seq), job))
+        if self._heap[0][2] is job:
+            self._cond.notify()
     
-    def add_job(self, job_name, interval, job_func, args=None):
+    def add_job(self, job_name, interval, job_func, args=None, max_instances=1, coalesce=True, jitter=0,
+                misfire_grace_time=None, persistent=False):
         """
         添加一个定时任务
         Args:
@@ -24,36 +107,240 @@ class Scheduler:
           interval: 时间间隔，单位为秒
           job_func: 需要执行的函数
           args: 函数需要的参数
+          max_instances: 同时执行的最大实例数
+          coalesce: 错过多次执行时是否只补执行一次
+          jitter: 每次执行随机推迟的最大秒数
+          misfire_grace_time: 超过计划时间多少秒后放弃本次执行，None 表示总是执行
+          persistent: 是否保存到数据库，重启后继续计时 (需要在数据库迁移完成后添加)
+        Returns:
+          Job，可以调用 cancel() 取消
         """
-        if job_name in self.jobs:
-          logger.warning(f"定时任务已存在，不能重复添加: job_name={job_name}")
-          return
-        schedule_job = schedule.every(interval).seconds
-        
-        schedule_job.do(self._safe_run, job_func, args)
-        self.jobs[job_name] = schedule_job
-        logger.info(f"添加定时任务成功: job_name={job_name}, interval={interval}")
+        job = Job(job_name, job_func, args, interval, time.time() + interval, max_instances, coalesce,
+                  jitter, misfire_grace_time, persistent=persistent)
+        return self._add(job)
+
+    def add_cron_job(self, job_name, cron, job_func, args=None, timezone=settings.SCHEDULER_TIMEZONE,
+                     max_instances=1, coalesce=True, jitter=0, misfire_grace_time=None, persistent=False):
+        """
+        添加一个按 cron 表达式执行的定时任务
+        Args:
+          job_name: 定时任务名称，必须唯一
+          cron: cron 表达式 (分 时 日 月 周)，例如 "0 4 * * *" 表示每天 04:00
+          timezone: cron 表达式使用的时区
+          其余参数同 add_job
+        Returns:
+          Job，可以调用 cancel() 取消
+        """
+        expression = CronExpression(cron, timezone)
+        job = Job(job_name, job_func, args, None, expression.next_after().timestamp(), max_instances, coalesce,
+                  jitter, misfire_grace_time, cron=expression, persistent=persistent)
+        return self._add(job)
+
+    def _add(self, job):
+        with self._cond:
+            exists = job.name in self.jobs
+        if job.persistent and not exists:
+            # 任务加入堆之前只有当前线程能看到它，读写数据库时不持有 _cond，避免调度线程等待磁盘 I/O
+            self._restore(job)
+        with self._cond:
+            if job.name in self.jobs:
+              logger.warning("定时任务已存在，不能重复添加: job_name={}", job.name)
+              return self.jobs[job.name]
+            self.jobs[job.name] = job
+            self._schedule(job)
+        logger.info("添加定时任务成功: job_name={}, trigger={}, next_run={}", job.name, job.trigger,
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job.next_run)))
+        return job
+
+    def _restore(self, job):
+        """从数据库恢复任务的下次执行时间；触发方式变了则按新的方式重新计时"""
+        try:
+            stored = ScheduledJob.get(job.name)
+            if stored is not None and stored.trigger == job.trigger:
+                job.next_run = stored.next_run_at
+                if job.next_run < time.time():
+                    # 停机期间错过的执行，启动后补执行一次
+                    logger.info("定时任务在停机期间错过执行，立即补执行: job_name={}", job.name)
+                    job.next_run = time.time()
+            ScheduledJob.save_schedule(job.name, job.trigger, job.next_run)
+        except Exception as e:
+            logger.error("恢复定时任务状态失败: job_name={}, error={}", job.name, e)
+
+    def _save_state(self, job, started_at=None, error=None):
+        """保存持久化任务的下次执行时间和本次执行结果"""
+        try:
+            ScheduledJob.save_schedule(job.name, job.trigger, job.next_run)
+            if started_at is not None:
+                ScheduledJob.save_result(job.name, started_at, "error" if error else "success",
+                                         None if error is None else repr(error))
+        except Exception as e:
+            logger.error("保存定时任务状态失败: job_name={}, error={}", job.name, e)
     
-    def _safe_run(self, func, args):
-        """安全地执行定时任务"""
+    def _safe_run(self, job):
+        """安全地执行定时任务，返回执行时抛出的异常"""
         try:
-           if args:
-             func(*args)
+           if job.args:
+             job.func(*job.args)
            else:
-             func()
+             job.func()
         except Exception as e:
-          logger.error(f"定时任务执行失败, error={e}")
+          logger.exception("定时任务执行失败: job_name={}, trigger={}, error={}", job.name, job.trigger, e)
+          return e
+        return None
+
+    def _pop_due(self):
+        """等待并取出下一个到期的任务"""
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                wait = self._heap[0][0] - time.time()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                return heapq.heappop(self._heap)[2]
         
+    def _dispatch(self, job):
+        """把到期的任务交给线程池执行，并计算周期任务的下次执行时间"""
+        metrics = get_metrics()
+        now = time.time()
+        late = now - job.next_run
+        with self._cond:
+            if job.misfire_grace_time is not None and late > job.misfire_grace_time:
+                metrics.incr("scheduler.misfire")
+                self._job_stats(job)["misfires"] += 1
+                throttled(("scheduler.misfire", job.name)).warning("定时任务错过执行时间，跳过本次: job_name={}, late={:.1f}s", job.name, late)
+                run = False
+            elif job.running >= job.max_instances:
+                metrics.incr("scheduler.skipped_overlap")
+                self._job_stats(job)["skipped"] += 1
+                throttled(("scheduler.overlap", job.name)).warning("定时任务上一次还没执行完，跳过本次: job_name={}", job.name)
+                run = False
+            else:
+                job.running += 1
+                run = True
+            scheduled_at = job.next_run
+            if job.is_periodic() and not job.cancelled:
+                job.next_run = job.compute_next_run(now)
+                self._schedule(job)
+        if run:
+            self.executor.submit(self._execute, job, scheduled_at)
+        elif job.persistent:
+            self._save_state(job)
+
+    def _execute(self, job, scheduled_at):
+        """在线程池中执行任务"""
+        started_at = time.time()
+        error = None
+        try:
+            error = self._safe_run(job)
+        finally:
+            duration = time.time() - started_at
+            with self._cond:
+                job.running -= 1
+            self._record_run(job, scheduled_at, started_at, duration, error)
+            # 执行完才保存下次执行时间：执行中途停机的任务，重启后会补执行
+            if job.persistent and not job.cancelled:
+                self._save_state(job, started_at, error)
+
+    def _job_stats(self, job):
+        """获取任务的统计记录 (调用方需持有 _cond)"""
+        name = job.name or DELAYED_JOB_NAME
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = {"runs": 0, "errors": 0, "skipped": 0, "misfires": 0, "last_run_at": None,
+                                        "last_duration": None, "max_duration": 0.0, "last_lag": None,
+                                        "last_error": None}
+        return stats
+
+    def _record_run(self, job, scheduled_at, started_at, duration, error):
+        """记录一次执行：次数、耗时、相对计划时间的延迟和最近的错误"""
+        name = job.name or DELAYED_JOB_NAME
+        lag = max(0.0, started_at - scheduled_at)
+        metrics = get_metrics()
+        metrics.incr(f"scheduler.run.{name}")
+        metrics.observe(f"scheduler.duration.{name}", duration)
+        metrics.observe(f"scheduler.lag.{name}", lag)
+        if error is not None:
+            metrics.incr(f"scheduler.error.{name}")
+        with self._cond:
+            stats = self._job_stats(job)
+            stats["runs"] += 1
+            stats["last_run_at"] = started_at
+            stats["last_duration"] = duration
+            stats["max_duration"] = max(stats["max_duration"], duration)
+            stats["last_lag"] = lag
+            if error is not None:
+                stats["errors"] += 1
+                stats["last_error"] = repr(error)
+            # 一次性延迟任务数量很多，不写入执行记录
+            if job.name is not None:
+                self.history.append({"name": name, "scheduled_at": scheduled_at, "started_at": started_at,
+                                     "duration": duration, "lag": lag,
+                                     "status": "error" if error is not None else "success",
+                                     "error": None if error is None else repr(error)})
+
+    def job_stats(self):
+        """
+        所有任务的执行统计
+
+        Returns:
+            {job_name: {"runs", "errors", "skipped", "misfires", "last_run_at", "last_duration", "max_duration",
+                        "last_lag", "last_error", "next_run_at", "trigger"}}
+        """
+        with self._cond:
+            result = {name: dict(stats) for name, stats in self.stats.items()}
+            for name, job in self.jobs.items():
+                entry = result.setdefault(name, {"runs": 0, "errors": 0, "skipped": 0, "misfires": 0})
+                entry["next_run_at"] = job.next_run
+                entry["trigger"] = job.trigger
+        return result
+
+    def recent_runs(self, limit=None):
+        """最近的执行记录，按时间倒序"""
+        with self._cond:
+            runs = list(self.history)
+        runs.reverse()
+        return runs[:limit] if limit else runs
+
+    def render_text(self, limit=10):
+        """将任务统计渲染为便于在 Telegram 中阅读的文本"""
+        def format_time(value):
+            return time.strftime("%m-%d %H:%M:%S", time.localtime(value)) if value else "-"
+
+        lines = ["定时任务 (执行 / 失败 / 跳过, 上次耗时 / 最大耗时 / 上次延迟, 秒):"]
+        for name, stats in sorted(self.job_stats().items()):
+            lines.append(
+                f"  {name}: {stats['runs']} / {stats['errors']} / {stats['skipped'] + stats['misfires']}, "
+                f"{stats.get('last_duration') or 0:.2f} / {stats.get('max_duration') or 0:.2f} / "
+                f"{stats.get('last_lag') or 0:.2f}, 下次 {format_time(stats.get('next_run_at'))}"
+            )
+            if stats.get("last_error"):
+                lines.append(f"    最近错误: {stats['last_error']}")
+        runs = self.recent_runs(limit)
+        if runs:
+            lines.append("最近执行:")
+            lines.extend(f"  {format_time(run['started_at'])} {run['name']} {run['status']} {run['duration']:.2f}s"
+                         for run in runs)
+        return "\n".join(lines)
+
     def run_all(self):
         """启动所有任务，并且保持运行，使用while True 循环"""
         while True:
-            schedule.run_pending()
-            time.sleep(1)
+            try:
+                self._dispatch(self._pop_due())
+            except RuntimeError:
+                # 程序退出时线程池已经关闭，调度线程随之结束
+                logger.debug("定时任务线程池已关闭，调度线程退出")
+                return
     
     def start_scheduler(self):
         """启动定时任务"""
         if not self.scheduler_thread or not self.scheduler_thread.is_alive():
-          self.scheduler_thread = threading.Thread(target=self.run_all)
+          self.scheduler_thread = threading.Thread(target=self.run_all, name="scheduler")
           self.scheduler_thread.daemon = True
           self.scheduler_thread.start()
           logger.info("定时任务启动！")
@@ -62,29 +349,35 @@ class Scheduler:
 
     def remove_job(self, job_name):
       """移除定时任务"""
-      if job_name in self.jobs:
-          schedule.cancel_job(self.jobs[job_name])
-          del self.jobs[job_name]
-          logger.info(f"删除定时任务成功， job_name = {job_name}")
+      with self._cond:
+          job = self.jobs.pop(job_name, None)
+          if job is not None:
+              job.cancel()
+      if job is not None:
+          if job.persistent:
+              try:
+                  ScheduledJob.delete(job_name)
+              except Exception as e:
+                  logger.error("删除定时任务状态失败: job_name={}, error={}", job_name, e)
+          logger.info("删除定时任务成功， job_name = {}", job_name)
       else:
-          logger.warning(f"未找到要删除的任务, job_name={job_name}")
+          logger.warning("未找到要删除的任务, job_name={}", job_name)
 
     def add_delayed_job(self, delay, job_func, args=None):
         """
-        添加一个延迟执行的任务
+        添加一个延迟执行的任务，只执行一次
         Args:
           delay:  延迟的时间(s)
           job_func: 需要执行的函数
           args: 函数的参数
+        Returns:
+          Job，可以调用 cancel() 取消
         """
-        def run_job():
-            self._safe_run(job_func, args)
-            self.remove_job(job_name)  # 执行完删除任务
-            
-        job_name = str(uuid.uuid4())
-        schedule_job = schedule.every(delay).seconds.do(run_job)
-        self.jobs[job_name] = schedule_job
-        logger.info(f"添加延迟执行任务成功， job_name= {job_name}")
+        job = Job(None, job_func, args, None, time.time() + delay)
+        with self._cond:
+            self._schedule(job)
+        logger.debug("添加延迟执行任务成功, delay={}", delay)
+        return job
 
 
 def create_scheduler():
@@ -99,4 +392,4 @@ def get_scheduler():
     global _scheduler
     if not _scheduler:
       _scheduler = create_scheduler()
-    return _scheduler
\ No newline at end of file
+    return _scheduler
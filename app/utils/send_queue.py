@@ -0,0 +1,265 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from telebot.apihelper import ApiTelegramException
+from config import settings
+from app.utils.logger import logger
+from app.utils.metrics import get_metrics
+
+# 需要安装的模块：无
+
+# 优先级：数字越小越先发送。交互回复优先于列表、通知等批量消息
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+# 请求类型：发送新消息、编辑已有消息、应答回调查询，按聊天限速时分别计算
+KIND_SEND = "send"
+KIND_EDIT = "edit"
+KIND_ANSWER = "answer"
+
+_send_queue = None
+
+
+class TokenBucket:
+    """
+    令牌桶限速 (调用方负责加锁)
+    每秒补充 rate 个令牌，最多积攒 capacity 个
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def ready_at(self, now):
+        """下一个令牌可用的时间"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return now
+        return now + (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class _ChatLane:
+    """单个聊天的待发送请求，按提交顺序发送"""
+
+    __slots__ = ("bucket", "edit_bucket", "jobs", "blocked_until", "busy")
+
+    def __init__(self, bucket, edit_bucket):
+        self.bucket = bucket
+        self.edit_bucket = edit_bucket
+        self.jobs = []  # 小顶堆 [(优先级, 序号, 请求)]
+        self.blocked_until = 0.0
+        self.busy = False  # 该聊天有请求正在发送，发送完成前不取下一条，保证同一聊天按顺序发送
+
+    def bucket_for(self, kind):
+        """请求类型对应的令牌桶，应答回调查询不按聊天限速"""
+        if kind == KIND_SEND:
+            return self.bucket
+        if kind == KIND_EDIT:
+            return self.edit_bucket
+        return None
+
+    def idle(self, now):
+        """没有待发送的请求，且令牌已补满"""
+        return not self.jobs and not self.busy and now >= self.blocked_until and all(
+            bucket.ready_at(now) <= now and bucket.tokens >= bucket.capacity
+            for bucket in (self.bucket, self.edit_bucket))
+
+
+class SendQueue:
+    """
+    Telegram 发送队列
+    所有发送、回复、编辑请求都由若干发送线程执行，同时受全局令牌桶 (约 30 条/秒) 和每个聊天的令牌桶
+    (私聊约 1 条/秒并允许少量突发，群组约 20 条/分钟) 限制；编辑消息使用单独的、更宽松的令牌桶，
+    应答回调查询只受全局限速。收到 429 时按 retry_after 暂停该聊天后重试。
+    同一聊天同一时间只有一个请求在发送，消息按提交顺序到达；不同聊天在多个发送线程中并行发送。
+    交互回复优先于批量消息。submit 返回 Future，可以等待结果也可以不等待
+    """
+
+    def __init__(self, global_rate=settings.SEND_GLOBAL_RATE, chat_rate=settings.SEND_CHAT_RATE,
+                 chat_burst=settings.SEND_CHAT_BURST, group_rate=settings.SEND_GROUP_RATE,
+                 edit_rate=settings.SEND_EDIT_RATE, max_retries=settings.SEND_MAX_RETRIES,
+                 workers=settings.SEND_WORKERS):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.edit_rate = edit_rate
+        self.max_retries = max_retries
+        self.lanes = {}  # {chat_id: _ChatLane}
+        self.pending = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._threads = [threading.Thread(target=self._run, name=f"send-queue-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def _new_lane(self, chat_id):
+        # 群组和频道的 chat_id 为负数
+        if isinstance(chat_id, int) and chat_id < 0:
+            bucket = TokenBucket(self.group_rate / 60, max(1, self.group_rate // 4))
+        else:
+            bucket = TokenBucket(self.chat_rate, max(1, self.chat_burst))
+        return _ChatLane(bucket, TokenBucket(self.edit_rate, max(1, self.edit_rate)))
+
+    def submit(self, chat_id, func, args=(), kwargs=None, priority=PRIORITY_INTERACTIVE, kind=KIND_SEND):
+        """
+        提交一个发送请求
+
+        Args:
+            chat_id: 目标聊天，用于按聊天限速
+            func: 实际调用的 Telegram API 方法
+            priority: PRIORITY_INTERACTIVE 或 PRIORITY_BULK
+            kind: KIND_SEND、KIND_EDIT 或 KIND_ANSWER，决定使用哪个聊天令牌桶
+
+        Returns:
+            concurrent.futures.Future，结果为 func 的返回值
+        """
+        future = Future()
+        job = [func, args, kwargs or {}, future, 0, kind]
+        with self._cond:
+            lane = self.lanes.get(chat_id)
+            if lane is None:
+                lane = self.lanes[chat_id] = self._new_lane(chat_id)
+            heapq.heappush(lane.jobs, (priority, next(self._seq), job))
+            self.pending += 1
+            get_metrics().set_gauge("send_queue.depth", self.pending)
+            self._cond.notify()
+        return future
+
+    def call(self, chat_id, func, args=(), kwargs=None, priority=PRIORITY_INTERACTIVE, kind=KIND_SEND, timeout=None):
+        """提交发送请求并等待结果"""
+        return self.submit(chat_id, func, args, kwargs, priority, kind).result(timeout)
+
+    def _next_job(self):
+        """
+        选出下一个可以发送的请求 (调用方需持有 _cond)
+
+        Returns:
+            (chat_id, 请求, 0) 或 (None, None, 需要等待的秒数)
+        """
+        now = time.monotonic()
+        best = None
+        wait = None
+        for chat_id, lane in list(self.lanes.items()):
+            if lane.busy:
+                continue
+            if not lane.jobs:
+                # 令牌补满之后才移除空闲的聊天，避免删掉后重新创建的令牌桶绕过限速
+                if lane.idle(now):
+                    del self.lanes[chat_id]
+                continue
+            bucket = lane.bucket_for(lane.jobs[0][2][5])
+            ready_at = max(bucket.ready_at(now) if bucket else now, lane.blocked_until)
+            if ready_at > now:
+                wait = ready_at - now if wait is None else min(wait, ready_at - now)
+                continue
+            head = lane.jobs[0]
+            if best is None or head[:2] < best[1][:2]:
+                best = (chat_id, head)
+        if best is None:
+            return None, None, wait
+        global_ready_at = self.global_bucket.ready_at(now)
+        if global_ready_at > now:
+            return None, None, global_ready_at - now
+        chat_id, _ = best
+        lane = self.lanes[chat_id]
+        job = heapq.heappop(lane.jobs)[2]
+        bucket = lane.bucket_for(job[5])
+        if bucket is not None:
+            bucket.take(now)
+        self.global_bucket.take(now)
+        lane.busy = True
+        return chat_id, job, 0
+
+    def _run(self):
+        """发送线程，多个线程共用同一个队列"""
+        metrics = get_metrics()
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped and not self.pending:
+                        return
+                    chat_id, job, wait = self._next_job() if self.pending else (None, None, None)
+                    if job is not None:
+                        break
+                    self._cond.wait(wait)
+            func, args, kwargs, future, attempts, _ = job
+            try:
+                with metrics.timer("send_queue.send"):
+                    result = func(*args, **kwargs)
+            except ApiTelegramException as e:
+                if e.error_code == 429 and attempts < self.max_retries:
+                    retry_after = (e.result_json or {}).get("parameters", {}).get("retry_after", 1)
+                    metrics.incr("send_queue.retry_after")
+                    logger.warning("发送消息触发限流: chat_id={}, retry_after={}", chat_id, retry_after)
+                    job[4] += 1
+                    self._requeue(chat_id, job, retry_after)
+                    continue
+                self._finish(chat_id)
+                metrics.incr("send_queue.error")
+                future.set_exception(e)
+            except Exception as e:
+                self._finish(chat_id)
+                metrics.incr("send_queue.error")
+                future.set_exception(e)
+            else:
+                self._finish(chat_id)
+                metrics.incr("send_queue.sent")
+                future.set_result(result)
+
+    def _requeue(self, chat_id, job, retry_after):
+        """429 后把请求放回该聊天队首，暂停该聊天 retry_after 秒"""
+        with self._cond:
+            lane = self.lanes[chat_id]
+            lane.blocked_until = time.monotonic() + retry_after
+            lane.busy = False
+            heapq.heappush(lane.jobs, (-1, next(self._seq), job))
+            self._cond.notify()
+
+    def _finish(self, chat_id):
+        """请求发送完成，释放该聊天，让下一条请求可以发送"""
+        with self._cond:
+            self.lanes[chat_id].busy = False
+            self.pending -= 1
+            get_metrics().set_gauge("send_queue.depth", self.pending)
+            # 可能有其他发送线程在等待这个聊天，或者在等待停止
+            self._cond.notify_all()
+
+    def close(self, timeout=None):
+        """发送完队列中剩余的消息后停止发送线程"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+
+
+def create_send_queue():
+    """创建发送队列实例，并赋值给全局变量_send_queue"""
+    global _send_queue
+    if not _send_queue:
+        _send_queue = SendQueue()
+    return _send_queue
+
+
+def get_send_queue():
+    """获取发送队列实例"""
+    global _send_queue
+    if not _send_queue:
+        _send_queue = create_send_queue()
+    return _send_queue
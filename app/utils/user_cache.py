@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from config import settings
+from app.utils.metrics import get_metrics
+
+# 需要安装的模块：无
+
+_user_cache = None
+
+
+class UserCache:
+    """
+    用户记录缓存 (LRU + TTL)
+    以用户 ID 为主键缓存 Users 表的行数据，telegram_id 和 service_user_id 作为别名指向主键；
+    未注册用户的查询结果也会缓存 (负缓存)，避免群组中未注册成员反复查询数据库。
+    缓存的是行数据的副本，每次命中都构造新的模型对象，调用方修改对象不会影响缓存
+    """
+
+    def __init__(self, max_size=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.rows = OrderedDict()  # {user_id: (row, 别名列表, 过期时间)}
+        self.aliases = {}  # {别名键: user_id}
+        self.missing = OrderedDict()  # {查询键: 过期时间}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def id_key(user_id):
+        return ("id", user_id)
+
+    @staticmethod
+    def telegram_id_key(telegram_id, service_type):
+        return ("telegram_id", telegram_id, service_type)
+
+    @staticmethod
+    def service_user_id_key(service_user_id):
+        return ("service_user_id", service_user_id)
+
+    def get(self, key):
+        """
+        查询缓存
+
+        Returns:
+            (是否命中, 行数据)，命中负缓存时返回 (True, None)
+        """
+        metrics = get_metrics()
+        now = time.monotonic()
+        with self._lock:
+            user_id = key[1] if key[0] == "id" else self.aliases.get(key)
+            entry = self.rows.get(user_id) if user_id is not None else None
+            if entry is not None:
+                row, aliases, expires_at = entry
+                if expires_at > now:
+                    self.rows.move_to_end(user_id)
+                    metrics.incr("user_cache.hit")
+                    return True, row
+                self._remove(user_id)
+            expires_at = self.missing.get(key)
+            if expires_at is not None:
+                if expires_at > now:
+                    metrics.incr("user_cache.negative_hit")
+                    return True, None
+                del self.missing[key]
+        metrics.incr("user_cache.miss")
+        return False, None
+
+    def put(self, row):
+        """缓存一行用户数据"""
+        row = dict(row)
+        aliases = [self.telegram_id_key(row["telegram_id"], row["service_type"])]
+        if row.get("service_user_id") is not None:
+            aliases.append(self.service_user_id_key(row["service_user_id"]))
+        with self._lock:
+            self._remove(row["id"])
+            self.rows[row["id"]] = (row, aliases, time.monotonic() + self.ttl)
+            for alias in aliases:
+                self.aliases[alias] = row["id"]
+                self.missing.pop(alias, None)
+            self.missing.pop(self.id_key(row["id"]), None)
+            while len(self.rows) > self.max_size:
+                self._remove(next(iter(self.rows)))
+            size = len(self.rows)
+        get_metrics().set_gauge("user_cache.size", size)
+
+    def put_missing(self, key):
+        """缓存"用户不存在"的查询结果"""
+        with self._lock:
+            self.missing[key] = time.monotonic() + self.ttl
+            self.missing.move_to_end(key)
+            while len(self.missing) > self.max_size:
+                self.missing.popitem(last=False)
+
+    def invalidate(self, user_id=None, keys=()):
+        """使指定用户和查询键的缓存失效 (包括负缓存)"""
+        with self._lock:
+            if user_id is not None:
+                self._remove(user_id)
+                self.missing.pop(self.id_key(user_id), None)
+            for key in keys:
+                aliased_id = self.aliases.get(key)
+                if aliased_id is not None:
+                    self._remove(aliased_id)
+                self.missing.pop(key, None)
+            size = len(self.rows)
+        get_metrics().set_gauge("user_cache.size", size)
+
+    def clear(self):
+        """清空缓存 (批量修改用户数据后调用)"""
+        with self._lock:
+            self.rows.clear()
+            self.aliases.clear()
+            self.missing.clear()
+        get_metrics().set_gauge("user_cache.size", 0)
+
+    def _remove(self, user_id):
+        """移除一个用户及其别名 (调用方需持有 _lock)"""
+        entry = self.rows.pop(user_id, None)
+        if entry is None:
+            return
+        for alias in entry[1]:
+            if self.aliases.get(alias) == user_id:
+                del self.aliases[alias]
+
+
+def create_user_cache():
+    """创建用户缓存实例，并赋值给全局变量_user_cache"""
+    global _user_cache
+    if not _user_cache:
+        _user_cache = UserCache()
+    return _user_cache
+
+
+def get_user_cache():
+    """获取用户缓存实例"""
+    global _user_cache
+    if not _user_cache:
+        _user_cache = create_user_cache()
+    return _user_cache
@@ -20,7 +20,7 @@ def paginate_list(data_list, page_size):
     Returns:
          一个列表的列表，其中每个内部列表代表一页数据
     """
-    logger.debug(f"开始分页列表, pageSize={page_size}, listSize={len(data_list)}")
+    logger.debug("开始分页列表, pageSize={}, listSize={}", page_size, len(data_list))
     if not data_list or page_size <= 0:
         logger.warning("列表为空或者分页大小不合法")
         return []
@@ -28,11 +28,11 @@ def paginate_list(data_list, page_size):
     paginated_list = []
     # if len(data_list) <= page_size:
     #     paginated_list.append(data_list)
-    #     logger.debug(f"无需分页")
+    #     logger.debug("无需分页")
     # else:
     for i in range(0, len(data_list), page_size):
         paginated_list.append(data_list[i:i + page_size])
-    logger.debug(f"分页列表成功, 总页数={len(paginated_list)}, pageSize={page_size}, listSize={len(data_list)}")
+    logger.debug("分页列表成功, 总页数={}, pageSize={}, listSize={}", len(paginated_list), page_size, len(data_list))
     return paginated_list
 
 
@@ -63,7 +63,7 @@ def paginate_list_text(data_list, page_size=None):
     # Don't forget to add the last chunk if it's not empty
     if current_chunk:
         result.append(current_chunk)
-    logger.debug(f"分页列表成功, 总页数={len(result)}, pageSize={page_size}, listSize={len(data_list)}")
+    logger.debug("分页列表成功, 总页数={}, pageSize={}, listSize={}", len(result), page_size, len(data_list))
     return result
 
 
@@ -110,10 +110,9 @@ def create_pagination(chat_id, message_id, user_list, items_per_page):
 
 @bot.callback_query_handler(func=lambda call: call.data in ['prev', 'next'])
 def callback_inline(call):
-    logger.info(f"call.message: {call.message}")
     chat_id = call.message.chat.id
     message_id = call.message.id
-    logger.info(f"status: {user_states}")
+    logger.debug("翻页: chat_id={}, message_id={}, data={}", chat_id, message_id, call.data)
     # 确保用户状态存在
     if chat_id in user_states and message_id == user_states[chat_id]['message_id']:
         if call.data == 'next':
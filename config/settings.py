@@ -7,13 +7,41 @@ load_dotenv()
 
 # --- 数据库配置 ---
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/db.sqlite3")  # 数据库连接 URL，默认为 SQLite
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 256))  # 每个连接缓存的预编译语句数量
+# SQLite 调优参数，每个连接创建时都会应用
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")  # 日志模式，WAL 模式下读写互不阻塞
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # 同步级别，WAL 下 NORMAL 已足够安全
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))  # 数据库锁等待时间（毫秒）
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -16000))  # 页缓存大小，负数表示 KiB，默认约 16MB
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 134217728))  # 内存映射大小（字节），默认 128MB，0 表示关闭
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")  # 临时表存储位置：DEFAULT|FILE|MEMORY
+DB_WRITE_LOCK_STRIPES = int(os.getenv("DB_WRITE_LOCK_STRIPES", 64))  # 写锁分段数量，按用户/活动/邀请码等逻辑键分段加锁
 
 # --- 服务类型配置 ---
 SERVICE_TYPE = os.getenv("SERVICE_TYPE")  # 支持的服务类型列表
 # --- Telegram Bot 配置 ---
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")  # Telegram Bot Token
 ADMIN_TELEGRAM_IDS = [int(id) for id in os.getenv("ADMIN_TELEGRAM_IDS", "").split(",") if id]  # 管理员 Telegram ID 列表，用逗号分隔
-WEBHOOK_URL = os.getenv("WEBHOOK_URL", None)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", None)  # 设置后以 Webhook 模式运行，Telegram 推送更新到此地址
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")  # 内置 Webhook 服务监听地址
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 7000))  # 内置 Webhook 服务监听端口
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")  # Webhook 密钥，校验 X-Telegram-Bot-Api-Secret-Token 请求头，留空时每次启动随机生成
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40))  # Telegram 同时推送的最大连接数
+WEBHOOK_MAX_BODY_SIZE = int(os.getenv("WEBHOOK_MAX_BODY_SIZE", 1048576))  # Webhook 请求体最大字节数
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # /metrics 访问密钥（Authorization: Bearer），留空时使用 WEBHOOK_SECRET_TOKEN，都未设置时拒绝访问
+BOT_RUNTIME = os.getenv("BOT_RUNTIME", "threaded")  # Bot 轮询模式：threaded（TeleBot 轮询）或 asyncio（AsyncTeleBot 事件循环，需要安装 aiohttp）
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", 8))  # 处理更新的线程数量
+BOT_MAX_INFLIGHT_UPDATES = int(os.getenv("BOT_MAX_INFLIGHT_UPDATES", 256))  # 排队和处理中的最大更新数量，达到后暂停拉取（Webhook 模式回复 503）
+BOT_POLL_TIMEOUT = int(os.getenv("BOT_POLL_TIMEOUT", 20))  # 长轮询超时时间（秒）
+DB_ASYNC_WORKERS = int(os.getenv("DB_ASYNC_WORKERS", 4))  # 协程处理函数执行数据库操作的线程数量
+SERVICE_ASYNC_WORKERS = int(os.getenv("SERVICE_ASYNC_WORKERS", 8))  # 协程处理函数调用后端服务 API 的线程数量
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", 30))  # 全局每秒最多发送的消息数量
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", 1))  # 每个私聊每秒最多发送的消息数量
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", 3))  # 每个私聊允许连续发送的消息数量（突发）
+SEND_GROUP_RATE = int(os.getenv("SEND_GROUP_RATE", 20))  # 每个群组每分钟最多发送的消息数量
+SEND_EDIT_RATE = float(os.getenv("SEND_EDIT_RATE", 3))  # 每个聊天每秒最多编辑的消息数量（翻页等操作）
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", 4))  # 发送线程数量，同一聊天的消息仍按顺序发送
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", 3))  # 触发限流 (429) 后最多重试次数
 # --- Navidrome 配置 ---
 NAVIDROME_API_URL = os.getenv("NAVIDROME_API_URL")  # Navidrome API 地址
 NAVIDROME_API_USERNAME = os.getenv("NAVIDROME_API_USERNAME")  # Navidrome API 用户名
@@ -38,17 +66,37 @@ INVITE_CODE_LENGTH = int(os.getenv("INVITE_CODE_LENGTH", 8))  # 邀请码长度
 INVITE_CODE_EXPIRATION_DAYS = int(os.getenv("INVITE_CODE_EXPIRATION_DAYS", 7))  # 邀请码过期时间（天），默认为 7
 INVITE_CODE_SYSTEM_ENABLED=bool(os.getenv("INVITE_CODE_SYSTEM_ENABLED", False) == 'True')
 INVITE_CODE_PRICE=int(os.getenv("INVITE_CODE_PRICE", 100))
+INVITE_CODE_BATCH_MAX = int(os.getenv("INVITE_CODE_BATCH_MAX", 10000))  # 单次最多生成的邀请码数量，默认为 10000
+INVITE_CODE_INLINE_LIMIT = int(os.getenv("INVITE_CODE_INLINE_LIMIT", 50))  # 生成数量超过该值时以文件形式发送，默认为 50
+INVITE_CODE_SWEEP_INTERVAL = int(os.getenv("INVITE_CODE_SWEEP_INTERVAL", 3600))  # 清理过期未使用邀请码的时间间隔（秒），默认为 1 小时
 CREATE_USER_EXPIRED_DAYS = int(os.getenv("CREATE_USER_EXPIRED_DAYS", 30))  # 用户过期时间（天），默认为 30
+SCORE_RECONCILE_INTERVAL = int(os.getenv("SCORE_RECONCILE_INTERVAL", 3600))  # 按积分流水校正用户积分余额的时间间隔（秒），默认为 1 小时
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))  # 用户缓存最多保存的用户数量，默认为 10000
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))  # 用户缓存的有效时间（秒），默认为 60
 # --- 清理不活跃用户 ---
 EXPIRED_DAYS = int(os.getenv("EXPIRED_DAYS", 30))  # 用户过期时间（天），默认为 30
 WARNING_DAYS = int(os.getenv("WARNING_DAYS", 27)) #  提前警告天数，默认为3
 CLEAN_INTERVAL = int(os.getenv("CLEAN_INTERVAL", 2592000))  # 清理过期用户的时间间隔（秒），默认为 30 天
+CLEAN_CRON = os.getenv("CLEAN_CRON", "")  # 清理过期用户的 cron 表达式，例如 "0 4 * * *" 表示每天 04:00，设置后代替 CLEAN_INTERVAL
 ENABLE_EXPIRED_USER_CLEAN = bool(os.getenv("ENABLE_EXPIRED_USER_CLEAN", 'False') == 'True') # 是否开启定时任务，默认关闭
 
 DELAY_INTERVAL = int(os.getenv("DELAY_INTERVAL", 5))
 ENABLE_MESSAGE_CLEANER = bool(os.getenv("ENABLE_MESSAGE_CLEANER", 'False') == 'True') # 是否开启消息清理系统，默认关闭
+MESSAGE_DELETE_MAX_RETRIES = int(os.getenv("MESSAGE_DELETE_MAX_RETRIES", 3))  # 定时清理消息失败后最多重试次数
+MESSAGE_DELETE_RETRY_DELAY = int(os.getenv("MESSAGE_DELETE_RETRY_DELAY", 5))  # 定时清理消息失败后首次重试的等待时间（秒），之后每次翻倍
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", 4))  # 执行定时任务的线程数量
+SCHEDULER_TIMEZONE = os.getenv("SCHEDULER_TIMEZONE", "Asia/Shanghai")  # cron 定时任务使用的时区
+SCHEDULER_HISTORY_SIZE = int(os.getenv("SCHEDULER_HISTORY_SIZE", 100))  # 保留的定时任务最近执行记录数量
 
 # --- Mailu 配置 ---
 MAILU_URL = os.getenv("MAILU_URL")
 MAILU_TOKEN = os.getenv("MAILU_TOKEN")
-MAILU_PRICE = int(os.getenv("MAILU_PRICE", 200))
\ No newline at end of file
+MAILU_PRICE = int(os.getenv("MAILU_PRICE", 200))
+
+# --- 日志配置 ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # 默认日志级别
+LOG_MODULE_LEVELS = os.getenv("LOG_MODULE_LEVELS", "")  # 按模块设置日志级别，例如 app.services=DEBUG,app.utils.db_utils=WARNING
+LOG_THROTTLE_INTERVAL = int(os.getenv("LOG_THROTTLE_INTERVAL", 60))  # 限流日志同一条消息的最短输出间隔（秒）
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.01))  # 采样日志的输出比例，默认为 1%
+LOG_DIR = os.getenv("LOG_DIR", "logs")  # 日志文件目录
+LOG_JSON_FILE = os.getenv("LOG_JSON_FILE", "")  # JSON Lines 结构化日志文件路径，例如 logs/app.jsonl，为空时不输出
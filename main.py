@@ -1,11 +1,16 @@
-from app.utils.db_utils import create_tables
+from app.utils.db_utils import create_tables, close_all_connections, check_db_settings
+from app.utils.migrate_db import run_migrations
 from app.bot.bot_manager import run_bot
+from app.services.score_service import ScoreService
+from app.services.invite_code_service import InviteCodeService
+from app.services.user_service import UserService
 from config import settings
 from app.utils.logger import logger
 from app.utils.scheduler import create_scheduler
-from app.utils.message_queue import create_message_queue
+from app.utils.message_queue import create_message_queue, get_message_queue
 from app.utils.message_cleaner import create_message_cleaner
 from app.utils.mailu import create_mailu
+from app.utils.send_queue import get_send_queue
 # 需要安装的模块：无
 
         
@@ -16,12 +21,27 @@ def init_app():
     # 创建数据库表
     create_tables()
     logger.info("数据库表创建完成")
+    check_db_settings()
+    run_migrations()
+    InviteCodeService.rebuild_index()
     
     scheduler = create_scheduler()
     scheduler.start_scheduler()
     logger.info(f"定时器已启动！")
+
+    # 定期按积分流水校正积分余额
+    scheduler.add_job(job_name="reconcile_score_balances", interval=settings.SCORE_RECONCILE_INTERVAL,
+                      job_func=ScoreService.reconcile_balances, persistent=True)
+    # 定期清理过期未使用的邀请码
+    scheduler.add_job(job_name="purge_expired_invite_codes", interval=settings.INVITE_CODE_SWEEP_INTERVAL,
+                      job_func=InviteCodeService.purge_expired_codes, persistent=True)
+    # 定时清理过期用户，停机期间错过的清理在启动时补执行
+    if settings.ENABLE_EXPIRED_USER_CLEAN:
+        UserService.start_clean_expired_users()
     
-    create_message_queue()
+    message_queue = create_message_queue()
+    if settings.ENABLE_MESSAGE_CLEANER:
+        message_queue.load()
     logger.info(f"消息管理队列已启动！")
     
     create_mailu()
@@ -37,5 +57,11 @@ def init_app():
     logger.info("初始化完成")
 
 if __name__ == "__main__":
-    init_app()   
-    run_bot()
\ No newline at end of file
+    init_app()
+    try:
+        run_bot()
+    finally:
+        # 退出前发送完队列中的消息，再关闭所有数据库长连接
+        get_send_queue().close(timeout=10)
+        get_message_queue().flush()
+        close_all_connections()
\ No newline at end of file
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+# 配置在导入时读取，必须在导入 app 之前设置
+os.environ.setdefault("SERVICE_TYPE", "navidrome")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "1:test")
+os.environ.setdefault("DATABASE_URL", os.path.join(tempfile.mkdtemp(), "db.sqlite3"))
+
+import pytest
+from config import settings
+from app.utils.db_utils import create_tables, close_all_connections
+from app.utils.migrate_db import run_migrations
+from app.utils.user_cache import get_user_cache
+from app.utils.invite_code_index import get_invite_code_index
+
+
+@pytest.fixture
+def empty_db(tmp_path, monkeypatch):
+    """每个测试使用独立的空数据库文件"""
+    close_all_connections()
+    monkeypatch.setattr(settings, "DATABASE_URL", str(tmp_path / "db.sqlite3"))
+    get_user_cache().clear()
+    get_invite_code_index().rebuild([])
+    yield
+    close_all_connections()
+
+
+@pytest.fixture
+def db(empty_db):
+    """建表并执行完所有迁移的数据库"""
+    create_tables()
+    run_migrations()
@@ -1 +1,98 @@
-# Bot 测试
\ No newline at end of file
+# Bot 测试
+import random
+import threading
+import time
+from telebot import types
+from app.bot.dispatcher import UpdateDispatcher, update_chat_key
+
+
+def _message_update(update_id, chat_id):
+    return types.Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "test"},
+            "text": str(update_id),
+        },
+    })
+
+
+def test_update_chat_key():
+    """消息按聊天区分，回调查询按所在消息的聊天区分"""
+    assert update_chat_key(_message_update(1, 42)) == 42
+    callback = types.Update.de_json({
+        "update_id": 2,
+        "callback_query": {
+            "id": "1", "chat_instance": "1", "data": "x",
+            "from": {"id": 7, "is_bot": False, "first_name": "test"},
+            "message": {"message_id": 1, "date": 0, "chat": {"id": -100, "type": "group", "title": "g"}},
+        },
+    })
+    assert update_chat_key(callback) == -100
+    assert update_chat_key(types.Update.de_json({"update_id": 3})) == ("update", 3)
+
+
+def test_dispatcher_keeps_per_chat_order():
+    """同一聊天的更新按提交顺序依次处理，不会并发"""
+    processed = {}
+    active = set()
+    overlaps = []
+    lock = threading.Lock()
+
+    def process(update):
+        chat_id = update.message.chat.id
+        with lock:
+            if chat_id in active:
+                overlaps.append(chat_id)
+            active.add(chat_id)
+        time.sleep(random.uniform(0, 0.003))
+        with lock:
+            active.discard(chat_id)
+            processed.setdefault(chat_id, []).append(update.update_id)
+
+    dispatcher = UpdateDispatcher(process, workers=4, max_pending=16)
+    updates = [_message_update(update_id, update_id % 5) for update_id in range(200)]
+    dispatcher.submit_all(updates)
+    assert dispatcher.wait_idle(10)
+    dispatcher.shutdown()
+
+    assert not overlaps
+    for chat_id, update_ids in processed.items():
+        assert update_ids == [u.update_id for u in updates if u.message.chat.id == chat_id]
+
+
+def test_dispatcher_slow_chat_does_not_block_others():
+    """一个聊天的处理被阻塞时，其他聊天照常处理"""
+    release = threading.Event()
+    done = threading.Event()
+
+    def process(update):
+        if update.message.chat.id == 1:
+            release.wait(5)
+        else:
+            done.set()
+
+    dispatcher = UpdateDispatcher(process, workers=2, max_pending=8)
+    dispatcher.submit(_message_update(1, 1))
+    dispatcher.submit(_message_update(2, 2))
+    try:
+        assert done.wait(5)
+        assert dispatcher.chat_backlogs() == [(1, 1)]
+    finally:
+        release.set()
+        dispatcher.shutdown(5)
+
+
+def test_dispatcher_rejects_when_full():
+    """排队的更新达到上限时，非阻塞提交返回 False"""
+    release = threading.Event()
+    dispatcher = UpdateDispatcher(lambda update: release.wait(5), workers=1, max_pending=2)
+    try:
+        assert dispatcher.submit(_message_update(1, 1), block=False)
+        assert dispatcher.submit(_message_update(2, 1), block=False)
+        assert not dispatcher.submit(_message_update(3, 1), block=False)
+    finally:
+        release.set()
+        dispatcher.shutdown(5)
@@ -1 +1,45 @@
-# 模型测试
\ No newline at end of file
+# 模型测试
+from datetime import datetime, timedelta
+from app.models import InviteCode
+
+
+def _save_code(code, code_type="invite", days_ago=0, expire_days=7, is_used=False):
+    return InviteCode(code, is_used=is_used, create_time=datetime.now() - timedelta(days=days_ago),
+                      expire_days=expire_days, create_user_id=1, type=code_type).save()
+
+
+def test_invite_code_expire_time(db):
+    """邀请码按有效天数过期，续期码的 expire_days 是续期天数，续期码不过期"""
+    invite = InviteCode.generate_code(length=8, user_id=1, expire_days=7, code_type="invite")
+    renew = InviteCode.generate_code(length=8, user_id=1, expire_days=30, code_type="renew")
+
+    invite = InviteCode.get_by_code(invite.code)
+    renew = InviteCode.get_by_code(renew.code)
+    assert invite.expire_time - invite.create_time == timedelta(days=7)
+    assert not invite.is_expired()
+    assert invite.is_expired(datetime.now() + timedelta(days=8))
+    assert renew.expire_time is None
+    assert not renew.is_expired(datetime.now() + timedelta(days=365))
+
+
+def test_generate_batch_expire_time(db):
+    """批量生成时同样只有邀请码有过期时间"""
+    invites = InviteCode.generate_batch(3, code_type="invite", expire_days=7, create_user_id=1, length=8)
+    renews = InviteCode.generate_batch(3, code_type="renew", expire_days=30, create_user_id=1, length=8)
+
+    assert all(InviteCode.get_by_code(code).expire_time is not None for code in invites)
+    assert all(InviteCode.get_by_code(code).expire_time is None for code in renews)
+
+
+def test_purge_expired_keeps_renew_and_used_codes(db):
+    """只删除已过期且未使用的邀请码，续期码和已使用的邀请码保留"""
+    _save_code("EXPIRED1", days_ago=10)
+    _save_code("ACTIVE01", days_ago=1)
+    _save_code("USEDOLD1", days_ago=10, is_used=True)
+    _save_code("RENEWOLD", code_type="renew", days_ago=100, expire_days=30)
+
+    assert InviteCode.purge_expired() == ["EXPIRED1"]
+    assert InviteCode.get_by_code("EXPIRED1") is None
+    remaining = {code.code for code in InviteCode.find()}
+    assert remaining == {"ACTIVE01", "USEDOLD1", "RENEWOLD"}
+    assert {code.code for code in InviteCode.find(unexpired=True)} == {"ACTIVE01", "RENEWOLD"}
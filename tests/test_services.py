@@ -1 +1,63 @@
-# 服务测试
\ No newline at end of file
+# 服务测试
+from datetime import datetime, timedelta
+from app.models import InviteCode
+from app.services import ScoreService, InviteCodeService
+from app.utils.db_utils import db_session
+
+
+def _create_users(*scores):
+    with db_session() as conn:
+        return [conn.execute("INSERT INTO Users (telegram_id, service_type, score) VALUES (?, 'navidrome', ?)",
+                             (1000 + i, score)).lastrowid for i, score in enumerate(scores)]
+
+
+def _balances():
+    """{用户 ID: (Users.score, 流水合计)}"""
+    with db_session() as conn:
+        rows = conn.execute("""
+            SELECT id, score, COALESCE((SELECT SUM(delta) FROM ScoreLedger WHERE user_id = Users.id), 0)
+            FROM Users
+        """).fetchall()
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+
+def test_score_changes_match_ledger(db):
+    """每次积分变动都写入流水，Users.score 始终等于流水合计"""
+    alice, bob = _create_users(0, 0)
+    ScoreService.add_score(alice, 30)
+    ScoreService.reduce_score(alice, 5)
+    assert ScoreService.reduce_score(bob, 5) is None  # 积分不足，不扣除也不记流水
+    ScoreService.transfer_score(alice, bob, 10)
+    assert ScoreService.transfer_score(alice, 999, 1) is None  # 接收者不存在，整体回滚
+    ScoreService.add_scores([(alice, 2), (bob, 3)])
+    ScoreService.update_user_score(bob, 50)
+
+    assert _balances() == {alice: (17, 17), bob: (50, 50)}
+    assert ScoreService.reconcile_balances() == 0
+
+
+def test_reconcile_balances_repairs_drift(db):
+    """余额与流水不一致时按流水修正"""
+    alice, bob = _create_users(0, 0)
+    ScoreService.add_score(alice, 20)
+    ScoreService.add_score(bob, 8)
+    with db_session() as conn:
+        conn.execute("UPDATE Users SET score = 999 WHERE id = ?", (alice,))
+
+    assert ScoreService.reconcile_balances() == 1
+    assert _balances() == {alice: (20, 20), bob: (8, 8)}
+    assert ScoreService.get_user_score(alice) == 20
+    assert ScoreService.reconcile_balances(rebuild=True) == 2
+
+
+def test_renew_code_available_long_after_creation(db):
+    """续期码不过期：创建很久之后仍然可以使用，过期的邀请码不可用"""
+    now = datetime.now()
+    InviteCode("RENEWOLD", create_time=now - timedelta(days=100), expire_days=30, create_user_id=1,
+               type="renew").save()
+    InviteCode("EXPIRED1", create_time=now - timedelta(days=10), expire_days=7, create_user_id=1).save()
+
+    assert InviteCodeService.is_code_available("RENEWOLD", "renew")
+    assert not InviteCodeService.is_code_available("EXPIRED1", "invite")
+    assert InviteCodeService.purge_expired_codes() == 1
+    assert InviteCodeService.is_code_available("RENEWOLD", "renew")
@@ -1 +1,231 @@
-# 工具类测试
\ No newline at end of file
+# 工具类测试
+import threading
+import time
+from datetime import datetime
+import pytest
+from telebot.apihelper import ApiTelegramException
+from app.utils.cron import CronExpression
+from app.utils.db_utils import db_session
+from app.utils.migrate_db import MIGRATIONS, get_schema_version, run_migrations
+from app.utils.scheduler import Scheduler
+from app.utils.send_queue import SendQueue
+from app.models import ScheduledJob
+
+# 迁移之前的数据库结构 (create_tables 最初创建的表)
+BASELINE_SCHEMA = """
+    CREATE TABLE Users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        telegram_id INTEGER UNIQUE NOT NULL,
+        service_type TEXT NOT NULL,
+        username TEXT,
+        service_user_id TEXT,
+        score INTEGER DEFAULT 0,
+        invite_code TEXT,
+        service_name TEXT,
+        status TEXT DEFAULT 'active',
+        expiration_date DATETIME,
+        last_sign_in_date DATETIME,
+        create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(telegram_id, service_type)
+    );
+    CREATE TABLE InviteCodes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        code TEXT UNIQUE NOT NULL,
+        is_used BOOLEAN DEFAULT FALSE,
+        user_id INTEGER,
+        type TEXT NOT NULL CHECK(type IN ('invite', 'renew')),
+        create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+        expire_days INTEGER NOT NULL,
+        expire_time DATETIME,
+        create_user_id INTEGER NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES Users(id)
+    );
+"""
+
+# Users 表仍使用 navidrome_user_id 字段的旧版本数据库结构
+LEGACY_SCHEMA = """
+    CREATE TABLE Users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        telegram_id INTEGER UNIQUE NOT NULL,
+        username TEXT,
+        navidrome_user_id TEXT,
+        score INTEGER DEFAULT 0,
+        invite_code TEXT,
+        service_name TEXT,
+        last_sign_in_date DATETIME
+    );
+    CREATE TABLE InviteCodes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        code TEXT UNIQUE NOT NULL,
+        is_used BOOLEAN DEFAULT FALSE,
+        user_id INTEGER,
+        create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+        expire_time DATETIME,
+        create_user_id INTEGER NOT NULL
+    );
+"""
+
+
+def _tables():
+    with db_session() as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_run_migrations_on_fresh_database(db):
+    """新数据库执行完所有迁移，重复执行不做修改"""
+    latest = MIGRATIONS[-1][0]
+    assert get_schema_version() == latest
+    assert {"ScoreLedger", "PendingDeletes", "ScheduledJobs", "schema_version"} <= _tables()
+    assert run_migrations() == latest
+    with db_session() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(MIGRATIONS)
+
+
+def test_run_migrations_upgrades_baseline_schema(empty_db):
+    """旧数据库升级：现有积分记为期初流水，只回填邀请码的过期时间，续期码保持不过期"""
+    with db_session() as conn:
+        conn.executescript(BASELINE_SCHEMA)
+        conn.execute("INSERT INTO Users (telegram_id, service_type, score) VALUES (100, 'navidrome', 50)")
+        conn.execute("INSERT INTO Users (telegram_id, service_type, score) VALUES (200, 'navidrome', 0)")
+        conn.execute("INSERT INTO InviteCodes (code, type, create_time, expire_days, create_user_id) "
+                     "VALUES ('INVITE01', 'invite', '2026-01-01 00:00:00', 7, 1)")
+        conn.execute("INSERT INTO InviteCodes (code, type, create_time, expire_days, create_user_id) "
+                     "VALUES ('RENEW001', 'renew', '2026-01-01 00:00:00', 30, 1)")
+
+    assert run_migrations() == MIGRATIONS[-1][0]
+
+    with db_session() as conn:
+        ledger = conn.execute("SELECT user_id, delta, reason FROM ScoreLedger").fetchall()
+        expire_times = dict(conn.execute("SELECT code, expire_time FROM InviteCodes").fetchall())
+    assert [tuple(row) for row in ledger] == [(1, 50, "opening")]
+    assert expire_times == {"INVITE01": "2026-01-08 00:00:00", "RENEW001": None}
+
+
+def test_run_migrations_upgrades_legacy_schema(empty_db):
+    """navidrome_user_id 旧结构升级为 service_user_id"""
+    with db_session() as conn:
+        conn.executescript(LEGACY_SCHEMA)
+        conn.execute("INSERT INTO Users (telegram_id, username, navidrome_user_id, score) VALUES (100, 'alice', 'nd-1', 5)")
+
+    run_migrations()
+
+    with db_session() as conn:
+        user = conn.execute("SELECT service_type, service_user_id, score FROM Users").fetchone()
+    assert tuple(user) == ("navidrome", "nd-1", 5)
+
+
+def test_cron_next_run():
+    """cron 表达式按配置的时区计算下次执行时间"""
+    cron = CronExpression("0 4 * * *", "Asia/Shanghai")
+    assert cron.next_after(datetime(2026, 1, 1, 3, 59)).replace(tzinfo=None) == datetime(2026, 1, 1, 4, 0)
+    assert cron.next_after(datetime(2026, 1, 1, 4, 0)).replace(tzinfo=None) == datetime(2026, 1, 2, 4, 0)
+    assert cron.next_after(datetime(2026, 1, 1, 4, 0)).utcoffset().total_seconds() == 8 * 3600
+
+    every_quarter = CronExpression("*/15 9-17 * * mon-fri", "UTC")
+    # 2026-01-02 是周五，下一个工作日是 2026-01-05 周一
+    assert every_quarter.next_after(datetime(2026, 1, 2, 10, 7)).replace(tzinfo=None) == datetime(2026, 1, 2, 10, 15)
+    assert every_quarter.next_after(datetime(2026, 1, 2, 17, 45)).replace(tzinfo=None) == datetime(2026, 1, 5, 9, 0)
+
+
+def test_cron_parsing():
+    """别名、周日写作 7、日和周同时限制时满足其一即可"""
+    assert CronExpression("@daily", "UTC").next_after(datetime(2026, 1, 1, 12, 0)).replace(tzinfo=None) == \
+        datetime(2026, 1, 2, 0, 0)
+    assert CronExpression("0 0 * * 7", "UTC").weekdays == CronExpression("0 0 * * sun", "UTC").weekdays == {6}
+    # 2026-01-01 是周四：13 号或周五，先到的是 1 月 2 日周五
+    assert CronExpression("0 0 13 * 5", "UTC").next_after(datetime(2026, 1, 1)).replace(tzinfo=None) == \
+        datetime(2026, 1, 2, 0, 0)
+    # 时间戳参数
+    assert CronExpression("30 * * * *", "UTC").next_after(datetime(2026, 1, 1, 0, 0).timestamp()).minute == 30
+
+    for expression in ("* * * *", "60 * * * *", "* 24 * * *", "*/0 * * * *", "5-1 * * * *", "0 0 31 2 *"):
+        with pytest.raises(ValueError):
+            CronExpression(expression, "UTC").next_after(datetime(2026, 1, 1))
+
+
+def _rate_limited(retry_after):
+    return ApiTelegramException("sendMessage", None, {
+        "ok": False, "error_code": 429, "description": "Too Many Requests",
+        "parameters": {"retry_after": retry_after},
+    })
+
+
+def test_send_queue_retries_after_429():
+    """收到 429 后按 retry_after 暂停该聊天，重试成功后再发送后面的消息"""
+    queue = SendQueue(global_rate=100, chat_rate=100, chat_burst=10, edit_rate=100, max_retries=3, workers=2)
+    calls = []
+
+    def send(text):
+        calls.append((text, time.monotonic()))
+        if len(calls) == 1:
+            raise _rate_limited(0.2)
+        return text
+
+    try:
+        first = queue.submit(1, send, ("a",))
+        second = queue.submit(1, send, ("b",))
+        assert first.result(5) == "a"
+        assert second.result(5) == "b"
+    finally:
+        queue.close(5)
+    assert [text for text, _ in calls] == ["a", "a", "b"]
+    assert calls[1][1] - calls[0][1] >= 0.2
+
+
+def test_send_queue_gives_up_after_max_retries():
+    """超过最大重试次数后把 429 异常交给调用方"""
+    queue = SendQueue(global_rate=100, chat_rate=100, chat_burst=10, edit_rate=100, max_retries=2, workers=1)
+    calls = []
+
+    def send():
+        calls.append(1)
+        raise _rate_limited(0)
+
+    try:
+        future = queue.submit(1, send)
+        with pytest.raises(ApiTelegramException):
+            future.result(5)
+    finally:
+        queue.close(5)
+    assert len(calls) == 3
+
+
+def test_scheduler_restores_persistent_job_after_restart(db):
+    """持久化任务重启后沿用保存的执行时间，停机期间错过的执行立即补执行，触发方式变化时重新计时"""
+    first = Scheduler(workers=1)
+    job = first.add_job("sweep", 3600, lambda: None, persistent=True)
+    first.executor.shutdown()
+
+    restarted = Scheduler(workers=1)
+    restored = restarted.add_job("sweep", 3600, lambda: None, persistent=True)
+    restarted.executor.shutdown()
+    assert restored.next_run == job.next_run
+
+    ScheduledJob.save_schedule("sweep", "interval:3600", time.time() - 600)
+    missed = Scheduler(workers=1)
+    before = time.time()
+    restored = missed.add_job("sweep", 3600, lambda: None, persistent=True)
+    missed.executor.shutdown()
+    assert before <= restored.next_run <= time.time()
+
+    changed = Scheduler(workers=1)
+    rescheduled = changed.add_job("sweep", 60, lambda: None, persistent=True)
+    changed.executor.shutdown()
+    assert rescheduled.next_run == pytest.approx(time.time() + 60, abs=5)
+    assert ScheduledJob.get("sweep").trigger == "interval:60"
+
+
+def test_scheduler_saves_result_after_run(db):
+    """持久化任务执行完成后保存下次执行时间和执行结果"""
+    scheduler = Scheduler(workers=1)
+    ran = threading.Event()
+    job = scheduler.add_job("sweep", 3600, ran.set, persistent=True)
+    job.next_run = time.time()
+    scheduler._dispatch(job)
+    scheduler.executor.shutdown(wait=True)
+
+    assert ran.is_set()
+    stored = ScheduledJob.get("sweep")
+    assert stored.last_status == "success"
+    assert stored.next_run_at == job.next_run
+    assert stored.next_run_at > time.time()